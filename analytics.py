@@ -0,0 +1,194 @@
+"""
+Тенденции измеренных напряжений срабатывания и отпускания по истории блока или объекта.
+
+Расчёт идёт по столбцам NumPy: история блока и совокупность всех измерений архива выбираются
+из SQLite одним запросом каждая, дальше - только операции над массивами (циклы - по шагам
+и величинам, а не по запускам). Совокупность хранится в памяти и после новых запусков
+дочитывается только добавленными строками, поэтому расчёт для блока не перечитывает весь архив.
+
+Измерения сравниваются в пределах одного шага одного плана (ключ шага архива), а не по номеру
+теста: в разных планах под одним номером могут быть разные проверки. Выброс - значение за
+границами Тьюки по совокупности шага (Q1 - 1.5·IQR, Q3 + 1.5·IQR); при нормальном распределении
+за них выходит около 0.7% исправных измерений. Пока измерений шага в архиве меньше
+MIN_POPULATION, границы не определены и выбросы не отмечаются.
+"""
+import warnings
+from threading import Lock
+
+import numpy as np
+
+from instrumentation import metrics
+
+DEFAULT_WINDOW = 10  # Окно скользящего среднего, запусков
+QUARTILES = (25, 75)  # Перцентили, по которым строятся границы выброса, %
+FENCE_FACTOR = 1.5  # Границы выброса: Q1 - FENCE_FACTOR·IQR, Q3 + FENCE_FACTOR·IQR
+MIN_POPULATION = 30  # Наименьшее число измерений величины шага в архиве для отметки выбросов
+SECONDS_PER_YEAR = 365.25 * 24 * 3600
+QUANTITIES = {"pickup_voltage": "срабатывание", "dropout_voltage": "отпускание"}
+
+
+def rolling_mean(values, window=DEFAULT_WINDOW):
+    """
+    Скользящее среднее по последним window значениям (в начале ряда - по имеющимся).
+    :param values: Одномерный массив без пропусков
+    """
+    values = np.asarray(values, dtype=float)
+    if not len(values):
+        return values
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    ends = np.arange(1, len(values) + 1)
+    starts = np.maximum(ends - window, 0)
+    return (cumulative[ends] - cumulative[starts]) / (ends - starts)
+
+
+def drift(times, values):
+    """
+    Дрейф - наклон прямой наименьших квадратов.
+    :param times: Время измерений, с Unix
+    :return: В в год или nan, если точек меньше двух или все в один момент
+    """
+    times = np.asarray(times, dtype=float)
+    values = np.asarray(values, dtype=float)
+    if len(values) < 2:
+        return float("nan")
+    offsets = times - times.mean()
+    spread = np.dot(offsets, offsets)
+    if not spread:
+        return float("nan")
+    return float(np.dot(offsets, values - values.mean()) / spread * SECONDS_PER_YEAR)
+
+
+class TrendSummary:
+    """Итог по одной величине одного теста в истории блока."""
+
+    def __init__(self, test_number, quantity, count, last, mean, rolling, drift, low, high, outliers,
+                 last_outlier, plan=None, step_id=None):
+        self.test_number = test_number  # Номер теста в последнем запуске (для подписи)
+        self.plan = plan  # План и идентификатор шага (None для записей архива без плана)
+        self.step_id = step_id
+        self.quantity = quantity  # Ключ QUANTITIES
+        self.count = count
+        self.last = last
+        self.mean = mean
+        self.rolling = rolling  # Скользящее среднее на последнем запуске
+        self.drift = drift  # В в год
+        self.low = low  # Границы выброса по совокупности (nan, если данных нет)
+        self.high = high
+        self.outliers = outliers  # Число измерений блока вне границ
+        self.last_outlier = last_outlier
+
+    @property
+    def label(self):
+        """Подпись величины: план и шаг (в выборке по объекту встречаются шаги разных планов) или номер теста."""
+        if self.plan is None:
+            return f"Тест {self.test_number + 1}, {QUANTITIES[self.quantity]}"
+        return f"{self.plan}, шаг {self.step_id}, {QUANTITIES[self.quantity]}"
+
+    def to_dict(self):
+        """Словарь для JSON (nan - отсутствующее значение - заменяется на None)."""
+        return {name: None if isinstance(value, float) and np.isnan(value) else value
+                for name, value in vars(self).items()}
+
+
+def format_trend(summary):
+    """Строка тенденции для протокола: последнее значение, среднее, дрейф и выбросы."""
+    text = (f"{summary.label}: {summary.last:.1f} В, скольз. среднее {summary.rolling:.1f} В, "
+            f"среднее {summary.mean:.1f} В ({summary.count} изм.)")
+    if not np.isnan(summary.drift):
+        text += f", дрейф {summary.drift:+.1f} В/год"
+    if summary.outliers:
+        text += f", выбросов {summary.outliers}"
+    if summary.last_outlier:
+        text += f" - последнее вне {summary.low:.1f}…{summary.high:.1f} В"
+    return text
+
+
+class TrendAnalyzer:
+    """Расчёт тенденций по архиву ResultsArchive с кэшем границ выброса по совокупности."""
+
+    def __init__(self, archive, quartiles=QUARTILES, fence_factor=FENCE_FACTOR, min_population=MIN_POPULATION):
+        self.archive = archive
+        self.quartiles = quartiles
+        self.fence_factor = fence_factor
+        self.min_population = min_population
+        self._lock = Lock()
+        self._version = None
+        self._population = np.empty((0, 3))  # Столбцы: ключ шага, pickup_voltage, dropout_voltage
+        self._bounds = {}
+        self._steps = {}  # Ключ шага -> (план, идентификатор шага)
+
+    def population_bounds(self):
+        """
+        Границы выброса по всем измерениям архива.
+        :return: {(ключ шага, quantity): (нижняя, верхняя)}; nan, если измерений меньше min_population
+        """
+        with self._lock:
+            version = self.archive.measurement_version()
+            if version == self._version:
+                return self._bounds
+            with metrics.timed("analytics.population"):
+                if self._version is not None and version > self._version:
+                    # Дописываем к кэшу только строки, добавленные с прошлого расчёта
+                    rows, version = self.archive.measurement_population(self._version)
+                    self._population = np.concatenate((self._population, np.array(rows, dtype=float)))
+                else:
+                    # Первый расчёт или архив заменён другим файлом - читаем совокупность целиком
+                    rows, version = self.archive.measurement_population()
+                    self._population = np.array(rows, dtype=float).reshape(-1, 3)
+                self._bounds = self._fence_bounds(self._population)
+                self._steps = self.archive.plan_steps()
+                self._version = version
+            return self._bounds
+
+    def _fence_bounds(self, data):
+        bounds = {}
+        if not len(data):
+            return bounds
+        data = data[np.argsort(data[:, 0], kind="stable")]
+        keys, starts = np.unique(data[:, 0], return_index=True)
+        for key, group in zip(keys, np.split(data[:, 1:], starts[1:])):
+            with warnings.catch_warnings():
+                # Для величины без измерений в группе nanpercentile даёт nan с предупреждением
+                warnings.simplefilter("ignore", RuntimeWarning)
+                q1, q3 = np.nanpercentile(group, self.quartiles, axis=0)
+            spread = (q3 - q1) * self.fence_factor
+            low, high = q1 - spread, q3 + spread
+            # Мало измерений - границы не определены (nan): по ним выбросы не отмечаются
+            small = np.count_nonzero(~np.isnan(group), axis=0) < self.min_population
+            low[small] = high[small] = np.nan
+            for column, quantity in enumerate(QUANTITIES):
+                bounds[(int(key), quantity)] = (float(low[column]), float(high[column]))
+        return bounds
+
+    def block_trends(self, block_number=None, object_name=None, window=DEFAULT_WINDOW):
+        """
+        Тенденции по истории блока или объекта.
+        :return: Список TrendSummary, упорядоченный по номеру теста, шагу и величине
+        """
+        bounds = self.population_bounds()
+        with metrics.timed("analytics.block_trends"):
+            rows = self.archive.measurement_history(block_number, object_name)
+            if not rows:
+                return []
+            data = np.array(rows, dtype=float)
+            times, tests, keys = data[:, 0], data[:, 2], data[:, 3]
+            summaries = []
+            for key in np.unique(keys):
+                selected = keys == key
+                test_number = int(tests[selected][-1])
+                plan, step_id = self._steps.get(int(key), (None, None))
+                for column, quantity in enumerate(QUANTITIES, start=4):
+                    values = data[selected, column]
+                    present = ~np.isnan(values)
+                    if not present.any():
+                        continue
+                    values, moments = values[present], times[selected][present]
+                    low, high = bounds.get((int(key), quantity), (float("nan"), float("nan")))
+                    # Сравнение с nan даёт False: без совокупности выбросов нет
+                    flags = (values < low) | (values > high)
+                    summaries.append(TrendSummary(
+                        test_number, quantity, len(values), float(values[-1]), float(values.mean()),
+                        float(rolling_mean(values, window)[-1]), drift(moments, values), low, high,
+                        int(flags.sum()), bool(flags[-1]), plan, step_id))
+        summaries.sort(key=lambda summary: (summary.test_number, summary.plan or "", summary.step_id or ""))
+        return summaries
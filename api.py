@@ -0,0 +1,214 @@
+"""
+Локальный HTTP/WebSocket API ядра стенда (python engine.py --http 127.0.0.1:8080).
+
+    GET  /api/stands                  - стенды, состояние связи и последние результаты
+    POST /api/stands                  - добавить стенд: {"port": "COM3"} (подключение - /connect)
+    POST /api/stands/<id>/connect     - подключить (профиль порта из настроек)
+    POST /api/stands/<id>/disconnect
+    POST /api/stands/<id>/run         - запустить проверку: {"operator", "object_name", "block_number",
+                                        "test_place", "connection_name", "plan" (файл), "steps" ([номера])};
+                                        ошибка выполнения приходит событием message с level "error"
+    GET  /api/events?after=<номер>    - события с номером больше after (опрос)
+    GET  /api/trends?block_number=... - тенденции измерений блока или объекта
+    WS   /api/ws                      - поток событий JSON
+
+Требует bottle; поток событий через WebSocket - bottle-websocket (gevent). Без него доступен опрос.
+Сервер слушает только указанный адрес и не проверяет доступ: открывать его в сеть не следует.
+"""
+import json
+import queue
+from array import array
+from socketserver import ThreadingMixIn
+from threading import Thread
+from wsgiref.simple_server import WSGIServer
+
+import bottle
+
+try:
+    from bottle.ext.websocket import GeventWebSocketServer, websocket  # Необязательная зависимость
+except ImportError:
+    GeventWebSocketServer = websocket = None
+
+from engine import REPORT_FIELDS, load_plan
+
+SOCKET_QUEUE_SIZE = 1000  # События, ожидающие отправки клиенту WebSocket; при переполнении - пропуск
+
+
+def to_json_value(value):
+    """Преобразование объектов ядра (события, результаты шагов, тенденции) для json.dumps."""
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    if isinstance(value, array):
+        return list(value)
+    if isinstance(value, set):
+        return sorted(value)
+    if hasattr(value, "__dict__"):
+        return vars(value)
+    return str(value)
+
+
+def to_json(value):
+    return json.dumps(value, ensure_ascii=False, default=to_json_value)
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    """Сервер wsgiref с потоком на запрос: ожидание ядра в одном запросе не задерживает остальные."""
+    daemon_threads = True
+
+
+def call_in_hub_threadpool(function, *args):
+    """
+    Блокирующий вызов из обработчика сервера gevent: выполняется в пуле потоков hub, а остальные
+    запросы и потоки событий WebSocket тем временем обслуживаются.
+    """
+    import gevent
+    return gevent.get_hub().threadpool.apply(function, args)
+
+
+def call_directly(function, *args):
+    return function(*args)
+
+
+def create_app(engine, settings, timeout=30, blocking=call_directly):
+    """
+    Приложение bottle с маршрутами API.
+    :param settings: Настройки (профили портов)
+    :param timeout: Наибольшее время ожидания операции ядра, с
+    :param blocking: Функция blocking(function, *args) для блокирующих вызовов (ожидание ядра,
+        расчёт тенденций); для сервера gevent - call_in_hub_threadpool
+    """
+    app = bottle.Bottle()
+
+    def respond(value, status=200):
+        # Ответ отдельным объектом, а не через bottle.response: под gevent без monkey-patching
+        # bottle.response общий для обработчиков, ожидающих в call_in_hub_threadpool
+        return bottle.HTTPResponse(to_json(value), status, {"Content-Type": "application/json; charset=utf-8"})
+
+    def find_stand(stand_id):
+        stand = engine.stand(stand_id)
+        if stand is None:
+            raise respond({"error": f"Стенд {stand_id} не найден"}, 404)
+        return stand
+
+    @app.get("/api/stands")
+    def list_stands():
+        return respond([stand.to_dict() for stand in engine.stand_list()])
+
+    @app.post("/api/stands")
+    def add_stand():
+        port = (bottle.request.json or {}).get("port", "")
+        if not port:
+            return respond({"error": "Не указан порт"}, 400)
+        return respond(engine.add_stand(port).to_dict(), 201)
+
+    @app.post("/api/stands/<stand_id:int>/connect")
+    def connect(stand_id):
+        stand = find_stand(stand_id)
+        try:
+            blocking(engine.submit(stand.connect(stand.port, settings.profile(stand.port))).result, timeout)
+        except Exception as e:
+            return respond({"error": str(e)}, 502)
+        return respond(stand.to_dict())
+
+    @app.post("/api/stands/<stand_id:int>/disconnect")
+    def disconnect(stand_id):
+        stand = find_stand(stand_id)
+        blocking(engine.submit(stand.disconnect()).result, timeout)
+        return respond(stand.to_dict())
+
+    @app.post("/api/stands/<stand_id:int>/run")
+    def run(stand_id):
+        stand = find_stand(stand_id)
+        data = bottle.request.json or {}
+        report_info = {field: str(data.get(field) or "") for field in REPORT_FIELDS}
+        if not (report_info["operator"] and report_info["block_number"]):
+            return respond({"error": "Нужны operator и block_number"}, 400)
+        if not stand.connected:
+            return respond({"error": "Стенд не подключён"}, 409)
+        if stand.running:
+            return respond({"error": "Проверка уже выполняется"}, 409)
+        try:
+            plan = load_plan(data["plan"]) if data.get("plan") else stand.plan
+        except (OSError, ValueError) as e:
+            return respond({"error": str(e)}, 400)
+        steps = data.get("steps")
+        if steps is not None and not (isinstance(steps, list) and steps and all(
+                type(index) is int and 0 <= index < len(plan.steps) for index in steps)):
+            return respond({"error": f"steps - список номеров шагов от 0 до {len(plan.steps) - 1}"}, 400)
+
+        def on_done(future):
+            # Ответ уже отправлен (202): ошибка проверки доходит до клиента событием message
+            if not future.cancelled() and future.exception() is not None:
+                stand.publish("message", level="error", text=f"{stand.title}: {future.exception()}")
+
+        # Результаты приходят событиями (step.result, plan.finished, report.done)
+        engine.submit(stand.run_plan(plan, report_info, steps)).add_done_callback(on_done)
+        return respond({"stand": stand.id, "plan": plan.name}, 202)
+
+    @app.get("/api/events")
+    def events():
+        try:
+            after = int(bottle.request.query.get("after") or 0)
+        except ValueError:
+            return respond({"error": "after должен быть числом"}, 400)
+        return respond(engine.bridge.history(after))
+
+    @app.get("/api/trends")
+    def trends():
+        query = bottle.request.query
+        block_number, object_name = query.get("block_number"), query.get("object_name")
+        if not (block_number or object_name):
+            return respond({"error": "Укажите block_number или object_name"}, 400)
+        result = blocking(engine.block_trends, block_number, object_name)
+        if result is None:
+            return respond({"error": "Расчёт тенденций недоступен"}, 503)
+        return respond(result)
+
+    if websocket is not None:
+        @app.route("/api/ws", apply=[websocket])
+        def event_socket(socket):
+            import gevent
+            from geventwebsocket import WebSocketError
+            # События публикуются в потоках ядра; сервер gevent забирает их из очереди без блокировки
+            pending = queue.Queue(SOCKET_QUEUE_SIZE)
+
+            def forward(event):
+                try:
+                    pending.put_nowait(event)
+                except queue.Full:
+                    pass
+
+            engine.bridge.subscribe(forward)
+            try:
+                while not socket.closed:
+                    try:
+                        event = pending.get_nowait()
+                    except queue.Empty:
+                        gevent.sleep(0.05)
+                        continue
+                    socket.send(to_json(event))
+            except WebSocketError:
+                pass
+            finally:
+                engine.bridge.unsubscribe(forward)
+
+    return app
+
+
+def serve_api(engine, host, port, settings):
+    """
+    Запускает сервер API в фоновом потоке.
+    :return: Поток сервера
+    """
+    if GeventWebSocketServer is not None:
+        # Один поток hub gevent обслуживает все запросы: ожидание ядра - в пуле потоков hub
+        app = create_app(engine, settings, blocking=call_in_hub_threadpool)
+        options = {"server": GeventWebSocketServer}
+    else:
+        app = create_app(engine, settings)
+        options = {"server": "wsgiref", "server_class": ThreadingWSGIServer}
+    thread = Thread(target=bottle.run, kwargs={"app": app, "host": host, "port": port, "quiet": True, **options},
+                    name="api", daemon=True)
+    thread.start()
+    print(f"API стенда: http://{host}:{port}/api/stands")
+    return thread
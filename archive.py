@@ -0,0 +1,308 @@
+import os
+import sqlite3
+from array import array
+from datetime import datetime, timedelta
+from threading import Lock
+
+DEFAULT_DB_PATH = os.path.join("reports", "archive.sqlite3")
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    operator TEXT,
+    object_name TEXT,
+    block_number TEXT,
+    test_place TEXT,
+    connection_name TEXT,
+    status TEXT,
+    report_path TEXT
+);
+CREATE TABLE IF NOT EXISTS test_results (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    test_number INTEGER NOT NULL,
+    step_name TEXT,
+    result TEXT,
+    response TEXT,
+    duration REAL,
+    PRIMARY KEY (run_id, test_number)
+);
+CREATE TABLE IF NOT EXISTS telemetry (
+    run_id INTEGER PRIMARY KEY REFERENCES runs(id) ON DELETE CASCADE,
+    sample_rate INTEGER,
+    samples BLOB
+);
+CREATE TABLE IF NOT EXISTS plan_steps (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    plan TEXT NOT NULL,
+    step_id TEXT NOT NULL,
+    UNIQUE (plan, step_id)
+);
+CREATE TABLE IF NOT EXISTS measurements (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    test_number INTEGER NOT NULL,
+    pickup_voltage REAL,
+    dropout_voltage REAL,
+    step_key INTEGER REFERENCES plan_steps(id),
+    PRIMARY KEY (run_id, test_number)
+);
+CREATE INDEX IF NOT EXISTS idx_runs_block ON runs(block_number, started_at);
+CREATE INDEX IF NOT EXISTS idx_runs_object ON runs(object_name, started_at);
+CREATE INDEX IF NOT EXISTS idx_runs_started ON runs(started_at);
+"""
+
+# Ключ шага для измерений архивов без plan_steps: отрицательный, по номеру теста (-1 - тест 1)
+LEGACY_STEP_KEY = "coalesce(m.step_key, -1 - m.test_number)"
+
+# Столбцы, добавленные после первых версий архива: (таблица, столбец, определение)
+ADDED_COLUMNS = [
+    ("measurements", "step_key", "INTEGER REFERENCES plan_steps(id)"),
+    ("test_results", "step_name", "TEXT"),
+]
+
+RUN_COLUMNS = ("id", "started_at", "finished_at", "operator", "object_name", "block_number", "test_place",
+               "connection_name", "status", "report_path")
+
+
+def default_step_name(test_number):
+    """Название шага записи без названий шагов (прежние версии архива): "Тест N"."""
+    return f"Тест {test_number + 1}"
+
+
+class ResultsArchive:
+    """
+    Архив испытаний в локальной базе SQLite.
+    Запись (run) - один запуск теста или пакета тестов; результаты отдельных тестов хранятся
+    в test_results, измеренные напряжения срабатывания и отпускания - в measurements с ключом
+    шага плана (plan_steps: название плана и идентификатор шага).
+    Выборки по номеру блока, объекту и дате идут по индексам.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.path = path
+        # Соединение используется из потоков тестов и интерфейса, доступ - под блокировкой
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self._lock = Lock()
+        with self._lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA foreign_keys=ON")
+            self._migrate()
+            self.connection.executescript(SCHEMA)
+
+    def _migrate(self):
+        """Добавляет в таблицы архива прежних версий столбцы, которых в них нет."""
+        for table, column, definition in ADDED_COLUMNS:
+            columns = [row[1] for row in self.connection.execute(f"PRAGMA table_info({table})")]
+            if columns and column not in columns:
+                self.connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def add_run(self, operator, object_name, block_number, test_place, connection_name, status, results,
+                started_at=None, finished_at=None, telemetry=None, telemetry_rate=0, plan=None):
+        """
+        Сохраняет запуск испытаний.
+        :param results: Список словарей с ключами test_number, result, response, duration
+                        и необязательными step_id, step_name, pickup_voltage, dropout_voltage (В)
+        :param plan: Название плана испытаний; вместе с step_id определяет шаг, по которому
+                     сравниваются измерения разных блоков
+        :param telemetry: Отсчёты напряжения полной частоты за время испытаний (array('H'), 0.1 В)
+        :param telemetry_rate: Частота отсчётов, Гц
+        :param started_at: Время начала (datetime), по умолчанию - текущее
+        :param finished_at: Время окончания (datetime), по умолчанию - текущее
+        :return: Идентификатор записи
+        """
+        now = datetime.now()
+        with self._lock, self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (started_at, finished_at, operator, object_name, block_number, test_place, "
+                "connection_name, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                ((started_at or now).strftime(TIME_FORMAT), (finished_at or now).strftime(TIME_FORMAT),
+                 operator, object_name, block_number, test_place, connection_name, status))
+            run_id = cursor.lastrowid
+            self.connection.executemany(
+                "INSERT INTO test_results (run_id, test_number, step_name, result, response, duration) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(run_id, r["test_number"], r.get("step_name"), r.get("result"), r.get("response"), r.get("duration"))
+                 for r in results])
+            measured = [r for r in results
+                        if r.get("pickup_voltage") is not None or r.get("dropout_voltage") is not None]
+            self.connection.executemany(
+                "INSERT INTO measurements (run_id, test_number, pickup_voltage, dropout_voltage, step_key) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(run_id, r["test_number"], r.get("pickup_voltage"), r.get("dropout_voltage"),
+                  self._step_key(plan, r.get("step_id"))) for r in measured])
+            if telemetry:
+                self.connection.execute("INSERT INTO telemetry (run_id, sample_rate, samples) VALUES (?, ?, ?)",
+                                        (run_id, telemetry_rate, telemetry.tobytes()))
+        return run_id
+
+    def _step_key(self, plan, step_id):
+        """Ключ шага плана в plan_steps (создаётся при первом обращении) или None без плана."""
+        if plan is None or step_id is None:
+            return None
+        self.connection.execute("INSERT OR IGNORE INTO plan_steps (plan, step_id) VALUES (?, ?)", (plan, step_id))
+        return self.connection.execute("SELECT id FROM plan_steps WHERE plan = ? AND step_id = ?",
+                                       (plan, step_id)).fetchone()[0]
+
+    def plan_steps(self):
+        """Шаги планов по ключам измерений: {ключ: (название плана, идентификатор шага)}."""
+        with self._lock:
+            rows = self.connection.execute("SELECT id, plan, step_id FROM plan_steps").fetchall()
+        return {row[0]: (row[1], row[2]) for row in rows}
+
+    def set_report_path(self, run_id, report_path):
+        """Сохраняет путь к протоколу запуска."""
+        with self._lock, self.connection:
+            self.connection.execute("UPDATE runs SET report_path = ? WHERE id = ?", (report_path, run_id))
+
+    def find_runs(self, block_number=None, object_name=None, date_from=None, date_to=None, limit=100, after=None):
+        """
+        Возвращает страницу запусков, от новых к старым.
+        :param date_from: Дата начала периода "ГГГГ-ММ-ДД" (включительно)
+        :param date_to: Дата конца периода "ГГГГ-ММ-ДД" (включительно)
+        :param limit: Размер страницы
+        :param after: Ключ последней строки предыдущей страницы (started_at, id) - постраничный
+                      переход по ключу без OFFSET
+        :return: Список словарей с полями RUN_COLUMNS
+        """
+        conditions, params = self._filters(block_number, object_name, date_from, date_to)
+        if after:
+            conditions.append("(started_at, id) < (?, ?)")
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = (f"SELECT {', '.join(RUN_COLUMNS)} FROM runs {where} "
+                 f"ORDER BY started_at DESC, id DESC LIMIT ?")
+        with self._lock:
+            rows = self.connection.execute(query, params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def last_run_for_block(self, block_number):
+        """Последний запуск для номера блока или None."""
+        runs = self.find_runs(block_number=block_number, limit=1)
+        return runs[0] if runs else None
+
+    def get_results(self, run_id):
+        """Результаты отдельных тестов запуска (step_name - название шага плана, у прежних записей None)."""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT test_number, step_name, result, response, duration FROM test_results WHERE run_id = ? "
+                "ORDER BY test_number", (run_id,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_telemetry(self, run_id):
+        """
+        Отсчёты напряжения запуска.
+        :return: (array('H') в единицах 0.1 В, частота в Гц) или None
+        """
+        with self._lock:
+            row = self.connection.execute("SELECT sample_rate, samples FROM telemetry WHERE run_id = ?",
+                                          (run_id,)).fetchone()
+        if row is None:
+            return None
+        samples = array("H")
+        samples.frombytes(row["samples"])
+        return samples, row["sample_rate"]
+
+    def measurement_history(self, block_number=None, object_name=None):
+        """
+        Измерения запусков блока или объекта от старых к новым для расчёта тенденций.
+        Строки возвращаются кортежами (без sqlite3.Row), время - в секундах Unix, чтобы
+        их можно было сразу преобразовать в массивы.
+        :return: Список (время, run_id, test_number, ключ шага, pickup_voltage, dropout_voltage);
+                 ключ шага - plan_steps.id или отрицательный номер теста для записей без плана
+        """
+        conditions, params = self._filters(block_number, object_name, None, None)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = (f"SELECT CAST(strftime('%s', r.started_at) AS INTEGER), m.run_id, m.test_number, "
+                 f"{LEGACY_STEP_KEY}, m.pickup_voltage, m.dropout_voltage "
+                 f"FROM runs r JOIN measurements m ON m.run_id = r.id {where} ORDER BY r.started_at, r.id")
+        with self._lock:
+            cursor = self.connection.cursor()
+            cursor.row_factory = None
+            return cursor.execute(query, params).fetchall()
+
+    def measurement_population(self, after_rowid=0):
+        """
+        Измерения всего архива (совокупность для границ выброса).
+        :param after_rowid: Вернуть только строки, добавленные после этой (дочитывание кэша)
+        :return: (список (ключ шага, pickup_voltage, dropout_voltage), версия measurement_version)
+        """
+        with self._lock:
+            cursor = self.connection.cursor()
+            cursor.row_factory = None
+            version = cursor.execute("SELECT coalesce(max(rowid), 0) FROM measurements").fetchone()[0]
+            rows = cursor.execute(f"SELECT {LEGACY_STEP_KEY}, m.pickup_voltage, m.dropout_voltage FROM measurements m "
+                                  f"WHERE m.rowid > ? ORDER BY m.rowid", (after_rowid,)).fetchall()
+        return rows, version
+
+    def measurement_version(self):
+        """
+        Версия таблицы измерений - наибольший rowid. Архив только пополняется,
+        поэтому новые строки - это строки с rowid больше запомненной версии.
+        """
+        with self._lock:
+            return self.connection.execute("SELECT coalesce(max(rowid), 0) FROM measurements").fetchone()[0]
+
+    def report_records(self, block_number=None, object_name=None, date_from=None, date_to=None):
+        """
+        Записи для пакетной выгрузки протоколов (аргументы PDFReport.generate), от старых к новым.
+        test_results - пары (название шага, результат); шаги записей без названий - "Тест N".
+        """
+        conditions, params = self._filters(block_number, object_name, date_from, date_to)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = (f"SELECT r.id, r.started_at, r.operator, r.object_name, r.block_number, r.test_place, "
+                 f"r.connection_name, r.status, t.test_number, t.step_name, t.result "
+                 f"FROM runs r LEFT JOIN test_results t ON t.run_id = r.id {where} "
+                 f"ORDER BY r.started_at, r.id, t.test_number")
+        records = {}
+        with self._lock:
+            rows = self.connection.execute(query, params).fetchall()
+        for row in rows:
+            record = records.get(row["id"])
+            if record is None:
+                record = records[row["id"]] = {
+                    "operator": row["operator"], "object_name": row["object_name"],
+                    "block_number": row["block_number"], "test_place": row["test_place"],
+                    "connection_name": row["connection_name"], "status": row["status"],
+                    "date": row["started_at"][:10], "test_results": [],
+                }
+            if row["test_number"] is not None:
+                # Позиция в списке соответствует номеру теста
+                results = record["test_results"]
+                results.extend((default_step_name(number), "не выполнялся")
+                               for number in range(len(results), row["test_number"] + 1))
+                name = row["step_name"] or default_step_name(row["test_number"])
+                results[row["test_number"]] = (name, row["result"])
+        return list(records.values())
+
+    @staticmethod
+    def _filters(block_number, object_name, date_from, date_to):
+        """
+        Условия WHERE для фильтров; даты сравниваются как строки ISO, что использует индексы.
+        :raises ValueError: Если дата не в формате ГГГГ-ММ-ДД
+        """
+        conditions, params = [], []
+        if block_number:
+            conditions.append("block_number = ?")
+            params.append(block_number)
+        if object_name:
+            conditions.append("object_name = ?")
+            params.append(object_name)
+        if date_from:
+            # Разбор проверяет формат: строка в другом формате дала бы неверный отбор без ошибки
+            conditions.append("started_at >= ?")
+            params.append(datetime.strptime(date_from, "%Y-%m-%d").strftime("%Y-%m-%d"))
+        if date_to:
+            next_day = datetime.strptime(date_to, "%Y-%m-%d") + timedelta(days=1)
+            conditions.append("started_at < ?")
+            params.append(next_day.strftime("%Y-%m-%d"))
+        return conditions, params
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
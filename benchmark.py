@@ -0,0 +1,142 @@
+"""
+Замеры производительности без оборудования (на имитаторе устройства).
+
+    python benchmark.py                              # все замеры
+    python benchmark.py --save bench_baseline.json   # сохранить результаты как эталон
+    python benchmark.py --compare bench_baseline.json --tolerance 0.2
+
+При --compare программа завершается с кодом 1, если какой-либо показатель хуже эталона
+больше чем на tolerance (20% по умолчанию).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from pdf_report import PDFReport
+from serial_handler import SerialHandler
+from simulator import SimulatedDevice
+
+# Показатели и направление: True - чем больше, тем лучше
+METRICS = {
+    "round_trip_p50_ms": False,
+    "round_trip_p99_ms": False,
+    "lines_per_second": True,
+    "samples_per_second": True,
+    "pdf_renders_per_second": True,
+}
+
+
+def percentile(values, percent):
+    """Перцентиль по выборке (линейная интерполяция)."""
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+def bench_round_trip(requests=200, delay=0.005, jitter=0.002):
+    """Время от отправки команды теста до получения ответа через SerialHandler.send_request, мс."""
+    with SimulatedDevice(response_delay=delay, jitter=jitter, telemetry_rate=50, seed=1) as device:
+        handler = SerialHandler()
+        handler.connect(device.port, 115200)
+        latencies = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            handler.send_request("UNUSED;START;UNUSED;UNUSED;UNUSED", timeout=2).result()
+            latencies.append((time.perf_counter() - start) * 1000)
+        handler.close()
+    return {"round_trip_p50_ms": percentile(latencies, 50), "round_trip_p99_ms": percentile(latencies, 99)}
+
+
+def bench_lines(duration=3.0, rate=5000):
+    """Строк в секунду, которые SerialHandler принимает и разбирает при потоке ASCII телеметрии."""
+    with SimulatedDevice(telemetry_rate=rate) as device:
+        handler = SerialHandler()
+        handler.connect(device.port, 115200)
+        time.sleep(0.2)
+        start_count, start = handler.buffer.total, time.perf_counter()
+        time.sleep(duration)
+        received = handler.buffer.total - start_count
+        elapsed = time.perf_counter() - start
+        handler.close()
+    return {"lines_per_second": received / elapsed}
+
+
+def bench_samples(duration=3.0, rate=5000):
+    """Отсчётов в секунду, которые SerialHandler принимает в двоичных кадрах телеметрии."""
+    with SimulatedDevice(telemetry_rate=0) as device:
+        handler = SerialHandler()
+        handler.connect(device.port, 115200)
+        handler.start_telemetry(rate).result(timeout=2)
+        time.sleep(0.2)
+        start_count, start = handler.telemetry.total, time.perf_counter()
+        time.sleep(duration)
+        received = handler.telemetry.total - start_count
+        elapsed = time.perf_counter() - start
+        handler.close()
+    return {"samples_per_second": received / elapsed}
+
+
+def bench_pdf(renders=50):
+    """Протоколов в секунду, формируемых PDFReport в одном потоке."""
+    report = PDFReport()
+    with tempfile.TemporaryDirectory() as folder:
+        start = time.perf_counter()
+        for i in range(renders):
+            report.generate("Иванов И.И.", "Подстанция 1", str(i), "Цех 2", "Ввод 1", "success",
+                            test_results=["Успех"] * 5, file_path=os.path.join(folder, f"{i}.pdf"))
+        elapsed = time.perf_counter() - start
+    return {"pdf_renders_per_second": renders / elapsed}
+
+
+def compare(results, baseline, tolerance):
+    """
+    Сравнивает результаты с эталоном.
+    :return: Список описаний ухудшившихся показателей
+    """
+    regressions = []
+    for name, higher_is_better in METRICS.items():
+        if name not in results or name not in baseline:
+            continue
+        value, reference = results[name], baseline[name]
+        worse = value < reference * (1 - tolerance) if higher_is_better else value > reference * (1 + tolerance)
+        if worse:
+            regressions.append(f"{name}: {value:.2f} (эталон {reference:.2f})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры производительности на имитаторе устройства")
+    parser.add_argument("--save", help="Сохранить результаты в JSON файл")
+    parser.add_argument("--compare", help="Сравнить с эталоном из JSON файла")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Допустимое ухудшение (доля)")
+    parser.add_argument("--duration", type=float, default=3.0, help="Длительность замеров потока, с")
+    parser.add_argument("--rate", type=int, default=5000, help="Частота потока строк и отсчётов имитатора, Гц")
+    args = parser.parse_args()
+
+    results = {}
+    results.update(bench_round_trip())
+    results.update(bench_lines(args.duration, args.rate))
+    results.update(bench_samples(args.duration, args.rate))
+    results.update(bench_pdf())
+
+    for name, value in results.items():
+        print(f"{name:26} {value:12.2f}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("Ухудшение показателей:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("Показатели в пределах эталона.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,598 @@
+"""
+Ядро стенда на asyncio: подключение к устройствам, выполнение планов испытаний, архив и отчеты.
+Интерфейс не вызывает SerialHandler и не создаёт потоков сам: он ставит задания в цикл ядра
+(Engine.submit) и получает события через EventBridge в своём потоке. То же ядро работает без
+интерфейса - для линий, где проверки запускаются сценарием, - с локальным HTTP/WebSocket API (api.py).
+
+    python engine.py --stand /dev/ttyUSB0 --stand /dev/ttyUSB1 --plan five_tests_fail_fast.json \\
+        --operator "Иванов И.И." --object "Подстанция 1" --block 15 --place "Цех 2" --connection "Ввод 1"
+    python engine.py --http 127.0.0.1:8080        # стенды из settings.json, запуск проверок через API
+
+События (Event.name, данные - Event.data):
+    stand.added, stand.removed
+    stand.state     - состояние связи: state
+    stand.voltage   - новые отсчёты телеметрии: samples (array('H'), 0.1 В), latest (последняя строка, "" - если
+                      данных нет дольше serial_handler.LATEST_MAX_AGE)
+    plan.started    - plan (название)
+    step.result     - result (StepResult)
+    plan.finished   - results, status, run_id, aborted_by, abort_text, missing, no_response, voltage_range, trends
+    report.done     - path (None при ошибке), run_id
+    message         - сообщение оператору: level (info, warning, error), text
+"""
+import argparse
+import asyncio
+import functools
+import os
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from threading import Thread, Event as ThreadEvent, Lock
+
+from archive import ResultsArchive
+from instrumentation import configure_event_log, log_event, log_metrics
+from plan_runner import PlanRunner, TestPlan, default_plan, plan_status, describe_measurements, PLANS_FOLDER
+from report_queue import ReportQueue
+from serial_handler import SerialHandler
+from settings import SettingsStore
+from telemetry import TelemetryBuffer
+
+VOLTAGE_INTERVAL = 0.25  # Период рассылки отсчётов напряжения, с
+HISTORY_SIZE = 500  # События, хранимые для опроса через API (GET /api/events)
+UNBUFFERED_EVENTS = {"stand.voltage"}  # Частые события не хранятся в истории
+REPORT_FIELDS = ("operator", "object_name", "block_number", "test_place", "connection_name")
+
+
+class Event:
+    """Событие ядра."""
+
+    def __init__(self, name, stand=None, **data):
+        self.name = name
+        self.stand = stand  # Идентификатор стенда (Stand.id) или None для событий ядра
+        self.data = data
+        self.sequence = 0  # Номер события, присваивается EventBridge.publish
+        self.time = time.time()
+
+    def to_dict(self):
+        return {"event": self.name, "stand": self.stand, "sequence": self.sequence, "time": self.time, **self.data}
+
+
+class EventBridge:
+    """
+    Потокобезопасная рассылка событий ядра подписчикам.
+    publish можно вызывать из любого потока (цикла ядра, потоков чтения SerialHandler); подписчик
+    получает событие через свою функцию dispatch(callback, event) - для Tk это App.call_in_ui,
+    для клиентов asyncio - loop.call_soon_threadsafe. Последние события хранятся для опроса.
+    """
+
+    def __init__(self, history_size=HISTORY_SIZE):
+        self._lock = Lock()
+        self._subscribers = []  # (callback, dispatch, имена событий или None)
+        self._history = deque(maxlen=history_size)
+        self._sequence = 0
+
+    def subscribe(self, callback, dispatch=None, names=None):
+        """
+        :param callback: Функция callback(Event)
+        :param dispatch: Функция dispatch(callback, event), выполняющая callback в потоке подписчика;
+                         None - вызов сразу в потоке, опубликовавшем событие (callback должен быть быстрым)
+        :param names: Имена событий, на которые подписывается callback (None - все)
+        """
+        with self._lock:
+            self._subscribers.append((callback, dispatch, set(names) if names else None))
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = [entry for entry in self._subscribers if entry[0] is not callback]
+
+    def publish(self, name, stand=None, **data):
+        event = Event(name, stand, **data)
+        with self._lock:
+            self._sequence += 1
+            event.sequence = self._sequence
+            if name not in UNBUFFERED_EVENTS:
+                self._history.append(event)
+            subscribers = list(self._subscribers)
+        for callback, dispatch, names in subscribers:
+            if names is not None and name not in names:
+                continue
+            if dispatch is not None:
+                dispatch(callback, event)
+                continue
+            try:
+                callback(event)
+            except Exception as e:
+                log_event("event.handler_failed", f"Ошибка обработки события {name}: {e}", "error", event_name=name)
+        return event
+
+    def history(self, after=0):
+        """События с номером больше after (из хранимых последних HISTORY_SIZE)."""
+        with self._lock:
+            return [event for event in self._history if event.sequence > after]
+
+
+class Stand:
+    """
+    Стенд в ядре: транспорт (SerialHandler со своим потоком чтения), план и последние результаты шагов.
+    Корутины выполняются в цикле ядра; блокирующие операции порта и архива - в пуле потоков цикла,
+    ответы на команды ожидаются через asyncio.wrap_future.
+    """
+
+    def __init__(self, engine, stand_id, port=""):
+        self.engine = engine
+        self.id = stand_id
+        self.port = port
+        self.serial_handler = SerialHandler()
+        self.serial_handler.add_state_listener(lambda state: engine.publish("stand.state", self.id, state=state))
+        self.plan = default_plan()
+        self.step_results = [None] * len(self.plan.steps)  # Последние результаты шагов (StepResult или None)
+        self.running = False
+        self._voltage_task = None
+        self._connection_options = None  # Порт и профиль (словарь) открытого подключения
+        # Подключение и отключение по очереди: автоподключение, PortWatcher и API могут вызвать их одновременно
+        self._connection_lock = asyncio.Lock()
+
+    @property
+    def title(self):
+        return self.port or f"Стенд {self.id}"
+
+    @property
+    def connected(self):
+        """True, пока подключение не закрыто (в том числе во время автоматического переподключения)."""
+        return self.serial_handler.session_active
+
+    def to_dict(self):
+        return {"id": self.id, "port": self.port, "connected": self.connected, "state": self.serial_handler.state,
+                "plan": self.plan.name, "running": self.running,
+                "results": [result.to_dict() if result else None for result in self.step_results]}
+
+    def publish(self, name, **data):
+        return self.engine.publish(name, self.id, **data)
+
+    def use_plan(self, plan):
+        """Делает план текущим; результаты прежнего плана сбрасываются."""
+        if plan is not self.plan:
+            self.plan = plan
+            self.step_results = [None] * len(plan.steps)
+
+    async def connect(self, port, profile):
+        """
+        Открывает подключение с параметрами профиля порта (PortProfile). Открытое подключение к другому
+        порту или с другим профилем закрывается; подключение к тому же порту с тем же профилем не
+        переоткрывается (переоткрытие сбрасывает Arduino), в том числе если оно ещё выполняется.
+        :raises ConnectionError: Если подключиться не удалось
+        """
+        options = (port, profile.to_dict())
+        async with self._connection_lock:
+            if self.connected and options == self._connection_options:
+                return
+            if self.connected:
+                await self._disconnect()
+            self.port = port
+            handler = self.serial_handler
+            handler.response_timeout = profile.response_timeout
+            handler.min_response_timeout = profile.min_response_timeout
+            handler.request_tags = profile.request_tags
+            handler.heartbeat_command = profile.heartbeat_command or None
+            await self.engine.run_blocking(handler.connect, port, **profile.connect_options())
+            if not self.connected:
+                raise ConnectionError(f"Не удалось подключиться к порту {port}")
+            self._connection_options = options
+            self._voltage_task = asyncio.ensure_future(self._publish_voltage())
+
+    async def disconnect(self):
+        async with self._connection_lock:
+            await self._disconnect()
+
+    async def _disconnect(self):
+        self._connection_options = None
+        if self._voltage_task is not None:
+            self._voltage_task.cancel()
+            self._voltage_task = None
+        if self.connected:
+            await self.engine.run_blocking(self.serial_handler.close)
+
+    def reconnect_now(self):
+        """Немедленная попытка переподключения (порт снова появился в системе)."""
+        if self.connected:
+            self.serial_handler.reconnect_now()
+
+    async def set_telemetry(self, rate):
+        """
+        Включает (rate > 0) или выключает быструю телеметрию напряжения.
+        :return: Ответ устройства
+        """
+        if rate:
+            future = self.serial_handler.start_telemetry(rate)
+        else:
+            future = self.serial_handler.stop_telemetry()
+        return await asyncio.wrap_future(future)
+
+    async def _publish_voltage(self):
+        """Рассылает новые отсчёты телеметрии и последнюю строку напряжения, пока подключение открыто."""
+        cursor = self.serial_handler.telemetry.total
+        while self.connected:
+            samples, cursor = self.serial_handler.telemetry.read_since(cursor)
+            self.publish("stand.voltage", samples=samples, latest=self.serial_handler.latest().strip())
+            await asyncio.sleep(VOLTAGE_INTERVAL)
+
+    async def run_plan(self, plan, report_info, indexes=None):
+        """
+        Выполняет план (все шаги или шаги с номерами indexes), сохраняет запуск в архив и ставит
+        сводный отчет в очередь. Результаты шагов, итог и путь к отчету рассылаются событиями.
+        :param report_info: Поля протокола REPORT_FIELDS
+        :return: Список StepResult по всем шагам плана
+        """
+        if self.running:
+            raise RuntimeError(f"{self.title}: проверка уже выполняется")
+        self.running = True
+        try:
+            self.use_plan(plan)
+            self.publish("plan.started", plan=plan.name)
+            runner = PlanRunner(self.serial_handler, plan, on_step=self._on_step)
+            started_at = datetime.now()
+            telemetry_start = self.serial_handler.telemetry.total
+            results = await runner.run_async(indexes)
+            telemetry, _ = self.serial_handler.telemetry.read_since(telemetry_start)
+        finally:
+            self.running = False
+
+        run_id = await self.engine.run_blocking(self.record_run, report_info, results, started_at, telemetry,
+                                                plan.name)
+        trends = await self.engine.trends(report_info["block_number"])
+        selected = [result for result in results if result.attempts]
+        missing = [result.step.name for result in selected if not result.response]
+        aborted_by = runner.aborted_by
+        self.publish("plan.finished", results=results, status=plan_status(results), run_id=run_id,
+                     aborted_by=aborted_by.name if aborted_by else None,
+                     abort_text=results[plan.steps.index(aborted_by)].text if aborted_by else "",
+                     missing=missing, no_response=bool(selected) and len(missing) == len(selected),
+                     voltage_range=TelemetryBuffer.voltage_range(telemetry), trends=trends)
+        if not (selected and len(missing) == len(selected)):
+            # Один сводный отчет по всем шагам; ожидание отчета не задерживает возврат результатов
+            self.engine.spawn(self.report(report_info, run_id, TelemetryBuffer.voltage_range(telemetry), trends,
+                                          results))
+        return results
+
+    def _on_step(self, result):
+        """Результат шага (в цикле ядра): запоминается и рассылается."""
+        if result.step in self.plan.steps[result.index:result.index + 1]:
+            self.step_results[result.index] = result
+        self.publish("step.result", result=result)
+
+    def record_run(self, report_info, results, started_at, telemetry=None, plan=None):
+        """
+        Сохраняет запуск в архив (в пуле потоков).
+        :return: Идентификатор записи или None при ошибке
+        """
+        try:
+            return self.engine.archive.add_run(*(report_info[field] for field in REPORT_FIELDS),
+                                               plan_status(results),
+                                               [{"test_number": result.index, "step_id": result.step.id,
+                                                 "step_name": result.step.name, "result": result.text,
+                                                 "response": result.response, "duration": result.duration,
+                                                 **result.measurements}
+                                                for result in results if result.executed],
+                                               started_at=started_at,
+                                               telemetry=telemetry,
+                                               telemetry_rate=self.serial_handler.telemetry_rate,
+                                               plan=plan)
+        except Exception as e:
+            log_event("archive.failed", f"Ошибка сохранения в архив: {e}", "error", stand=self.id)
+            return None
+
+    @staticmethod
+    def describe_result(result):
+        """Строка результата шага для протокола: итог и измеренные напряжения."""
+        if result is None or not result.executed:
+            return "не выполнялся"
+        if result.measurements:
+            return f"{result.text} ({describe_measurements(result.measurements)})"
+        return result.text
+
+    async def report(self, report_info, run_id=None, voltage_range=None, trends=None, results=None):
+        """
+        Формирует протокол по результатам запуска или по последним результатам шагов текущего плана.
+        :param run_id: Запись архива, к которой привязывается протокол
+        :param trends: Тенденции измерений блока (TrendSummary)
+        :param results: Результаты шагов запуска run_id (None - последние результаты шагов)
+        :return: Путь к протоколу или None при ошибке
+        """
+        trend_lines = None
+        if trends:
+            from analytics import format_trend
+            trend_lines = [format_trend(trend) for trend in trends]
+        if results is None:
+            results = self.step_results
+            names = [step.name for step in self.plan.steps]
+        else:
+            names = [result.step.name for result in results]
+        # Повторные запросы протокола одного блока на этом стенде объединяются очередью отчетов;
+        # протоколы разных запусков - нет: каждый привязывается к своей записи архива
+        path = await self.engine.report((self.id, report_info["block_number"], run_id),
+                                        status=plan_status([result for result in results if result]),
+                                        test_results=[(name, self.describe_result(result))
+                                                      for name, result in zip(names, results)],
+                                        voltage_range=voltage_range, trends=trend_lines, **report_info)
+        if path and run_id is not None:
+            await self.engine.run_blocking(self.engine.archive.set_report_path, run_id, path)
+        self.publish("report.done", path=path, run_id=run_id)
+        return path
+
+
+class Engine:
+    """
+    Цикл asyncio со стендами, архивом, очередью отчетов и расчётом тенденций.
+    В приложении с интерфейсом цикл работает в отдельном потоке (start/stop), без интерфейса -
+    в основном потоке (asyncio.run(engine.serve(...))).
+    """
+
+    def __init__(self, archive_path=None, report_workers=2):
+        self.bridge = EventBridge()
+        self.loop = None
+        self.archive = ResultsArchive(archive_path) if archive_path else ResultsArchive()
+        self.reports = None  # ReportQueue создаётся в цикле ядра
+        self.stands = {}
+        self._report_workers = report_workers
+        self._stands_lock = Lock()
+        self._next_id = 1
+        self._thread = None
+        self._trend_analyzer = None  # TrendAnalyzer создаётся при первом расчёте (False - NumPy нет)
+        self._trend_lock = Lock()
+        self._tasks = set()  # Фоновые задачи цикла (ожидание отчетов), завершаемые при остановке
+
+    def publish(self, name, stand=None, **data):
+        return self.bridge.publish(name, stand, **data)
+
+    # Цикл ядра
+
+    def start(self):
+        """Запускает цикл ядра в отдельном потоке и дожидается его готовности."""
+        ready = ThreadEvent()
+        self._thread = Thread(target=self._run_loop, args=(ready,), name="engine", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def _run_loop(self, ready):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._attach()
+        ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def _attach(self):
+        """Создаёт службы, которым нужен цикл ядра."""
+        self.reports = ReportQueue(dispatch=self.loop.call_soon_threadsafe, workers=self._report_workers)
+        self.reports.warm_up()
+        self.loop.run_in_executor(None, self.warm_up_trends)
+
+    def submit(self, coroutine):
+        """
+        Выполняет корутину в цикле ядра (вызывается из любого потока).
+        :return: concurrent.futures.Future с результатом
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def call(self, callback, *args):
+        """Выполняет обычную функцию в цикле ядра (из любого потока)."""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def spawn(self, coroutine):
+        """Запускает фоновую задачу в цикле ядра; shutdown дожидается её завершения."""
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def run_blocking(self, function, *args, **kwargs):
+        """Выполняет блокирующую функцию в пуле потоков цикла."""
+        return await self.loop.run_in_executor(None, functools.partial(function, *args, **kwargs))
+
+    def stop(self, timeout=30):
+        """Закрывает стенды, дожидается отчетов и останавливает цикл, запущенный start."""
+        if self.loop is None or not self.loop.is_running():
+            return
+        try:
+            self.submit(self.shutdown()).result(timeout)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=5)
+
+    async def shutdown(self):
+        for stand in list(self.stands.values()):
+            await stand.disconnect()
+        await self.run_blocking(self.reports.shutdown)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.run_blocking(self.archive.close)
+        log_metrics()
+
+    async def serve(self, main):
+        """
+        Работа без интерфейса: цикл ядра в текущем потоке.
+        :param main: Функция main(engine) -> корутина со сценарием
+        """
+        self.loop = asyncio.get_running_loop()
+        self._attach()
+        try:
+            return await main(self)
+        finally:
+            await self.shutdown()
+
+    # Стенды
+
+    def add_stand(self, port=""):
+        """Добавляет стенд (из любого потока)."""
+        with self._stands_lock:
+            stand = Stand(self, self._next_id, port)
+            self.stands[stand.id] = stand
+            self._next_id += 1
+        self.publish("stand.added", stand.id, port=port)
+        return stand
+
+    async def remove_stand(self, stand):
+        await stand.disconnect()
+        with self._stands_lock:
+            self.stands.pop(stand.id, None)
+        self.publish("stand.removed", stand.id)
+
+    def stand(self, stand_id):
+        """Стенд по идентификатору или None."""
+        with self._stands_lock:
+            return self.stands.get(stand_id)
+
+    def stand_list(self):
+        with self._stands_lock:
+            return list(self.stands.values())
+
+    # Отчеты и тенденции
+
+    async def report(self, key, **report_args):
+        """
+        Ставит протокол в очередь отчетов и дожидается его формирования.
+        :return: Путь к файлу или None при ошибке
+        """
+        future = self.loop.create_future()
+        self.reports.submit(key, on_done=lambda path: future.done() or future.set_result(path), **report_args)
+        return await future
+
+    def trend_analyzer(self):
+        """Расчёт тенденций по архиву; NumPy загружается при первом обращении. None, если NumPy нет."""
+        with self._trend_lock:
+            if self._trend_analyzer is None:
+                try:
+                    from analytics import TrendAnalyzer
+                    self._trend_analyzer = TrendAnalyzer(self.archive)
+                except ImportError as e:
+                    log_event("trends.unavailable", f"Расчёт тенденций недоступен: {e}", "warning")
+                    self._trend_analyzer = False
+            return self._trend_analyzer or None
+
+    def warm_up_trends(self):
+        """Загружает NumPy и границы выброса по всем измерениям архива в фоне."""
+        analyzer = self.trend_analyzer()
+        if analyzer:
+            analyzer.population_bounds()
+
+    def block_trends(self, block_number=None, object_name=None):
+        """
+        Тенденции измерений блока или объекта (блокирующий вызов, потокобезопасен).
+        :return: Список TrendSummary или None, если расчёт недоступен
+        """
+        analyzer = self.trend_analyzer()
+        if analyzer is None or not (block_number or object_name):
+            return None
+        try:
+            return analyzer.block_trends(block_number, object_name)
+        except Exception as e:
+            log_event("trends.failed", f"Ошибка расчёта тенденций: {e}", "error",
+                      block=block_number, object=object_name)
+            return None
+
+    async def trends(self, block_number=None, object_name=None):
+        return await self.run_blocking(self.block_trends, block_number, object_name)
+
+
+def load_plan(name):
+    """План по имени файла в PLANS_FOLDER или пути; пустое имя - стандартная проверка."""
+    if not name:
+        return default_plan()
+    return TestPlan.load(name if os.path.exists(name) else os.path.join(PLANS_FOLDER, name))
+
+
+def print_event(event):
+    """Вывод событий в консоль при работе без интерфейса."""
+    stand = f"[{event.stand}] " if event.stand is not None else ""
+    data = event.data
+    if event.name == "stand.state":
+        print(f"{stand}Связь: {data['state']}")
+    elif event.name == "step.result":
+        print(f"{stand}{data['result'].step.name}: {Stand.describe_result(data['result'])}")
+    elif event.name == "plan.finished":
+        text = "Успех" if data["status"] == "success" else "Отказ"
+        if data["aborted_by"]:
+            text += f" (прервана: {data['aborted_by']} - {data['abort_text']})"
+        elif data["missing"]:
+            text += f" (нет ответа: {', '.join(data['missing'])})"
+        print(f"{stand}Итог: {text}")
+    elif event.name == "report.done":
+        print(f"{stand}Протокол: {data['path'] or 'ошибка формирования'}")
+    elif event.name == "message":
+        print(f"{stand}{data['text']}")
+
+
+async def run_headless(engine, args, settings):
+    """Сценарий без интерфейса: подключение стендов, args.runs проверок на всех стендах, API."""
+    ports = args.stand or [bench.selected_port for bench in settings.benches if bench.selected_port]
+    plans = {bench.selected_port: bench.plan for bench in settings.benches}
+    stands = []
+    for port in ports:
+        stand = engine.add_stand(port)
+        stand.use_plan(load_plan(args.plan or plans.get(port, "")))
+        try:
+            await stand.connect(port, settings.profile(port))
+            stands.append(stand)
+        except Exception as e:
+            stand.publish("message", level="error", text=f"{port}: {e}")
+
+    api_server = None
+    if args.http:
+        try:
+            from api import serve_api
+        except ImportError as e:
+            print(f"API недоступен (требуется bottle): {e}")
+            return 1
+        host, _, port = args.http.rpartition(":")
+        api_server = serve_api(engine, host or "127.0.0.1", int(port), settings)
+
+    report_info = {"operator": args.operator, "object_name": args.object, "block_number": args.block,
+                   "test_place": args.place, "connection_name": args.connection}
+    failures = 0
+    for _ in range(args.runs):
+        runs = await asyncio.gather(*(stand.run_plan(stand.plan, report_info) for stand in stands),
+                                    return_exceptions=True)
+        for results in runs:
+            if isinstance(results, Exception) or plan_status(results) != "success":
+                failures += 1
+
+    if api_server is not None:
+        await asyncio.Event().wait()  # Работа до Ctrl+C
+    return 1 if failures or len(stands) < len(ports) else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ядро стенда без интерфейса")
+    parser.add_argument("--stand", action="append", help="Порт стенда (можно несколько; по умолчанию - "
+                                                          "стенды из настроек)")
+    parser.add_argument("--plan", default="", help="Файл плана (по умолчанию - план стенда из настроек)")
+    parser.add_argument("--runs", type=int, default=None, help="Число проверок на каждом стенде "
+                                                               "(по умолчанию 1, с --http - 0)")
+    parser.add_argument("--http", help="Адрес локального API, например 127.0.0.1:8080 (нужен bottle)")
+    parser.add_argument("--settings", default=None, help="Файл настроек")
+    for name, title in [("operator", "ФИО оператора"), ("object", "Объект"), ("block", "Номер блока"),
+                        ("place", "Место испытаний"), ("connection", "Наименование присоединения")]:
+        parser.add_argument(f"--{name}", default="", help=title)
+    args = parser.parse_args(argv)
+    if args.runs is None:
+        args.runs = 0 if args.http else 1
+    if args.runs and not (args.operator and args.block):
+        parser.error("для проверки нужны --operator и --block")
+
+    os.makedirs("reports", exist_ok=True)
+    configure_event_log()
+    settings_store = SettingsStore(args.settings) if args.settings else SettingsStore()
+    settings_store.load_async()
+    settings = settings_store.wait()
+    engine = Engine()
+    engine.bridge.subscribe(print_event)
+    try:
+        return asyncio.run(engine.serve(lambda engine: run_headless(engine, args, settings)))
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Пакетная выгрузка протоколов без графического интерфейса.
+
+Примеры:
+    python export_reports.py records.json
+    python export_reports.py records.jsonl --merge object --output exports/2024-11
+    python export_reports.py --from-db --date-from 2024-11-01 --date-to 2024-11-30 --merge date
+"""
+import argparse
+import json
+import os
+import re
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from archive import ResultsArchive, DEFAULT_DB_PATH
+from pdf_report import PDFReport
+
+# Поля записи, которые передаются в PDFReport.generate
+REPORT_FIELDS = ("operator", "object_name", "block_number", "test_place", "connection_name", "status",
+                 "test_results", "date")
+REQUIRED_FIELDS = ("operator", "object_name", "block_number", "test_place", "connection_name", "status")
+
+
+def load_records(path):
+    """
+    Загружает записи испытаний из JSON (список объектов) или JSON Lines (объект на строку).
+    :return: Список словарей с полями REPORT_FIELDS
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        raw_records = json.loads(text)
+    else:
+        raw_records = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    records = []
+    for number, raw in enumerate(raw_records, start=1):
+        missing = [field for field in REQUIRED_FIELDS if not raw.get(field)]
+        if missing:
+            print(f"Запись {number} пропущена: нет полей {', '.join(missing)}")
+            continue
+        records.append({field: raw[field] for field in REPORT_FIELDS if field in raw})
+    return records
+
+
+def safe_name(value):
+    """Преобразует значение в допустимое имя файла."""
+    return re.sub(r'[<>:"/\\|?*\s]+', "_", str(value)).strip("_") or "без_имени"
+
+
+def group_key(record, merge):
+    """Ключ объединения записи: объект или дата испытаний."""
+    if merge == "object":
+        return record["object_name"]
+    return (record.get("date") or "без_даты")[:10]
+
+
+def render_single(jobs):
+    """Формирует отдельные протоколы (выполняется в процессе пула). :return: Количество файлов"""
+    report = PDFReport()
+    rendered = 0
+    for file_path, record in jobs:
+        if report.generate(file_path=file_path, **record):
+            rendered += 1
+    return rendered
+
+
+def render_merged(job):
+    """Формирует многостраничный протокол группы (выполняется в процессе пула). :return: Количество страниц"""
+    file_path, records = job
+    return len(records) if PDFReport().generate_document(file_path, records) else 0
+
+
+def export(records, output_folder, merge=None, workers=None, chunk_size=50):
+    """
+    Формирует протоколы в пуле процессов.
+    :param records: Записи испытаний
+    :param output_folder: Папка для протоколов
+    :param merge: None - файл на запись, "object"/"date" - один файл на объект/дату
+    :param workers: Количество процессов (по умолчанию - число ядер)
+    :param chunk_size: Количество отдельных протоколов на одно задание пула
+    :return: Количество сформированных протоколов
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if merge:
+            groups = defaultdict(list)
+            for record in records:
+                groups[group_key(record, merge)].append(record)
+            jobs = [(os.path.join(output_folder, f"protocols_{safe_name(key)}.pdf"), group)
+                    for key, group in groups.items()]
+            return sum(pool.map(render_merged, jobs))
+
+        jobs = [(os.path.join(output_folder,
+                              f"report_{number:06d}_{safe_name(record['block_number'])}.pdf"), record)
+                for number, record in enumerate(records, start=1)]
+        chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+        return sum(pool.map(render_single, chunks))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетная выгрузка протоколов проверки блоков")
+    parser.add_argument("records", nargs="?", help="Файл записей испытаний (JSON или JSON Lines)")
+    parser.add_argument("--from-db", nargs="?", const=DEFAULT_DB_PATH, metavar="PATH",
+                        help="Брать записи из архива испытаний (по умолчанию reports/archive.sqlite3)")
+    parser.add_argument("--block", help="Отбор записей архива по номеру блока")
+    parser.add_argument("--object", help="Отбор записей архива по объекту")
+    parser.add_argument("--date-from", help="Отбор записей архива с даты ГГГГ-ММ-ДД")
+    parser.add_argument("--date-to", help="Отбор записей архива по дату ГГГГ-ММ-ДД")
+    parser.add_argument("--output", default=os.path.join("reports", "export"), help="Папка для протоколов")
+    parser.add_argument("--merge", choices=["object", "date"],
+                        help="Объединить протоколы в один многостраничный PDF на объект или дату")
+    parser.add_argument("--workers", type=int, default=None, help="Количество процессов")
+    args = parser.parse_args()
+    if not args.records and not args.from_db:
+        parser.error("укажите файл записей или --from-db")
+
+    if args.from_db:
+        archive = ResultsArchive(args.from_db)
+        try:
+            records = archive.report_records(block_number=args.block, object_name=args.object,
+                                             date_from=args.date_from, date_to=args.date_to)
+        except ValueError:
+            parser.error("дата должна быть в формате ГГГГ-ММ-ДД")
+        finally:
+            archive.close()
+    else:
+        records = load_records(args.records)
+    if not records:
+        print("Нет записей для выгрузки.")
+        return
+    count = export(records, args.output, merge=args.merge, workers=args.workers)
+    print(f"Сформировано протоколов: {count} из {len(records)}. Папка: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
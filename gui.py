@@ -1,14 +1,38 @@
 import json
+import platform
 import tkinter as tk
 from tkinter import messagebox, StringVar, ttk
-from threading import Thread
-import serial.tools.list_ports
+import queue
 from datetime import datetime
 import subprocess
 import os
-from serial_handler import SerialHandler
-from pdf_report import PDFReport
+import sys
 import time
+from serial_handler import STATE_CONNECTED, STATE_RECONNECTING, STATE_DOWN
+from archive import default_step_name
+from engine import Engine
+from port_watcher import PortWatcher
+from telemetry import TelemetryBuffer, VOLTAGE_SCALE
+from voltage_chart import VoltageChart
+from instrumentation import metrics, percentile, configure_event_log, log_event, log_metrics
+from settings import SettingsStore, BenchSettings, PortProfile, BAUD_RATES
+from plan_runner import TestPlan, default_plan, list_plans, PLANS_FOLDER
+
+STARTUP_LOG = os.path.join("reports", "startup_times.jsonl")  # Замеры времени запуска (--measure-startup)
+DEFAULT_PLAN_LABEL = "Стандартная проверка (5 тестов)"
+METRICS_LOG_INTERVAL = 60000  # Период записи снимка показателей в журнал событий, мс
+# Цвет индикатора подключения по состоянию связи
+CONNECTION_COLORS = {STATE_CONNECTED: "green", STATE_RECONNECTING: "yellow", STATE_DOWN: "red"}
+
+
+def open_path(path):
+    """Открывает файл или папку средствами операционной системы."""
+    if sys.platform.startswith("win"):
+        os.startfile(path)
+    elif sys.platform == "darwin":
+        subprocess.Popen(["open", path])
+    else:
+        subprocess.Popen(["xdg-open", path])
 
 
 class SplashScreen(tk.Toplevel):
@@ -33,29 +57,64 @@ class SplashScreen(tk.Toplevel):
 
         # Текст заставки
         tk.Label(self, text=splash_text, font=("Arial", 16)).pack(pady=10)
-
-        # Закрытие заставки через 5 секунд и открытие основного окна
-        self.after(5000, self.destroy)
+        # Заставка закрывается в main() сразу по окончании инициализации приложения
 
 
 class PortConfigurationWindow(tk.Toplevel):
-    def __init__(self, master=None, refresh_ports_callback=None, on_select_port=None):
+    """Выбор порта и его профиля подключения (скорость, тайм-ауты, частота телеметрии)."""
+
+    PROFILE_FIELDS = [("baud_rate", "Скорость, бод"), ("target_baud_rate", "Перейти на скорость, бод"),
+                      ("timeout", "Тайм-аут чтения, с"), ("write_timeout", "Тайм-аут записи, с"),
+                      ("inter_byte_timeout", "Пауза между байтами, с"), ("response_timeout", "Срок ответа, с"),
+                      ("min_response_timeout", "Мин. адаптивный срок, с"),
+                      ("telemetry_rate", "Частота телеметрии, Гц"),
+                      ("heartbeat_command", "Контрольная команда"),
+                      ("request_tags", "Идентификаторы запросов")]
+
+    def __init__(self, master=None, port_watcher=None, on_select_port=None, settings=None, port=""):
+        """
+        :param on_select_port: Функция on_select_port(port, profile), вызываемая при подтверждении
+        :param settings: Настройки приложения (профили портов)
+        :param port: Текущий порт стенда
+        """
         super().__init__(master)
         self.title("Настройка подключения")
-        self.geometry("300x200")
+        self.geometry("360x460")
 
-        self.refresh_ports_callback = refresh_ports_callback
+        self.port_watcher = port_watcher
         self.on_select_port = on_select_port
-        self.selected_port = StringVar()
+        self.settings = settings
+        self.selected_port = StringVar(value=port)
+        self.profile_vars = {name: tk.BooleanVar() if PortProfile.FIELDS[name] is bool else StringVar()
+                             for name, _ in self.PROFILE_FIELDS}
 
         self.create_widgets()
+        self.load_profile()
+        # Список портов приходит от фонового PortWatcher; подписка снимается при закрытии окна
+        self.port_watcher.subscribe(self.refresh_ports)
+        self.bind("<Destroy>", self.on_destroy)
 
     def create_widgets(self):
         tk.Label(self, text="Выберите COM-порт:").pack(pady=10)
 
         self.port_menu = ttk.Combobox(self, textvariable=self.selected_port)
         self.port_menu.pack(pady=10)
-        self.refresh_ports()
+        self.port_menu.bind("<<ComboboxSelected>>", lambda event: self.load_profile())
+        self.status_label = tk.Label(self, text="", fg="red")
+        self.status_label.pack()
+
+        profile_frame = tk.Frame(self)
+        profile_frame.pack()
+        for row, (name, label) in enumerate(self.PROFILE_FIELDS):
+            tk.Label(profile_frame, text=label).grid(row=row, column=0, sticky='e')
+            if name in ("baud_rate", "target_baud_rate"):
+                field = ttk.Combobox(profile_frame, textvariable=self.profile_vars[name], width=10,
+                                     values=BAUD_RATES)
+            elif PortProfile.FIELDS[name] is bool:
+                field = tk.Checkbutton(profile_frame, variable=self.profile_vars[name])
+            else:
+                field = tk.Entry(profile_frame, textvariable=self.profile_vars[name], width=12)
+            field.grid(row=row, column=1, sticky='w', padx=5, pady=1)
 
         button_frame = tk.Frame(self)
         button_frame.pack(pady=10)
@@ -63,50 +122,314 @@ class PortConfigurationWindow(tk.Toplevel):
         tk.Button(button_frame, text="Подтвердить", command=self.confirm_port).pack(side=tk.LEFT, padx=5)
         tk.Button(button_frame, text="Отменить", command=self.destroy).pack(side=tk.LEFT, padx=5)
 
-    def refresh_ports(self):
-        ports = [port.device for port in serial.tools.list_ports.comports()]
+    def refresh_ports(self, added, removed, ports):
+        """Обновляет список при изменении набора портов."""
+        if not self.winfo_exists():
+            return
         self.port_menu['values'] = ports
-        if not ports:
-            messagebox.showwarning("Предупреждение", "Нет доступных COM-портов.")
-        self.after(2000, self.refresh_ports)  # Обновление списка каждые 2 секунды
+        self.status_label.config(text="" if ports else "Нет доступных COM-портов.")
+
+    def on_destroy(self, event):
+        if event.widget is self:
+            self.port_watcher.unsubscribe(self.refresh_ports)
+
+    def load_profile(self):
+        """Показывает профиль выбранного порта."""
+        profile = self.settings.profile(self.selected_port.get())
+        for name, var in self.profile_vars.items():
+            var.set(getattr(profile, name))
 
     def confirm_port(self):
         selected_port = self.selected_port.get()
-        if selected_port:
-            self.on_select_port(selected_port)
-            self.destroy()
+        if not selected_port:
+            messagebox.showerror("Ошибка", "Выберите COM-порт", parent=self)
+            return
+        values = {}
+        for name, label in self.PROFILE_FIELDS:
+            try:
+                values[name] = PortProfile.FIELDS[name](self.profile_vars[name].get())
+            except ValueError:
+                messagebox.showerror("Ошибка", f"Некорректное значение: {label}", parent=self)
+                return
+        self.on_select_port(selected_port, PortProfile(**values))
+        self.destroy()
+
+
+class ArchiveWindow(tk.Toplevel):
+    """Просмотр архива испытаний с отбором по блоку, объекту и дате и постраничным переходом."""
+
+    PAGE_SIZE = 100
+    COLUMNS = [
+        ("started_at", "Дата и время", 130), ("operator", "Оператор", 120), ("object_name", "Объект", 120),
+        ("block_number", "Номер блока", 90), ("test_place", "Место испытаний", 110),
+        ("connection_name", "Присоединение", 120), ("status", "Итог", 70),
+    ]
+
+    def __init__(self, master, archive):
+        super().__init__(master)
+        self.title("Архив протоколов")
+        self.geometry("900x500")
+        self.archive = archive
+        self.runs = {}  # Идентификатор строки таблицы -> запись запуска
+        self.page_keys = []  # Ключи (started_at, id) начала каждой открытой страницы
+        self.create_widgets()
+        self.search()
+
+    def create_widgets(self):
+        filter_frame = tk.Frame(self)
+        filter_frame.pack(fill=tk.X, padx=5, pady=5)
+        self.filters = {}
+        for label, key in [("Номер блока", "block_number"), ("Объект", "object_name"),
+                           ("Дата с (ГГГГ-ММ-ДД)", "date_from"), ("по", "date_to")]:
+            tk.Label(filter_frame, text=label).pack(side=tk.LEFT)
+            entry = tk.Entry(filter_frame, width=12)
+            entry.pack(side=tk.LEFT, padx=(2, 8))
+            entry.bind("<Return>", lambda event: self.search())
+            self.filters[key] = entry
+        tk.Button(filter_frame, text="Найти", command=self.search).pack(side=tk.LEFT)
+
+        self.tree = ttk.Treeview(self, columns=[key for key, _, _ in self.COLUMNS], show="headings")
+        for key, title, width in self.COLUMNS:
+            self.tree.heading(key, text=title)
+            self.tree.column(key, width=width)
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=5)
+        self.tree.bind("<Double-1>", lambda event: self.show_results())
+
+        button_frame = tk.Frame(self)
+        button_frame.pack(fill=tk.X, padx=5, pady=5)
+        tk.Button(button_frame, text="< Назад", command=self.previous_page).pack(side=tk.LEFT)
+        tk.Button(button_frame, text="Далее >", command=self.next_page).pack(side=tk.LEFT, padx=5)
+        self.page_label = tk.Label(button_frame, text="")
+        self.page_label.pack(side=tk.LEFT, padx=10)
+        tk.Button(button_frame, text="Открыть папку", command=self.open_folder).pack(side=tk.RIGHT)
+        tk.Button(button_frame, text="Открыть протокол", command=self.open_report).pack(side=tk.RIGHT, padx=5)
+        tk.Button(button_frame, text="Результаты тестов", command=self.show_results).pack(side=tk.RIGHT)
+        tk.Button(button_frame, text="Тенденции", command=self.show_trends).pack(side=tk.RIGHT, padx=5)
+
+    def filter_values(self):
+        return {key: entry.get().strip() or None for key, entry in self.filters.items()}
+
+    def search(self):
+        """Загружает первую страницу по текущим фильтрам."""
+        self.page_keys = [None]
+        self.load_page()
+
+    def load_page(self):
+        try:
+            runs = self.archive.find_runs(limit=self.PAGE_SIZE, after=self.page_keys[-1], **self.filter_values())
+        except ValueError:
+            messagebox.showerror("Ошибка", "Дата должна быть в формате ГГГГ-ММ-ДД", parent=self)
+            return
+        self.tree.delete(*self.tree.get_children())
+        self.runs = {}
+        for run in runs:
+            values = [run[key] or "" for key, _, _ in self.COLUMNS]
+            values[-1] = "Успех" if run["status"] == "success" else "Отказ"
+            item = self.tree.insert("", tk.END, values=values)
+            self.runs[item] = run
+        self.last_run = runs[-1] if len(runs) == self.PAGE_SIZE else None
+        self.page_label.config(text=f"Страница {len(self.page_keys)}")
+
+    def next_page(self):
+        if self.last_run:
+            self.page_keys.append((self.last_run["started_at"], self.last_run["id"]))
+            self.load_page()
+
+    def previous_page(self):
+        if len(self.page_keys) > 1:
+            self.page_keys.pop()
+            self.load_page()
+
+    def selected_run(self):
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showerror("Ошибка", "Выберите запись", parent=self)
+            return None
+        return self.runs[selection[0]]
+
+    def show_results(self):
+        run = self.selected_run()
+        if run:
+            lines = [f"{r['step_name'] or default_step_name(r['test_number'])}: {r['result']} "
+                     f"({r['response'] or 'нет ответа'}, {r['duration'] or 0:.2f} с)"
+                     for r in self.archive.get_results(run["id"])]
+            messagebox.showinfo("Результаты тестов", "\n".join(lines) or "Нет данных", parent=self)
+
+    def show_trends(self):
+        """Тенденции измерений по блоку и объекту из фильтров."""
+        filters = self.filter_values()
+        TrendWindow(self, self.master, filters["block_number"] or "", filters["object_name"] or "")
+
+    def open_report(self):
+        run = self.selected_run()
+        if not run:
+            return
+        if run["report_path"] and os.path.exists(run["report_path"]):
+            open_path(run["report_path"])
         else:
-            messagebox.showerror("Ошибка", "Выберите COM-порт")
+            messagebox.showerror("Ошибка", "Протокол не найден", parent=self)
 
+    def open_folder(self):
+        if os.path.exists("reports"):
+            open_path("reports")
+        else:
+            messagebox.showerror("Ошибка", "Архив не найден: reports", parent=self)
 
-class App(tk.Tk):
-    def __init__(self):
-        super().__init__()
-        self.title("Исправленный стенд НС")
-        self.create_reports_folder()
-        self.serial_handler = SerialHandler()
-        self.pdf_report = PDFReport()
-        self.last_report_path = ""
-        self.selected_port = StringVar()
-        self.auto_connect_var = tk.BooleanVar()
-        self.geometry("800x500")
-        self.test_results = [""] * 5  # Список для хранения результатов тестов
-        self.load_settings()
+
+class TrendWindow(tk.Toplevel):
+    """
+    Тенденции напряжений срабатывания и отпускания по истории блока или объекта: скользящее среднее,
+    дрейф и выбросы за границами Тьюки по измерениям того же шага плана во всём архиве. Расчёт идёт в ядре.
+    """
+
+    COLUMNS = [("test", "Тест", 110), ("count", "Изм.", 50), ("last", "Последнее, В", 90),
+               ("rolling", "Скольз. среднее, В", 115), ("mean", "Среднее, В", 80), ("drift", "Дрейф, В/год", 90),
+               ("bounds", "Норма, В", 100), ("outliers", "Выбросы", 65)]
+
+    def __init__(self, master, app, block_number="", object_name=""):
+        super().__init__(master)
+        self.title("Тенденции измерений")
+        self.geometry("750x350")
+        self.app = app
         self.create_widgets()
+        self.filters["block_number"].insert(0, block_number)
+        self.filters["object_name"].insert(0, object_name)
+        if block_number or object_name:
+            self.calculate()
 
     def create_widgets(self):
-        menu_bar = tk.Menu(self)
-        self.config(menu=menu_bar)
+        filter_frame = tk.Frame(self)
+        filter_frame.pack(fill=tk.X, padx=5, pady=5)
+        self.filters = {}
+        for label, key in [("Номер блока", "block_number"), ("Объект", "object_name")]:
+            tk.Label(filter_frame, text=label).pack(side=tk.LEFT)
+            entry = tk.Entry(filter_frame, width=15)
+            entry.pack(side=tk.LEFT, padx=(2, 8))
+            entry.bind("<Return>", lambda event: self.calculate())
+            self.filters[key] = entry
+        tk.Button(filter_frame, text="Рассчитать", command=self.calculate).pack(side=tk.LEFT)
+
+        self.tree = ttk.Treeview(self, columns=[key for key, _, _ in self.COLUMNS], show="headings")
+        for key, title, width in self.COLUMNS:
+            self.tree.heading(key, text=title)
+            self.tree.column(key, width=width, anchor="w" if key == "test" else "e")
+        self.tree.tag_configure("outlier", foreground="red")
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=5)
+        self.status_label = tk.Label(self, text="", anchor="w")
+        self.status_label.pack(fill=tk.X, padx=5, pady=5)
+
+    def calculate(self):
+        block_number = self.filters["block_number"].get().strip() or None
+        object_name = self.filters["object_name"].get().strip() or None
+        if not block_number and not object_name:
+            messagebox.showerror("Ошибка", "Укажите номер блока или объект", parent=self)
+            return
+        self.status_label.config(text="Расчёт...")
+        self.app.run_in_engine(self.app.engine.trends(block_number, object_name), self.show)
 
-        file_menu = tk.Menu(menu_bar, tearoff=0)
-        file_menu.add_command(label="Настройка подключения", command=self.configure_connection)
-        file_menu.add_command(label="Подключить/отключить", command=self.toggle_connection)
-        file_menu.add_command(label="Печать отчета", command=self.print_report)
-        file_menu.add_command(label="Архив протоколов", command=self.open_archive)
-        file_menu.add_separator()
-        file_menu.add_command(label="Выход", command=self.quit)
-        menu_bar.add_cascade(label="Меню", menu=file_menu)
+    def show(self, trends):
+        """Выводит результат расчёта (в потоке интерфейса)."""
+        if not self.winfo_exists():
+            return
+        self.tree.delete(*self.tree.get_children())
+        if trends is None:
+            self.status_label.config(text="Расчёт тенденций недоступен (требуется NumPy)")
+            return
+        for trend in trends:
+            bounds = "" if trend.low != trend.low else f"{trend.low:.1f}…{trend.high:.1f}"  # nan - нет данных
+            drift = "" if trend.drift != trend.drift else f"{trend.drift:+.2f}"
+            self.tree.insert("", tk.END, tags=("outlier",) if trend.last_outlier else (),
+                             values=[trend.label, trend.count, f"{trend.last:.1f}", f"{trend.rolling:.1f}",
+                                     f"{trend.mean:.1f}", drift, bounds, trend.outliers])
+        self.status_label.config(text="Красным выделены величины, последнее измерение которых вне нормы"
+                                 if trends else "Нет измерений")
+
+
+class DiagnosticsWindow(tk.Toplevel):
+    """
+    Счётчики и гистограммы задержек операций (обновляются раз в секунду).
+    По задержкам видно, что замедляет проверку: устройство (test.round_trip при быстром serial.heartbeat),
+    линия связи (serial.write, serial.heartbeat) или формирование отчетов (report.queue_wait, pdf.render).
+    """
+
+    COLUMNS = [("name", "Операция", 150), ("count", "Кол-во", 70), ("mean", "Средн., мс", 80),
+               ("p50", "p50, мс", 70), ("p90", "p90, мс", 70), ("p99", "p99, мс", 70), ("max", "Макс., мс", 80)]
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.title("Диагностика")
+        self.geometry("650x450")
+        self.create_widgets()
+        self.refresh()
+
+    def create_widgets(self):
+        self.tree = ttk.Treeview(self, columns=[key for key, _, _ in self.COLUMNS], show="headings", height=10)
+        for key, title, width in self.COLUMNS:
+            self.tree.heading(key, text=title)
+            self.tree.column(key, width=width, anchor="w" if key == "name" else "e")
+        self.tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        self.counters = ttk.Treeview(self, columns=["name", "value"], show="headings", height=8)
+        self.counters.heading("name", text="Счётчик")
+        self.counters.heading("value", text="Значение")
+        self.counters.column("value", anchor="e")
+        self.counters.pack(fill=tk.BOTH, expand=True, padx=5)
+
+        button_frame = tk.Frame(self)
+        button_frame.pack(fill=tk.X, padx=5, pady=5)
+        self.uptime_label = tk.Label(button_frame, text="")
+        self.uptime_label.pack(side=tk.LEFT)
+        tk.Button(button_frame, text="Сбросить", command=metrics.reset).pack(side=tk.RIGHT)
+        tk.Button(button_frame, text="Записать в журнал", command=log_metrics).pack(side=tk.RIGHT, padx=5)
+
+    def refresh(self):
+        if not self.winfo_exists():
+            return
+        snapshot = metrics.snapshot()
+        self.tree.delete(*self.tree.get_children())
+        for name, histogram in sorted(snapshot["histograms"].items()):
+            count = histogram["count"]
+            values = [f"{percentile(histogram, p):.1f}" for p in (50, 90, 99)]
+            self.tree.insert("", tk.END, values=[name, count, f"{histogram['total'] / count:.2f}", *values,
+                                                 f"{histogram['max']:.2f}"])
+        self.counters.delete(*self.counters.get_children())
+        for name, value in sorted(snapshot["counters"].items()):
+            self.counters.insert("", tk.END, values=[name, value])
+        self.uptime_label.config(text=f"С момента сброса: {snapshot['uptime']:.0f} с")
+        self.after(1000, self.refresh)
+
+
+class BenchPanel(tk.Frame):
+    """
+    Панель одного испытательного стенда: поля протокола, план испытаний с кнопками шагов
+    и индикаторами, напряжение и график. Подключение, выполнение плана, архив и отчеты - в ядре
+    (engine.Stand): панель ставит задания через App.run_in_engine и отображает события стенда,
+    которые App передаёт в on_engine_event в потоке интерфейса.
+    """
+
+    def __init__(self, app, master, port="", auto_connect=False, plan=""):
+        super().__init__(master)
+        self.app = app
+        self.stand = app.engine.add_stand(port)
+        self.telemetry_var = tk.BooleanVar()
+        self.last_report_path = ""
+        self.selected_port = StringVar(value=port)
+        self.auto_connect_var = tk.BooleanVar(value=auto_connect)
+        self.plan_var = StringVar(value=plan or DEFAULT_PLAN_LABEL)  # Файл плана в PLANS_FOLDER
+        self.plan = self.load_plan(plan)
+        self.stand.use_plan(self.plan)  # Стенд только что создан: цикл ядра его ещё не использует
+        self.create_widgets()
 
+    @property
+    def title(self):
+        return self.selected_port.get() or "Новый стенд"
+
+    @property
+    def profile(self):
+        """Профиль подключения выбранного порта."""
+        return self.app.settings.profile(self.selected_port.get())
+
+    def create_widgets(self):
         # Поля ввода
         labels = [
             "ФИО оператора", "Дата испытаний", "Объект",
@@ -129,32 +452,33 @@ class App(tk.Tk):
                                                                                                            column=1,
                                                                                                            sticky='w')
 
-        self.auto_connect_var = tk.BooleanVar()
         tk.Checkbutton(self, text="Автоматическое подключение", variable=self.auto_connect_var,
-                       command=self.save_settings).grid(row=8, column=2, sticky='w')
-
-        # Кнопки тестов с индикаторами
-        self.result_vars = []
-        for i in range(5):
-            tk.Button(self, text=f"Запуск теста {i + 1}", command=lambda i=i: self.start_test(i)).grid(row=9 + i,
-                                                                                                       column=0)
+                       command=self.app.save_settings).grid(row=8, column=2, sticky='w')
 
-            # Круглый индикатор статуса
-            status_indicator = tk.Canvas(self, width=20, height=20, highlightthickness=0)
-            circle = status_indicator.create_oval(2, 2, 18, 18, fill="gray")
-            status_indicator.grid(row=9 + i, column=1)
+        # План испытаний (последовательность тестов зависит от типа блока)
+        tk.Label(self, text="План испытаний").grid(row=1, column=0, sticky='e')
+        self.plan_menu = ttk.Combobox(self, textvariable=self.plan_var, state="readonly", width=37,
+                                      values=[DEFAULT_PLAN_LABEL] + list_plans())
+        self.plan_menu.grid(row=1, column=1)
+        self.plan_menu.bind("<<ComboboxSelected>>", lambda event: self.on_plan_selected())
 
-            # Поле результата теста
-            result_var = StringVar(value="Поле результата для теста")
-            tk.Label(self, textvariable=result_var, width=30).grid(row=9 + i, column=2)
+        # Кнопки шагов плана с индикаторами
+        self.steps_frame = tk.Frame(self)
+        self.steps_frame.grid(row=9, column=0, rowspan=5, columnspan=3, sticky='nw')
+        self.create_step_widgets()
 
-            # Сохраняем индикатор и переменную результата
-            self.result_vars.append((result_var, status_indicator, circle))
+        tk.Button(self, text="Запуск всех тестов", command=self.start_all_tests).grid(row=9, column=3)
 
         # Напряжение сети
         tk.Label(self, text="Напряжение сети:").grid(row=14, column=0)
         self.voltage_display = tk.Label(self, text="0 V", bg="white", width=10)
         self.voltage_display.grid(row=14, column=1)
+        tk.Checkbutton(self, text="Быстрая телеметрия напряжения", variable=self.telemetry_var,
+                       command=self.toggle_telemetry).grid(row=14, column=2, sticky='w')
+
+        # График напряжения по данным телеметрии
+        self.voltage_chart = VoltageChart(self, width=600, height=120, scale=VOLTAGE_SCALE)
+        self.voltage_chart.grid(row=16, column=0, columnspan=4, pady=5)
 
         # Открытие последнего отчета и дата
         tk.Button(self, text="Открыть последний отчет", command=self.open_last_report).grid(row=15, column=0)
@@ -162,6 +486,11 @@ class App(tk.Tk):
                                           text=f"Дата и время последнего отчета: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}")
         self.last_report_label.grid(row=15, column=1)
 
+        # Тенденции измерений блока по архиву
+        tk.Button(self, text="Тенденции блока", command=self.open_trends).grid(row=17, column=0)
+        self.trend_label = tk.Label(self, text="")
+        self.trend_label.grid(row=17, column=1, columnspan=3, sticky='w')
+
         # Индикатор подключения (круг)
         self.connection_indicator = tk.Canvas(self, width=100, height=100, highlightthickness=0)
         self.connection_indicator.place(relx=0.95, rely=0.95, anchor='se')
@@ -169,200 +498,522 @@ class App(tk.Tk):
         # Изначально красный круг (отключено)
         self.circle = self.connection_indicator.create_oval(10, 10, 90, 90, fill="red")
 
-        # Автоматическая настройка подключения, если включена
+        # Автоматическое подключение, если включено: после создания окна, без сообщений.
+        # Если порта ещё нет, подключение выполнится при его появлении (on_ports_changed)
         if self.auto_connect_var.get() and self.selected_port.get():
-            self.toggle_connection()
+            self.after_idle(self.connect, False)
 
-    def create_reports_folder(self):
-        """Проверка и создание каталога для отчетов."""
-        if not os.path.exists('reports'):
-            os.makedirs('reports')
+    def create_step_widgets(self):
+        """Создаёт кнопку, индикатор и поле результата для каждого шага плана."""
+        for widget in self.steps_frame.winfo_children():
+            widget.destroy()
+        self.result_vars = []
+        for i, step in enumerate(self.plan.steps):
+            tk.Button(self.steps_frame, text=f"Запуск: {step.name}", command=lambda i=i: self.start_test(i)).grid(
+                row=i, column=0, sticky='we')
 
-    def load_settings(self):
-        """Загружает настройки подключения из JSON файла."""
-        try:
-            with open("connection_settings.json", "r") as f:
-                data = json.load(f)
-                return data
-        except FileNotFoundError:
-            return {"selected_port": "", "auto_connect": False}
-        except json.JSONDecodeError:
-            return {"selected_port": "", "auto_connect": False}
+            # Круглый индикатор статуса
+            status_indicator = tk.Canvas(self.steps_frame, width=20, height=20, highlightthickness=0)
+            circle = status_indicator.create_oval(2, 2, 18, 18, fill="gray")
+            status_indicator.grid(row=i, column=1)
 
-    def save_settings(self):
-        """Сохраняет настройки в файл"""
-        settings = {
-            "selected_port": self.selected_port.get(),
-            "auto_connect": self.auto_connect_var.get()
-        }
-        with open("settings.json", "w") as f:
-            json.dump(settings, f)
+            # Поле результата теста
+            result_var = StringVar(value="Поле результата для теста")
+            tk.Label(self.steps_frame, textvariable=result_var, width=30).grid(row=i, column=2)
 
-    def create_reports_folder(self):
-        """Проверка и создание каталога для отчетов."""
-        if not os.path.exists('reports'):
-            os.makedirs('reports')
+            # Сохраняем индикатор и переменную результата
+            self.result_vars.append((result_var, status_indicator, circle))
 
-    def update_voltage_display(self):
-        """Обновление значения напряжения в реальном времени"""
-        if self.serial_handler.connection and self.serial_handler.connection.is_open:
-            try:
-                # Прочитаем данные с Arduino, предположим, что данные приходят в виде "3.3"
-                voltage_data = self.serial_handler.read_data()
-                if voltage_data:
-                    voltage = voltage_data.strip()  # Очистка от лишних пробелов
-                    self.voltage_display.config(text=f"{voltage} В")
-                else:
-                    self.voltage_display.config(text="Нет данных")
-            except Exception as e:
-                self.voltage_display.config(text="Ошибка чтения")
-        self.after(1000, self.update_voltage_display)  # Обновление каждую секунду
+    @staticmethod
+    def load_plan(name):
+        """
+        Загружает план из PLANS_FOLDER; при пустом имени или ошибке - стандартная проверка из пяти тестов.
+        """
+        if not name or name == DEFAULT_PLAN_LABEL:
+            return default_plan()
+        try:
+            return TestPlan.load(os.path.join(PLANS_FOLDER, name))
+        except ValueError as e:
+            messagebox.showerror("Ошибка", f"{e}\nИспользуется стандартная проверка.")
+            return default_plan()
+
+    @property
+    def plan_file(self):
+        """Имя файла выбранного плана ("" - стандартная проверка)."""
+        plan = self.plan_var.get()
+        return "" if plan == DEFAULT_PLAN_LABEL else plan
+
+    def on_plan_selected(self):
+        """Смена плана испытаний: кнопки шагов создаются заново, выбор сохраняется в настройках."""
+        self.plan = self.load_plan(self.plan_var.get())
+        self.create_step_widgets()
+        self.app.engine.call(self.stand.use_plan, self.plan)
+        self.app.save_settings()
+
+    @property
+    def connected(self):
+        """True, пока подключение не закрыто (в том числе во время автоматического переподключения)."""
+        return self.stand.connected
+
+    def on_engine_event(self, event):
+        """События стенда из ядра (в потоке интерфейса)."""
+        data = event.data
+        if event.name == "stand.state":
+            self.on_connection_state(data["state"])
+        elif event.name == "stand.voltage":
+            self.on_voltage(data["samples"], data["latest"])
+        elif event.name == "step.result":
+            self.handle_step_result(data["result"])
+        elif event.name == "plan.finished":
+            self.on_plan_finished(data)
+        elif event.name == "report.done":
+            self.on_report_generated(data["path"])
+
+    def on_voltage(self, samples, latest):
+        """
+        Обновление значения напряжения в реальном времени (событие stand.voltage).
+        При быстрой телеметрии показывается минимум и максимум отсчётов с предыдущего события,
+        полные данные остаются в буфере телеметрии для отчета.
+        """
+        if not self.winfo_exists():
+            return  # Стенд удалён
+        # График скрытой вкладки не перерисовывается
+        if self.winfo_ismapped():
+            self.voltage_chart.push(samples)
+        voltage_range = TelemetryBuffer.voltage_range(samples)
+        if voltage_range:
+            self.voltage_display.config(text=f"{voltage_range[0]:.1f}–{voltage_range[1]:.1f} В")
+        elif latest:
+            # Предположим, что данные приходят в виде "3.3"
+            self.voltage_display.config(text=f"{latest} В")
+        else:
+            self.voltage_display.config(text="Нет данных")
+
+    def toggle_telemetry(self):
+        """Включает или выключает быструю телеметрию напряжения на устройстве."""
+        if not self.connected:
+            self.telemetry_var.set(False)
+            messagebox.showerror("Ошибка", "Соединение не установлено")
+            return
+        if self.telemetry_var.get():
+            rate = self.profile.telemetry_rate
+            self.voltage_chart.set_sample_rate(rate)
+            self.app.run_in_engine(self.stand.set_telemetry(rate), self.on_telemetry_reply, self.on_telemetry_reply)
+        else:
+            self.app.run_in_engine(self.stand.set_telemetry(0), on_error=lambda error: None)
+
+    def on_telemetry_reply(self, reply):
+        """Ответ устройства на включение телеметрии (строка или исключение)."""
+        if isinstance(reply, Exception) or "ERROR" in reply:
+            self.telemetry_var.set(False)
+            messagebox.showerror("Ошибка", "Устройство не поддерживает быструю телеметрию")
 
     def update_indicator(self, color):
         """Обновляет цвет индикатора подключения."""
         self.connection_indicator.itemconfig(self.circle, fill=color)
 
-    def toggle_connection(self):
-        """Переключает состояние подключения к порту."""
-        port = self.selected_port.get()
-        if self.serial_handler.connection and self.serial_handler.connection.is_open:
-            # Закрываем подключение
-            self.serial_handler.connection.close()
-            self.update_indicator("red")
-            messagebox.showinfo("Информация", "Подключение закрыто.")
+    def on_connection_state(self, state):
+        """Состояние связи изменилось: зелёный - подключено, жёлтый - переподключение, красный - нет связи."""
+        if self.winfo_exists():
+            self.update_indicator(CONNECTION_COLORS[state])
+
+    def toggle_connection(self, show_messages=True):
+        """
+        Переключает состояние подключения к порту.
+        :param show_messages: Показывать окна сообщений (False - при автоматическом переподключении)
+        """
+        if self.connected:
+            self.disconnect(show_messages)
         else:
-            try:
-                # Открываем подключение
-                self.serial_handler.connect(port, 9600)
-                if self.serial_handler.connection and self.serial_handler.connection.is_open:
-                    self.update_indicator("green")
-                    messagebox.showinfo("Информация", "Успешное подключение.")
-                else:
-                    raise Exception("Не удалось подключиться")
-            except Exception as e:
-                self.update_indicator("red")
-                messagebox.showerror("Ошибка", f"Не удалось подключиться: {e}")
+            self.connect(show_messages)
+
+    def connect(self, show_messages=True):
+        """
+        Открывает подключение с параметрами из профиля порта (прежнее подключение с другими
+        параметрами закрывается, с теми же - остаётся открытым).
+        """
+        port = self.selected_port.get()
+        if self.app.port_in_use(port, self):
+            if show_messages:
+                messagebox.showerror("Ошибка", f"Порт {port} уже используется другим стендом")
+            return
+        self.app.run_in_engine(self.stand.connect(port, self.profile),
+                               lambda _: show_messages and messagebox.showinfo("Информация", "Успешное подключение."),
+                               lambda error: self.on_connect_failed(error, show_messages))
+
+    def on_connect_failed(self, error, show_messages):
+        self.update_indicator("red")
+        if show_messages:
+            messagebox.showerror("Ошибка", f"Не удалось подключиться: {error}")
+
+    def disconnect(self, show_messages=True):
+        """Закрывает подключение (вместе с фоновым потоком чтения)."""
+        self.app.run_in_engine(self.stand.disconnect(),
+                               lambda _: show_messages and messagebox.showinfo("Информация", "Подключение закрыто."),
+                               lambda error: show_messages and messagebox.showerror(
+                                   "Ошибка", f"Не удалось закрыть подключение: {error}"))
+
+    def on_ports_changed(self, added, removed, ports):
+        """
+        Реакция на появление и исчезновение портов. Обрыв открытого подключения обрабатывает
+        SerialHandler (переподключение с очередью команд); при повторном появлении порта попытка
+        переподключения выполняется сразу. Закрытое подключение восстанавливается, если включено
+        автоподключение.
+        """
+        port = self.selected_port.get()
+        if not port or port not in added:
+            return
+        if self.connected:
+            if self.stand.serial_handler.state != STATE_CONNECTED:
+                self.stand.reconnect_now()
+        elif self.auto_connect_var.get():
+            self.connect(show_messages=False)
+
+    def validate_entries(self):
+        """Проверяет заполнение обязательных полей и подсвечивает незаполненные."""
+        if all(entry.get() for entry in self.entries.values()):
+            return True
+        for label, entry in self.entries.items():
+            if not entry.get():
+                entry.config(bg="red")
+            else:
+                entry.config(bg="white")
+        messagebox.showerror("Ошибка", "Заполните все обязательные поля")
+        return False
+
+    def report_info(self):
+        """Поля протокола для ядра (читаются в потоке интерфейса)."""
+        return {"operator": self.entries["ФИО оператора"].get(),
+                "object_name": self.entries["Объект"].get(),
+                "block_number": self.entries["Номер блока"].get(),
+                "test_place": self.entries["Место испытаний"].get(),
+                "connection_name": self.entries["Наименование присоединения"].get()}
 
     def start_test(self, test_number):
-        if not all(entry.get() for entry in self.entries.values()):
-            # Подсвечиваем незаполненные поля
-            for label, entry in self.entries.items():
-                if not entry.get():
-                    entry.config(bg="red")
-                else:
-                    entry.config(bg="white")
-            messagebox.showerror("Ошибка", "Заполните все обязательные поля")
+        """Запуск одного шага плана (зависимости от других шагов не учитываются)."""
+        self.run_plan([test_number])
+
+    def start_all_tests(self):
+        """
+        Запуск всех шагов плана: независимые шаги отправляются устройству подряд без ожидания ответов,
+        результаты отображаются по мере поступления, при неуспехе критичного шага проверка прекращается.
+        В конце формируется один сводный отчет.
+        """
+        self.run_plan()
+
+    def run_plan(self, indexes=None):
+        """
+        Выполняет план (все шаги или шаги с номерами indexes) в ядре. Результаты шагов, итог
+        и протокол приходят событиями стенда.
+        """
+        if not self.validate_entries():
+            return
+        self.app.run_in_engine(self.stand.run_plan(self.plan, self.report_info(), indexes),
+                               on_error=lambda error: messagebox.showerror("Ошибка", str(error)))
+
+    def on_plan_finished(self, data):
+        """Итог проверки (событие plan.finished): тенденции блока и сообщения оператору."""
+        self.show_trends(data["trends"])
+        if data["no_response"]:
+            messagebox.showerror("Ошибка", f"{self.title}: нет ответа от устройства")
+        elif data["aborted_by"]:
+            messagebox.showwarning("Предупреждение",
+                                   f"{self.title}: проверка прервана - {data['aborted_by']}: {data['abort_text']}")
+        elif data["missing"]:
+            messagebox.showwarning("Предупреждение",
+                                   f"{self.title}: нет ответа для тестов: {', '.join(data['missing'])}")
+
+    def show_trends(self, trends):
+        """Показывает под графиком, какие величины блока вышли за норму (в потоке интерфейса)."""
+        if not trends:
+            self.trend_label.config(text="")
             return
+        outliers = [trend.label for trend in trends if trend.last_outlier]
+        if outliers:
+            self.trend_label.config(text=f"Вне нормы по архиву: {'; '.join(outliers)}", fg="red")
+        else:
+            self.trend_label.config(text="Измерения блока в пределах нормы по архиву", fg="black")
 
-        def test_operation():
-            command = ["UNUSED"] * 5
-            command[test_number] = "START"
-            self.serial_handler.send_command(";".join(command) + "\n")
+    def open_trends(self):
+        TrendWindow(self, self.app, self.entries["Номер блока"].get(), "")
 
-            time.sleep(2)  # Задержка для получения ответа
+    def on_report_generated(self, report_path):
+        """Отчет сформирован (событие report.done)."""
+        if not report_path:
+            messagebox.showerror("Ошибка", "Не удалось сформировать отчет")
+            return
+        self.last_report_path = report_path
+        self.last_report_label.config(
+            text=f"Дата и время последнего отчета: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}")
+
+    def handle_step_result(self, result):
+        """Отображает результат шага плана (в потоке интерфейса)."""
+        if result.step not in self.plan.steps[result.index:result.index + 1]:
+            return  # План сменили во время проверки
+        result_var, status_indicator, circle = self.result_vars[result.index]
+        status_indicator.itemconfig(circle, fill=result.color)
+        result_var.set(result.text)
 
-            response = self.serial_handler.read_data()
+    def configure_connection(self):
+        PortConfigurationWindow(master=self, port_watcher=self.app.port_watcher, on_select_port=self.on_port_selected,
+                                settings=self.app.settings, port=self.selected_port.get())
 
-            if response:
-                self.handle_test_response(test_number, response)
-                self.generate_report_after_test()  # Генерация отчета после теста
-            else:
-                messagebox.showerror("Ошибка", "Нет ответа от устройства")
+    def on_port_selected(self, port, profile):
+        """Вызывается, когда порт и его профиль выбраны."""
+        self.selected_port.set(port)
+        self.app.update_bench_title(self)
+        # Автоматически сохраняем настройки
+        self.app.settings_store.update_profile(port, profile)
+        self.app.save_settings()
 
-        Thread(target=test_operation).start()
+        # Если автоподключение включено, подключаемся заново (к новому порту и с новым профилем)
+        if self.auto_connect_var.get():
+            self.connect()
 
-    def generate_report_after_test(self):
-        """Генерация отчета после выполнения теста"""
+    def print_report(self):
+        """Печать отчета по последним результатам шагов"""
         if not self.entries["ФИО оператора"].get():
             messagebox.showerror("Ошибка", "Заполните данные оператора")
             return
+        self.app.run_in_engine(self.stand.report(self.report_info()),
+                               on_error=lambda error: messagebox.showerror("Ошибка",
+                                                                           f"Не удалось сформировать отчет: {error}"))
 
-        report_data = {key: entry.get() for key, entry in self.entries.items()}
-        test_results = [var.get() for var, _ in self.result_vars]
-
-        # Создание папки reports, если она не существует
-        reports_folder = "reports"
-        if not os.path.exists(reports_folder):
-            os.makedirs(reports_folder)
+    def open_last_report(self):
+        """Открытие последнего отчета"""
+        if self.last_report_path:
+            open_path(self.last_report_path)
+        else:
+            messagebox.showerror("Ошибка", "Отчет не найден")
 
-        # Генерация отчета
-        report_path = self.pdf_report.generate(report_data["ФИО оператора"],
-                                               report_data["Объект"],
-                                               report_data["Номер блока"],
-                                               report_data["Место испытаний"],
-                                               report_data["Наименование присоединения"],
-                                               "success" if "OK" in test_results else "failure")
+    def close(self):
+        """Закрывает подключение и удаляет стенд из ядра."""
+        self.app.run_in_engine(self.app.engine.remove_stand(self.stand),
+                               on_error=lambda error: messagebox.showerror("Ошибка",
+                                                                           f"Ошибка закрытия стенда: {error}"))
 
-        # Отображение сообщения о завершении
-        messagebox.showinfo("Информация", f"Отчет успешно сгенерирован!\nСохранен по пути: {report_path}")
 
-    def handle_test_response(self, test_number, response):
-        """Обрабатывает ответ от устройства."""
-        result_var, status_indicator, circle = self.result_vars[test_number]
+class App(tk.Tk):
+    """Главное окно: вкладка на каждый стенд; все стенды работают одновременно."""
 
+    def __init__(self):
+        super().__init__()
+        self.title("Исправленный стенд НС")
+        self._ui_queue = queue.Queue()  # Вызовы из рабочих потоков, выполняемые в цикле Tk
+        self.benches = []
+        self.geometry("800x700")
+        # Файл настроек читается в фоне, пока создаются окна и службы; вкладки стендов создаются
+        # по окончании чтения в потоке интерфейса (create_benches), цикл Tk его не ждёт
+        self.settings_store = SettingsStore()
+        self.settings_store.load_async(lambda settings: self.call_in_ui(self.create_benches, settings))
+
+    @property
+    def settings(self):
+        return self.settings_store.settings
+
+    def initialize(self):
+        """
+        Создаёт службы (пока показана заставка); вкладки стендов появляются, когда прочитаны настройки.
+        Тяжёлые модули (reportlab, NumPy) загружаются в фоне, список портов перечисляет PortWatcher в своём потоке.
+        """
+        self.create_reports_folder()
+        configure_event_log()
+        # Подключения, проверки, архив и отчеты - в ядре (цикл asyncio в своём потоке);
+        # события ядра передаются в поток интерфейса через call_in_ui
+        self.engine = Engine()
+        self.engine.start()
+        self.engine.bridge.subscribe(self.on_engine_event, dispatch=self.call_in_ui)
+        self.archive = self.engine.archive
+        self.port_watcher = PortWatcher(dispatch=self.call_in_ui)
+        self.create_widgets()
+        self.port_watcher.subscribe(self.on_ports_changed)
+        self.port_watcher.start()
+        self.process_ui_queue()
+        self.after(METRICS_LOG_INTERVAL, self.log_metrics_periodically)
+        self.protocol("WM_DELETE_WINDOW", self.on_exit)
+
+    def create_benches(self, settings):
+        """Создаёт вкладки стендов из прочитанных настроек (в потоке интерфейса)."""
+        for bench_settings in settings.benches:
+            self.add_bench(bench_settings.selected_port, bench_settings.auto_connect, bench_settings.plan)
+        if not self.benches:
+            self.add_bench()
+
+    def call_in_ui(self, callback, *args):
+        """Передаёт вызов из рабочего потока в поток интерфейса (Tk не потокобезопасен)."""
+        self._ui_queue.put((callback, args))
+
+    def run_in_engine(self, coroutine, on_done=None, on_error=None):
+        """
+        Выполняет корутину в цикле ядра; on_done(результат) или on_error(исключение) вызываются
+        в потоке интерфейса. Ошибка записывается в журнал событий в любом случае.
+        """
+        future = self.engine.submit(coroutine)
+        future.add_done_callback(lambda future: self.call_in_ui(self._engine_done, future, on_done, on_error))
+
+    @staticmethod
+    def _engine_done(future, on_done, on_error):
         try:
-            if "ERROR" in response:
-                result = "Ошибка"
-                status_indicator.itemconfig(circle, fill="red")
-            elif "OK" in response:
-                result = "Успех"
-                status_indicator.itemconfig(circle, fill="green")
-            else:
-                result = "Неизвестный результат"
-                status_indicator.itemconfig(circle, fill="gray")
-
-            result_var.set(result)
+            result = future.result()
         except Exception as e:
-            result_var.set(f"Ошибка: {e}")
-            status_indicator.itemconfig(circle, fill="red")
+            log_event("ui.engine_failed", f"Ошибка операции ядра: {e}", "error")
+            if on_error:
+                on_error(e)
+            return
+        if on_done:
+            on_done(result)
+
+    def on_engine_event(self, event):
+        """Передаёт событие ядра панели его стенда (в потоке интерфейса)."""
+        for bench in self.benches:
+            if bench.stand.id == event.stand:
+                bench.on_engine_event(event)
+
+    def process_ui_queue(self):
+        """Выполняет вызовы, переданные рабочими потоками через call_in_ui."""
+        while True:
+            try:
+                callback, args = self._ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                log_event("ui.callback_failed", f"Ошибка обработки события интерфейса: {e}", "error",
+                          callback=getattr(callback, "__qualname__", repr(callback)))
+        self.after(50, self.process_ui_queue)
 
-    def configure_connection(self):
-        PortConfigurationWindow(master=self, on_select_port=self.on_port_selected)
+    def create_widgets(self):
+        menu_bar = tk.Menu(self)
+        self.config(menu=menu_bar)
 
-    def on_port_selected(self, port):
-        """Вызывается, когда порт выбран."""
-        self.selected_port.set(port)
-        # Автоматически сохраняем настройки
+        file_menu = tk.Menu(menu_bar, tearoff=0)
+        file_menu.add_command(label="Настройка подключения", command=lambda: self.current_bench().configure_connection())
+        file_menu.add_command(label="Подключить/отключить", command=lambda: self.current_bench().toggle_connection())
+        file_menu.add_command(label="Печать отчета", command=lambda: self.current_bench().print_report())
+        file_menu.add_command(label="Архив протоколов", command=self.open_archive)
+        file_menu.add_command(label="Тенденции измерений", command=lambda: TrendWindow(self, self))
+        file_menu.add_command(label="Диагностика", command=lambda: DiagnosticsWindow(self))
+        file_menu.add_separator()
+        file_menu.add_command(label="Выход", command=self.on_exit)
+        menu_bar.add_cascade(label="Меню", menu=file_menu)
+
+        bench_menu = tk.Menu(menu_bar, tearoff=0)
+        bench_menu.add_command(label="Добавить стенд", command=self.add_bench)
+        bench_menu.add_command(label="Удалить стенд", command=self.remove_current_bench)
+        menu_bar.add_cascade(label="Стенды", menu=bench_menu)
+
+        self.notebook = ttk.Notebook(self)
+        self.notebook.pack(fill=tk.BOTH, expand=True)
+
+    def add_bench(self, port="", auto_connect=False, plan=""):
+        """Добавляет вкладку стенда."""
+        bench = BenchPanel(self, self.notebook, port=port, auto_connect=auto_connect, plan=plan)
+        self.benches.append(bench)
+        self.notebook.add(bench, text=bench.title)
+        self.notebook.select(bench)
+        return bench
+
+    def remove_current_bench(self):
+        """Закрывает подключение и удаляет вкладку текущего стенда."""
+        if len(self.benches) == 1:
+            messagebox.showerror("Ошибка", "Нельзя удалить единственный стенд")
+            return
+        bench = self.current_bench()
+        if not messagebox.askyesno("Подтверждение", f"Удалить стенд {bench.title}?"):
+            return
+        bench.close()
+        self.benches.remove(bench)
+        self.notebook.forget(bench)
+        bench.destroy()
         self.save_settings()
 
-        # Если автоподключение включено, пытаемся подключиться
-        if self.auto_connect_var.get():
-            self.toggle_connection()
+    def current_bench(self):
+        return self.nametowidget(self.notebook.select())
 
-    def print_report(self):
-        """Печать отчета"""
-        if not self.entries["ФИО оператора"].get():
-            messagebox.showerror("Ошибка", "Заполните данные оператора")
-            return
+    def update_bench_title(self, bench):
+        self.notebook.tab(bench, text=bench.title)
 
-        report_data = {key: entry.get() for key, entry in self.entries.items()}
-        test_results = [var.get() for var, _ in self.result_vars]
+    def on_ports_changed(self, added, removed, ports):
+        for bench in self.benches:
+            bench.on_ports_changed(added, removed, ports)
 
-        self.pdf_report.generate(report_data, test_results)
-        messagebox.showinfo("Информация", "Отчет успешно сгенерирован!")
+    def port_in_use(self, port, bench):
+        """Проверяет, не подключён ли порт к другому стенду."""
+        return any(other is not bench and other.connected and other.selected_port.get() == port
+                   for other in self.benches)
 
-    def open_last_report(self):
-        """Открытие последнего отчета"""
-        if self.last_report_path:
-            subprocess.Popen(["open", self.last_report_path])
-        else:
-            messagebox.showerror("Ошибка", "Отчет не найден")
+    def create_reports_folder(self):
+        """Проверка и создание каталога для отчетов."""
+        if not os.path.exists('reports'):
+            os.makedirs('reports')
 
-    def open_archive(self):
-        """Открытие архива отчетов"""
-        archive_folder = "reports"
-        if os.path.exists(archive_folder):
-            # Открытие папки в проводнике Windows
-            subprocess.Popen(["explorer", archive_folder])
-        else:
-            messagebox.showerror("Ошибка", f"Архив не найден: {archive_folder}")
+    def save_settings(self):
+        """Передаёт настройки стендов на отложенное сохранение (запись выполняется в фоновом потоке)."""
+        self.settings_store.update_benches(BenchSettings(bench.selected_port.get(), bench.auto_connect_var.get(),
+                                                         bench.plan_file)
+                                           for bench in self.benches)
+
+    def on_exit(self):
+        """Завершение работы: ядро закрывает подключения и дожидается формирования отчетов."""
+        self.port_watcher.stop()
+        try:
+            self.engine.stop()
+        finally:
+            # Ядро могло не успеть завершить работу (TimeoutError) - настройки сохраняются в любом случае
+            self.settings_store.flush()
+            self.quit()
 
+    def log_metrics_periodically(self):
+        """Снимок показателей в журнале событий (python instrumentation.py выводит последний)."""
+        log_metrics()
+        self.after(METRICS_LOG_INTERVAL, self.log_metrics_periodically)
 
-def main():
+    def open_archive(self):
+        """Открытие архива протоколов"""
+        ArchiveWindow(self, self.archive)
+
+
+def record_startup_time(phases):
+    """
+    Печатает длительность этапов запуска и добавляет замер в STARTUP_LOG (строка JSON).
+    :param phases: Список (этап, секунды от старта процесса)
+    """
+    entry = {"date": datetime.now().isoformat(timespec="seconds"), "host": platform.node()}
+    for name, seconds in phases:
+        entry[name] = round(seconds * 1000, 1)
+        print(f"{name:12} {seconds * 1000:8.1f} мс")
+    try:
+        with open(STARTUP_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"Ошибка записи замера запуска: {e}")
+
+
+def main(started=None, measure_startup=False):
+    """
+    Запуск приложения.
+    :param started: time.perf_counter() в начале процесса (до импорта модулей)
+    :param measure_startup: Замерить время запуска, записать его в STARTUP_LOG и завершить работу
+    """
+    started = time.perf_counter() if started is None else started
+    phases = [("imports", time.perf_counter() - started)]
     root = App()
-    # Показываем заставку перед запуском основного окна
-    splash = SplashScreen(root)
     root.withdraw()  # Скрываем основное окно на время заставки
-    splash.wait_window()  # Ждём закрытия заставки
+    # Показываем заставку, пока создаются службы и вкладки стендов
+    splash = SplashScreen(root)
+    splash.update()
+    phases.append(("splash", time.perf_counter() - started))
+    root.initialize()
+    phases.append(("initialized", time.perf_counter() - started))
+    splash.destroy()
     root.deiconify()  # Показываем основное окно
+
+    if measure_startup:
+        def on_ready():
+            root.update()  # Основное окно отрисовано - приложение готово к работе
+            phases.append(("ready", time.perf_counter() - started))
+            record_startup_time(phases)
+            root.on_exit()
+        root.after_idle(on_ready)
     root.mainloop()
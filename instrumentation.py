@@ -0,0 +1,214 @@
+"""
+Счётчики, гистограммы задержек и журнал событий.
+
+    python instrumentation.py                       # гистограммы из последнего снимка в журнале
+    python instrumentation.py reports/events.jsonl --all
+
+Операции (задержки, мс):
+    serial.write       - запись команды в порт
+    serial.readline    - ожидание строки в read_data
+    serial.parse       - разбор принятого блока данных (строки и кадры телеметрии)
+    serial.round_trip  - от записи команды до ответа (прочие запросы)
+    serial.heartbeat   - контрольная команда: задержка линии связи без работы устройства
+    test.round_trip    - от записи команды теста до ответа: работа устройства + линия связи
+    report.queue_wait  - ожидание отчета в очереди (включая окно объединения)
+    pdf.render         - формирование PDF одного протокола (pdf.render_document - многостраничного)
+"""
+import argparse
+import bisect
+import json
+import logging
+import logging.handlers
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from threading import Lock
+
+DEFAULT_LOG_PATH = os.path.join("reports", "events.jsonl")
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUPS = 5
+# Верхние границы интервалов гистограммы, мс (последний интервал - всё, что больше)
+BUCKET_BOUNDS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class Histogram:
+    """Гистограмма задержек с постоянными границами интервалов (память не растёт с числом замеров)."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        """:param value: Задержка, мс"""
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def snapshot(self):
+        return {"count": self.count, "total": self.total, "min": self.min, "max": self.max,
+                "buckets": list(self.buckets)}
+
+
+def percentile(snapshot, percent):
+    """
+    Оценка перцентиля по снимку гистограммы: верхняя граница интервала, в который он попадает.
+    :return: Задержка, мс, или None, если замеров нет
+    """
+    if not snapshot["count"]:
+        return None
+    rank = snapshot["count"] * percent / 100
+    cumulative = 0
+    for bound, count in zip(BUCKET_BOUNDS + (None,), snapshot["buckets"]):
+        cumulative += count
+        if cumulative >= rank:
+            return snapshot["max"] if bound is None else min(bound, snapshot["max"])
+    return snapshot["max"]
+
+
+class Metrics:
+    """Потокобезопасный набор счётчиков и гистограмм задержек по имени операции."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._counters = {}
+        self._histograms = {}
+        self.started = time.time()
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        """Добавляет замер длительности операции name."""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.add(seconds * 1000)
+
+    @contextmanager
+    def timed(self, name):
+        """Замеряет длительность блока with."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        """:return: {"counters": {...}, "histograms": {имя: снимок гистограммы}, "uptime": с}"""
+        with self._lock:
+            return {"counters": dict(self._counters),
+                    "histograms": {name: h.snapshot() for name, h in self._histograms.items()},
+                    "uptime": time.time() - self.started}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.started = time.time()
+
+
+metrics = Metrics()
+
+# Журнал событий: предупреждения и ошибки выводятся в консоль всегда,
+# все события - в файл JSON lines после configure_event_log (до этого события уровня info не формируются)
+logger = logging.getLogger("stand")
+logger.setLevel(logging.WARNING)
+logger.propagate = False
+_console = logging.StreamHandler()
+_console.setLevel(logging.WARNING)
+logger.addHandler(_console)
+LEVELS = {"debug": logging.DEBUG, "info": logging.INFO, "warning": logging.WARNING, "error": logging.ERROR}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {"time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+                 "level": record.levelname.lower(), "event": getattr(record, "event", ""),
+                 "thread": record.threadName, "message": record.getMessage()}
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_event_log(path=DEFAULT_LOG_PATH, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS):
+    """Включает запись событий в файл JSON lines с ротацией (path, path.1, ... path.<backups>)."""
+    for handler in list(logger.handlers):
+        if isinstance(handler, logging.handlers.RotatingFileHandler):
+            logger.removeHandler(handler)
+            handler.close()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+    handler.setFormatter(JsonLinesFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+def log_event(event, message="", level="info", **fields):
+    """
+    Записывает событие в журнал.
+    :param event: Имя события (например, "serial.connected")
+    :param message: Текст для оператора
+    :param level: debug, info, warning или error
+    :param fields: Дополнительные поля записи JSON
+    """
+    level = LEVELS[level]
+    if logger.isEnabledFor(level):
+        logger.log(level, message or event, extra={"event": event, "fields": fields})
+
+
+def log_metrics():
+    """Записывает в журнал снимок счётчиков и гистограмм (читается командой python instrumentation.py)."""
+    log_event("metrics", "Снимок показателей", **metrics.snapshot())
+
+
+def format_snapshot(snapshot):
+    """Таблица показателей для вывода в консоль."""
+    lines = [f"{'Операция':20} {'Кол-во':>8} {'Средн.':>9} {'p50':>8} {'p90':>8} {'p99':>8} {'Макс.':>9}  (мс)"]
+    for name, histogram in sorted(snapshot["histograms"].items()):
+        count = histogram["count"]
+        mean = histogram["total"] / count if count else 0
+        values = [percentile(histogram, p) or 0 for p in (50, 90, 99)]
+        lines.append(f"{name:20} {count:8} {mean:9.2f} {values[0]:8.1f} {values[1]:8.1f} {values[2]:8.1f} "
+                     f"{histogram['max'] or 0:9.2f}")
+    if snapshot["counters"]:
+        lines.append("")
+        lines.extend(f"{name:30} {value:10}" for name, value in sorted(snapshot["counters"].items()))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Показатели из журнала событий стенда")
+    parser.add_argument("log", nargs="?", default=DEFAULT_LOG_PATH, help="Файл журнала событий")
+    parser.add_argument("--all", action="store_true", help="Вывести все снимки, а не только последний")
+    args = parser.parse_args()
+
+    snapshots = []
+    try:
+        with open(args.log, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry.get("event") == "metrics":
+                    snapshots.append(entry)
+    except FileNotFoundError:
+        sys.exit(f"Журнал не найден: {args.log}")
+    if not snapshots:
+        sys.exit("В журнале нет снимков показателей.")
+    for entry in snapshots if args.all else snapshots[-1:]:
+        print(f"{entry['time']}  ({entry.get('uptime', 0):.0f} с работы)")
+        print(format_snapshot(entry))
+        print()
+
+
+if __name__ == "__main__":
+    main()
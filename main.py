@@ -1,5 +1,15 @@
+import sys
+import time
+
+started = time.perf_counter()  # Начало отсчёта времени запуска (до импорта модулей приложения)
+
+if __name__ == "__main__" and "--headless" in sys.argv:
+    # python main.py --headless [параметры engine.py] - работа без интерфейса (python engine.py --help)
+    import engine
+    sys.exit(engine.main([arg for arg in sys.argv[1:] if arg != "--headless"]))
+
 import gui
 
 if __name__ == "__main__":
-
-    gui.main()
+    # python main.py --measure-startup - замер времени запуска (см. gui.STARTUP_LOG)
+    gui.main(started=started, measure_startup="--measure-startup" in sys.argv)
@@ -1,83 +1,228 @@
 import os
+from threading import Lock
 from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
 from datetime import datetime
+from instrumentation import metrics, log_event
+
+# TTF шрифты с кириллицей (обычный, жирный); используется первый найденный
+FONT_CANDIDATES = [
+    (os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts", "DejaVuSans.ttf"),
+     os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts", "DejaVuSans-Bold.ttf")),
+    ("C:/Windows/Fonts/arial.ttf", "C:/Windows/Fonts/arialbd.ttf"),
+    ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"),
+    ("/usr/share/fonts/TTF/DejaVuSans.ttf", "/usr/share/fonts/TTF/DejaVuSans-Bold.ttf"),
+]
+FONT_NAME = "ReportFont"
+FONT_BOLD_NAME = "ReportFont-Bold"
+
+_fonts = None
+_fonts_lock = Lock()
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 20
+LINE_HEIGHT = 14
+# Поля шапки отчета; значения выводятся правее подписи
+FIELD_LABELS = ["Объект:", "Номер блока:", "Место испытаний:", "Наименование присоединения:", "Дата:"]
+FIELD_VALUE_X = 220
+FIELDS_TOP = PAGE_HEIGHT - 50
+
+RESULT_TEXT = {
+    "success": [
+        "В результате проведенной проверки установлено, что:",
+        "Напряжение срабатывания и отпускания контакторов в цепи",
+        "соответствует существующей схеме блока, которая соответствует",
+        "электрической принципиальной схеме.",
+        "После визуального осмотра и проведенной проверки блок",
+        "считать исправным и работоспособным."
+    ],
+    "failure": [
+        "В результате проведенной проверки установлено, что:",
+        "Напряжение срабатывания и отпускания контакторов в цепи",
+        "не соответствует, существующая схема блока не соответствует",
+        "электрической принципиальной схеме.",
+        "После визуального осмотра и проведенной проверки блок",
+        "считать неисправным и не работоспособным."
+    ],
+}
+SIGNATURE_LABEL = "Оператор: _______________ "
+# Высота заключения вместе с подписью оператора (строки текста + отступ + подпись)
+FOOTER_HEIGHT = LINE_HEIGHT * (len(RESULT_TEXT["success"]) + 2) + 20
+
+
+def register_fonts():
+    """
+    Регистрирует TTF шрифт с кириллицей один раз на процесс.
+    :return: Имена обычного и жирного шрифта (Helvetica, если TTF шрифт не найден)
+    """
+    global _fonts
+    with _fonts_lock:
+        if _fonts is None:
+            _fonts = ("Helvetica", "Helvetica-Bold")
+            for regular_path, bold_path in FONT_CANDIDATES:
+                if not os.path.exists(regular_path):
+                    continue
+                try:
+                    pdfmetrics.registerFont(TTFont(FONT_NAME, regular_path))
+                    bold_name = FONT_NAME
+                    if os.path.exists(bold_path):
+                        pdfmetrics.registerFont(TTFont(FONT_BOLD_NAME, bold_path))
+                        bold_name = FONT_BOLD_NAME
+                    _fonts = (FONT_NAME, bold_name)
+                    break
+                except Exception as e:
+                    log_event("pdf.font_failed", f"Ошибка загрузки шрифта {regular_path}: {e}", "error")
+            else:
+                log_event("pdf.font_missing", "Шрифт с кириллицей не найден, используется Helvetica.", "warning")
+        return _fonts
 
 
 class PDFReport:
     def __init__(self):
         self.file_path = ""
-
-    def generate(self, operator, object_name, block_number, test_place, connection_name, status):
-        """Генерирует PDF отчет."""
-
-        # Создание папки, если она не существует
-        reports_folder = "reports"
-        if not os.path.exists(reports_folder):
-            os.makedirs(reports_folder)
-
-        # Формирование пути для отчета
-        self.file_path = os.path.join(reports_folder, f"report_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.pdf")
+        self.font, self.bold_font = register_fonts()
+
+    def generate(self, operator, object_name, block_number, test_place, connection_name, status,
+                 test_results=None, date=None, file_path=None, voltage_range=None, trends=None):
+        """
+        Генерирует PDF отчет. test_results - результаты отдельных тестов для сводного отчета:
+        пары (название шага, результат) или строки результатов (шаги "Тест N"),
+        date - дата испытаний (по умолчанию сегодня), file_path - путь к файлу отчета
+        (по умолчанию reports/report_<время>.pdf), voltage_range - минимальное и максимальное
+        напряжение за время испытаний по данным телеметрии, trends - строки тенденций
+        измерений блока по архиву.
+        """
+
+        if file_path:
+            self.file_path = file_path
+        else:
+            # Создание папки, если она не существует
+            reports_folder = "reports"
+            os.makedirs(reports_folder, exist_ok=True)
+
+            # Формирование пути для отчета
+            # (микросекунды в имени исключают совпадение имён при параллельном формировании)
+            self.file_path = os.path.join(reports_folder,
+                                          f"report_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S_%f')}.pdf")
 
         try:
-            c = canvas.Canvas(self.file_path, pagesize=A4)
-            width, height = A4
-
-            # Заголовок
-            c.setFont("Helvetica-Bold", 16)
-            c.drawCentredString(width / 2, height - 20, "Протокол проверки блока (ячейки)")
-
-            # Данные отчета
-            c.setFont("Helvetica", 12)
-            y_position = height - 40
-
-            data = [
-                f"Объект: {object_name}",
-                f"Номер блока: {block_number}",
-                f"Место испытаний: {test_place}",
-                f"Наименование присоединения: {connection_name}",
-                f"Дата: {datetime.now().strftime('%Y-%m-%d')}",
-            ]
-
-            for line in data:
-                c.drawString(20, y_position)
-                c.drawString(20, y_position, line)
-                y_position -= 10
-
-            # Текст в зависимости от результата теста
-            if status == "success":
-                result_text = [
-                    "В результате проведенной проверки установлено, что:",
-                    "Напряжение срабатывания и отпускания контакторов в цепи",
-                    "соответствует существующей схеме блока, которая соответствует",
-                    "электрической принципиальной схеме.",
-                    "После визуального осмотра и проведенной проверки блок",
-                    "считать исправным и работоспособным."
-                ]
-            else:
-                result_text = [
-                    "В результате проведенной проверки установлено, что:",
-                    "Напряжение срабатывания и отпускания контакторов в цепи",
-                    "не соответствует, существующая схема блока не соответствует",
-                    "электрической принципиальной схеме.",
-                    "После визуального осмотра и проведенной проверки блок",
-                    "считать неисправным и не работоспособным."
-                ]
-
-            for line in result_text:
-                c.drawString(20, y_position, line)
-                y_position -= 10
+            with metrics.timed("pdf.render"):
+                c = canvas.Canvas(self.file_path, pagesize=A4)
+                self.draw_page(c, operator, object_name, block_number, test_place, connection_name, status,
+                               test_results, date, voltage_range, trends)
 
-            # Подпись оператора
-            c.drawString(20, y_position - 20, f"Оператор: _______________ {operator}")
-
-            # Завершение страницы и сохранение
-            c.showPage()
-            c.save()
+                # Завершение страницы и сохранение
+                c.showPage()
+                c.save()
 
+            log_event("pdf.rendered", f"Отчет сформирован: {self.file_path}", path=self.file_path,
+                      block_number=block_number)
             return self.file_path
 
         except Exception as e:
-            print(f"Ошибка при создании отчета: {e}")
+            metrics.count("pdf.errors")
+            log_event("pdf.failed", f"Ошибка при создании отчета: {e}", "error", path=self.file_path)
             return None
+
+    def generate_document(self, file_path, records):
+        """
+        Генерирует многостраничный PDF: одна страница протокола на запись.
+        Шаблоны страницы создаются один раз на весь документ.
+        :param file_path: Путь к файлу
+        :param records: Список словарей с аргументами generate (без file_path)
+        :return: Путь к файлу или None в случае ошибки
+        """
+        try:
+            with metrics.timed("pdf.render_document"):
+                c = canvas.Canvas(file_path, pagesize=A4)
+                for record in records:
+                    self.draw_page(c, **record)
+                    c.showPage()
+                c.save()
+            metrics.count("pdf.pages", len(records))
+            log_event("pdf.rendered", f"Отчет сформирован: {file_path}", path=file_path, pages=len(records))
+            return file_path
+        except Exception as e:
+            metrics.count("pdf.errors")
+            log_event("pdf.failed", f"Ошибка при создании отчета: {e}", "error", path=file_path)
+            return None
+
+    def draw_page(self, c, operator, object_name, block_number, test_place, connection_name, status,
+                  test_results=None, date=None, voltage_range=None, trends=None):
+        """
+        Рисует страницу протокола на холсте c. Неизменная часть страницы берётся из шаблонов
+        (form XObject), которые создаются один раз на документ; здесь выводятся только данные.
+        """
+        self.define_templates(c)
+        c.doForm("report_header")
+
+        # Данные отчета
+        c.setFont(self.font, 12)
+        values = [object_name, block_number, test_place, connection_name, date or datetime.now().strftime('%Y-%m-%d')]
+        y_position = FIELDS_TOP
+        for value in values:
+            c.drawString(FIELD_VALUE_X, y_position, str(value))
+            y_position -= LINE_HEIGHT
+
+        # Результаты отдельных тестов
+        for i, result in enumerate(test_results or []):
+            name, text = result if isinstance(result, (list, tuple)) else (f"Тест {i + 1}", result)
+            c.drawString(MARGIN, y_position, f"{name}: {text}")
+            y_position -= LINE_HEIGHT
+
+        if voltage_range:
+            c.drawString(MARGIN, y_position,
+                         f"Напряжение во время испытаний: мин. {voltage_range[0]:.1f} В, макс. {voltage_range[1]:.1f} В")
+            y_position -= LINE_HEIGHT
+
+        # Тенденции измерений блока по архиву (мелким шрифтом: строки длинные)
+        if trends:
+            c.drawString(MARGIN, y_position, "Тенденции по блоку:")
+            y_position -= LINE_HEIGHT
+            c.setFont(self.font, 9)
+            for line in trends:
+                c.drawString(MARGIN, y_position, line)
+                y_position -= LINE_HEIGHT * 0.75
+            c.setFont(self.font, 12)
+
+        # Заключение и подпись: шаблон переносится под переменную часть страницы
+        y_position -= LINE_HEIGHT
+        c.saveState()
+        c.translate(0, y_position)
+        c.doForm("report_footer_success" if status == "success" else "report_footer_failure")
+        c.restoreState()
+
+        # Подпись оператора
+        c.setFont(self.font, 12)
+        c.drawString(MARGIN + c.stringWidth(SIGNATURE_LABEL, self.font, 12),
+                     y_position - FOOTER_HEIGHT + LINE_HEIGHT, str(operator))
+
+    def define_templates(self, c):
+        """Создаёт шаблоны неизменной части страницы, если их ещё нет в документе."""
+        if c.hasForm("report_header"):
+            return
+
+        # Заголовок и подписи полей
+        c.beginForm("report_header")
+        c.setFont(self.bold_font, 16)
+        c.drawCentredString(PAGE_WIDTH / 2, PAGE_HEIGHT - 30, "Протокол проверки блока (ячейки)")
+        c.setFont(self.font, 12)
+        y_position = FIELDS_TOP
+        for label in FIELD_LABELS:
+            c.drawString(MARGIN, y_position, label)
+            y_position -= LINE_HEIGHT
+        c.endForm()
+
+        # Текст в зависимости от результата теста; координаты отсчитываются вниз от нуля
+        for status, result_text in RESULT_TEXT.items():
+            c.beginForm(f"report_footer_{status}", lowerx=0, lowery=-FOOTER_HEIGHT, upperx=PAGE_WIDTH,
+                        uppery=LINE_HEIGHT)
+            c.setFont(self.font, 12)
+            y_position = 0
+            for line in result_text:
+                c.drawString(MARGIN, y_position, line)
+                y_position -= LINE_HEIGHT
+            c.drawString(MARGIN, -FOOTER_HEIGHT + LINE_HEIGHT, SIGNATURE_LABEL)
+            c.endForm()
@@ -0,0 +1,369 @@
+"""
+Планы испытаний: последовательность шагов (команд устройству) с ожидаемыми ответами,
+сроками ожидания, повторами и допусками, и выполнение плана через SerialHandler.
+
+Формат плана (JSON; YAML - если установлен PyYAML):
+
+    {
+      "name": "Блок КРУ-10",
+      "max_in_flight": 0,
+      "steps": [
+        {"id": "t1", "name": "Тест 1", "command": "UNUSED;START;UNUSED;UNUSED;UNUSED", "fatal": true},
+        {"id": "t2", "name": "Тест 2", "command": "START;UNUSED", "after": ["t1"],
+         "expect": "OK", "fail": "ERROR", "timeout": 3, "retries": 1, "min": 150, "max": 190}
+      ]
+    }
+
+Поля шага: command - команда устройству; expect / fail - регулярные выражения успешного
+и ошибочного ответа (по умолчанию "OK" и "ERROR"); timeout - срок ожидания ответа, с;
+retries - повторы при ошибке или отсутствии ответа; min / max - допуск на число в ответе
+(например, "OK;182.5"); after - шаги, которые должны успешно завершиться раньше; fatal - при
+неуспехе шага проверка прекращается. Шаги без зависимостей отправляются устройству сразу,
+не дожидаясь ответов на предыдущие (max_in_flight - ограничение, 0 - без ограничения).
+
+Измеренные напряжения срабатывания и отпускания передаются в ответе полями "PICKUP=182.5;DROPOUT=121.0"
+или по порядку: "OK;182.5;121.0".
+"""
+import asyncio
+import json
+import os
+import re
+import time
+
+from instrumentation import log_event
+
+try:
+    import yaml  # Необязательная зависимость: планы в формате YAML
+except ImportError:
+    yaml = None
+
+PLANS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plans")
+PLAN_EXTENSIONS = (".json", ".yaml", ".yml")
+NUMBER_PATTERN = re.compile(r"[-+]?\d+(?:[.,]\d+)?")
+# Поля ответа с измерениями и их порядок при передаче без имён
+MEASUREMENT_FIELDS = {"PICKUP": "pickup_voltage", "DROPOUT": "dropout_voltage"}
+MEASUREMENT_LABELS = {"pickup_voltage": "срабатывание", "dropout_voltage": "отпускание"}
+
+# Состояния шага
+PASSED = "passed"
+FAILED = "failed"
+NO_RESPONSE = "no_response"
+SKIPPED = "skipped"  # Не выполнялся: не выполнены зависимости или проверка прервана
+
+
+def parse_measurements(response):
+    """
+    Извлекает напряжения срабатывания и отпускания из ответа устройства.
+    :return: Словарь {"pickup_voltage": В, "dropout_voltage": В} (только найденные значения)
+    """
+    measurements = {}
+    positional = []
+    for field in response.split(";")[1:]:
+        name, separator, value = field.partition("=")
+        try:
+            if separator:
+                if name.strip().upper() in MEASUREMENT_FIELDS:
+                    measurements[MEASUREMENT_FIELDS[name.strip().upper()]] = float(value.replace(",", "."))
+            else:
+                positional.append(float(field.replace(",", ".")))
+        except ValueError:
+            continue
+    if not measurements:
+        measurements = dict(zip(MEASUREMENT_FIELDS.values(), positional))
+    return measurements
+
+
+def describe_measurements(measurements):
+    """Текст измерений для оператора и протокола: "срабатывание 182.5 В, отпускание 121.0 В"."""
+    return ", ".join(f"{MEASUREMENT_LABELS[name]} {value:.1f} В" for name, value in measurements.items())
+
+
+class PlanStep:
+    """Шаг плана испытаний."""
+
+    def __init__(self, step_id, name, command, expect="OK", fail="ERROR", timeout=None, retries=0,
+                 minimum=None, maximum=None, after=None, fatal=False):
+        self.id = step_id
+        self.name = name
+        self.command = command
+        self.expect = re.compile(expect)
+        self.fail = re.compile(fail) if fail else None
+        self.timeout = timeout
+        self.retries = retries
+        self.minimum = minimum
+        self.maximum = maximum
+        self.after = list(after or [])
+        self.fatal = fatal
+
+    @classmethod
+    def from_dict(cls, data, index):
+        if not data.get("command"):
+            raise ValueError(f"Шаг {index + 1}: не задана команда")
+        try:
+            return cls(str(data.get("id") or index + 1), data.get("name") or f"Тест {index + 1}", data["command"],
+                       expect=data.get("expect", "OK"), fail=data.get("fail", "ERROR"),
+                       timeout=float(data["timeout"]) if data.get("timeout") is not None else None,
+                       retries=int(data.get("retries", 0)),
+                       minimum=float(data["min"]) if data.get("min") is not None else None,
+                       maximum=float(data["max"]) if data.get("max") is not None else None,
+                       after=[str(step_id) for step_id in data.get("after", [])],
+                       fatal=bool(data.get("fatal", False)))
+        except (TypeError, ValueError, re.error) as e:
+            raise ValueError(f"Шаг {index + 1}: {e}")
+
+    def evaluate(self, response):
+        """
+        Проверяет ответ устройства.
+        :return: (состояние, значение из ответа или None, текст результата)
+        """
+        if not response:
+            return NO_RESPONSE, None, "Нет ответа"
+        if self.fail and self.fail.search(response):
+            return FAILED, None, "Ошибка"
+        if not self.expect.search(response):
+            return FAILED, None, "Неизвестный результат"
+        if self.minimum is None and self.maximum is None:
+            return PASSED, None, "Успех"
+        match = NUMBER_PATTERN.search(response.partition(";")[2] or response)
+        if not match:
+            return FAILED, None, "Нет значения в ответе"
+        value = float(match.group().replace(",", "."))
+        if (self.minimum is not None and value < self.minimum) or (self.maximum is not None and value > self.maximum):
+            return FAILED, value, f"Вне допуска ({value:g})"
+        return PASSED, value, f"Успех ({value:g})"
+
+
+class StepResult:
+    """Результат шага плана."""
+
+    COLORS = {PASSED: "green", FAILED: "red", NO_RESPONSE: "red", SKIPPED: "gray"}
+
+    def __init__(self, index, step, status=SKIPPED, response="", value=None, text="Не выполнялся", attempts=0,
+                 duration=0.0):
+        self.index = index
+        self.measurements = {}  # Напряжения срабатывания и отпускания из ответа
+        self.step = step
+        self.status = status
+        self.response = response
+        self.value = value
+        self.text = text
+        self.attempts = attempts
+        self.duration = duration
+
+    @property
+    def color(self):
+        return self.COLORS[self.status]
+
+    @property
+    def executed(self):
+        return self.status != SKIPPED
+
+    def to_dict(self):
+        return {"index": self.index, "step": self.step.id, "name": self.step.name, "status": self.status,
+                "response": self.response, "value": self.value, "text": self.text, "attempts": self.attempts,
+                "duration": self.duration, "measurements": self.measurements}
+
+
+class TestPlan:
+    """План испытаний: шаги в порядке отображения и протокола."""
+
+    def __init__(self, name, steps, max_in_flight=0, path=None):
+        self.name = name
+        self.steps = steps
+        self.max_in_flight = max_in_flight
+        self.path = path
+        self._validate()
+
+    def _validate(self):
+        if not self.steps:
+            raise ValueError("План не содержит шагов")
+        ids = [step.id for step in self.steps]
+        if len(set(ids)) != len(ids):
+            raise ValueError("Повторяющиеся идентификаторы шагов")
+        for step in self.steps:
+            unknown = [step_id for step_id in step.after if step_id not in ids]
+            if unknown:
+                raise ValueError(f"Шаг {step.id}: неизвестные зависимости {', '.join(unknown)}")
+        # Зависимости без циклов: каждый шаг должен стать готовым к выполнению
+        done = set()
+        while len(done) < len(self.steps):
+            ready = [step.id for step in self.steps if step.id not in done and set(step.after) <= done]
+            if not ready:
+                raise ValueError("Циклические зависимости шагов")
+            done.update(ready)
+
+    @classmethod
+    def from_dict(cls, data, path=None):
+        if not isinstance(data, dict):
+            raise ValueError("Ожидается объект с полем steps")
+        steps = [PlanStep.from_dict(step, i) for i, step in enumerate(data.get("steps") or [])]
+        return cls(data.get("name") or os.path.splitext(os.path.basename(path or ""))[0] or "План",
+                   steps, int(data.get("max_in_flight", 0)), path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Загружает план из файла JSON или YAML.
+        :raises ValueError: Файл не найден, не читается или план некорректен
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                if path.endswith((".yaml", ".yml")):
+                    if yaml is None:
+                        raise ValueError("Для планов YAML требуется пакет PyYAML")
+                    data = yaml.safe_load(f)
+                else:
+                    data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise ValueError(f"Не удалось прочитать план {path}: {e}")
+        except Exception as e:
+            if yaml is not None and isinstance(e, yaml.YAMLError):
+                raise ValueError(f"Не удалось прочитать план {path}: {e}")
+            raise
+        return cls.from_dict(data, path)
+
+
+def default_plan():
+    """Пять тестов стенда: команда "UNUSED;START;UNUSED;UNUSED;UNUSED" со START на месте номера теста."""
+    steps = []
+    for i in range(5):
+        command = ["UNUSED"] * 5
+        command[i] = "START"
+        steps.append(PlanStep(str(i + 1), f"Тест {i + 1}", ";".join(command)))
+    return TestPlan("Стандартная проверка", steps)
+
+
+def list_plans(folder=PLANS_FOLDER):
+    """Имена файлов планов в папке (без пути)."""
+    try:
+        return sorted(name for name in os.listdir(folder) if name.endswith(PLAN_EXTENSIONS))
+    except OSError:
+        return []
+
+
+class PlanExecution:
+    """Состояние одного выполнения плана."""
+
+    def __init__(self, steps, indexes):
+        self.steps = steps
+        selected = set(range(len(steps)) if indexes is None else indexes)
+        self.selected = selected
+        self.selected_ids = {steps[i].id for i in selected}
+        self.results = [StepResult(i, step) for i, step in enumerate(steps)]
+        self.passed = set()
+        self.waiting = sorted(selected)
+        self.in_flight = {}  # asyncio.Future -> (номер шага, время первой отправки)
+        self.start = time.monotonic()
+
+
+class PlanRunner:
+    """
+    Выполнение плана через SerialHandler в цикле asyncio (run_async).
+    Все шаги, зависимости которых выполнены, отправляются сразу (устройство ставит команды в очередь),
+    ответы обрабатываются по мере поступления. При неуспехе шага с fatal=True новые шаги не запускаются,
+    а шаги, ещё не получившие ответа, отмечаются как невыполненные.
+    """
+
+    def __init__(self, serial_handler, plan, on_step=None, metric="test.round_trip"):
+        """
+        :param on_step: Функция on_step(StepResult), вызываемая в цикле asyncio по завершении шага
+        """
+        self.serial_handler = serial_handler
+        self.plan = plan
+        self.on_step = on_step
+        self.metric = metric
+        self.aborted_by = None  # Шаг, неуспех которого прервал проверку
+
+    async def run_async(self, indexes=None):
+        """
+        Выполняет шаги плана (все или с указанными номерами; зависимости от невыбранных шагов не учитываются).
+        Ответы ожидаются без блокировки цикла: Future запросов SerialHandler оборачиваются в asyncio.Future.
+        :return: Список StepResult по всем шагам плана (невыбранные - SKIPPED)
+        """
+        execution = PlanExecution(self.plan.steps, indexes)
+        while self._dispatch(execution):
+            done, _ = await asyncio.wait(execution.in_flight, return_when=asyncio.FIRST_COMPLETED)
+            self._complete(execution, done)
+        return self._finish_plan(execution)
+
+    def _dispatch(self, execution):
+        """
+        Отправляет шаги, зависимости которых выполнены.
+        :return: True, если есть шаги, ожидающие ответа
+        """
+        steps, results, in_flight = execution.steps, execution.results, execution.in_flight
+        if self.aborted_by is not None:
+            # Ответы на уже отправленные команды не ждём
+            for i in execution.waiting + [i for i, _ in in_flight.values()]:
+                if results[i].attempts:
+                    results[i].text = "Проверка прервана"
+                self._finish(results[i])
+            return False
+        for i in list(execution.waiting):
+            if self.plan.max_in_flight and len(in_flight) >= self.plan.max_in_flight:
+                break
+            dependencies = [step_id for step_id in steps[i].after if step_id in execution.selected_ids]
+            if all(step_id in execution.passed for step_id in dependencies):
+                execution.waiting.remove(i)
+                in_flight[self._send(execution, steps[i], results[i])] = (i, time.monotonic())
+            elif any(results[j].status != SKIPPED and steps[j].id in dependencies
+                     and steps[j].id not in execution.passed for j in execution.selected):
+                execution.waiting.remove(i)  # Зависимость не выполнена - шаг пропускается
+                self._finish(results[i])
+        if not in_flight:
+            for i in execution.waiting:
+                self._finish(results[i])
+            return False
+        return True
+
+    def _complete(self, execution, done):
+        """Обрабатывает полученные ответы: оценка, повтор или завершение шага."""
+        for future in done:
+            i, sent_at = execution.in_flight.pop(future)
+            step, result = execution.steps[i], execution.results[i]
+            try:
+                response = future.result()
+            except (TimeoutError, ConnectionError) as e:
+                log_event("test.no_response", f"Шаг {step.name}: {e}", "warning", step=step.id)
+                response = ""
+            status, value, text = step.evaluate(response)
+            if status != PASSED and result.attempts <= step.retries:
+                log_event("test.retry", f"Повтор шага {step.name}: {text}", "warning", step=step.id,
+                          attempt=result.attempts)
+                execution.in_flight[self._send(execution, step, result)] = (i, sent_at)
+                continue
+            result.status, result.response, result.value, result.text = status, response, value, text
+            result.measurements = parse_measurements(response)
+            result.duration = time.monotonic() - sent_at
+            if status == PASSED:
+                execution.passed.add(step.id)
+            elif step.fatal:
+                self.aborted_by = step
+                log_event("test.aborted", f"Проверка прервана: {step.name} - {text}", "warning", step=step.id)
+            self._finish(result)
+
+    def _finish_plan(self, execution):
+        for future in execution.in_flight:
+            # Ответ на прерванный шаг больше не нужен; ошибка срока ожидания не должна попасть в журнал asyncio
+            future.add_done_callback(lambda future: future.cancelled() or future.exception())
+        log_event("test.plan_finished", f"План {self.plan.name} выполнен", plan=self.plan.name,
+                  duration=time.monotonic() - execution.start, passed=len(execution.passed),
+                  aborted=self.aborted_by.id if self.aborted_by else None)
+        return execution.results
+
+    def _send(self, execution, step, result):
+        result.attempts += 1
+        return asyncio.wrap_future(self.serial_handler.send_request(step.command, timeout=step.timeout,
+                                                                    metric=self.metric))
+
+    def _finish(self, result):
+        if self.on_step:
+            self.on_step(result)
+
+
+def plan_status(results):
+    """Итог проверки: успех, если все выполненные шаги успешны и проверка не прервана."""
+    executed = [result for result in results if result.executed]
+    if executed and all(result.status == PASSED for result in executed):
+        return "success"
+    return "failure"
@@ -0,0 +1,117 @@
+import time
+from threading import Thread, Event, Lock
+
+from instrumentation import log_event
+
+try:
+    import pyudev  # Необязательная зависимость: события подключения устройств в Linux
+except ImportError:
+    pyudev = None
+
+
+class PortWatcher:
+    """
+    Фоновое отслеживание COM-портов.
+    Список портов хранится в кэше; подписчикам передаются только изменения (добавленные
+    и удалённые порты) через функцию dispatch в потоке интерфейса. В Linux при наличии pyudev
+    перечисление выполняется только по событиям udev, иначе - опрос в фоновом потоке.
+    """
+
+    def __init__(self, dispatch, poll_interval=2.0):
+        """
+        :param dispatch: Функция dispatch(callback, *args), выполняющая callback в потоке интерфейса
+        :param poll_interval: Период опроса, если события udev недоступны, с
+        """
+        self.dispatch = dispatch
+        self.poll_interval = poll_interval
+        self._ports = []
+        self._subscribers = []
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread = None
+
+    @property
+    def ports(self):
+        """Последний известный список портов."""
+        with self._lock:
+            return list(self._ports)
+
+    def subscribe(self, callback):
+        """
+        Подписывает на изменения: callback(added, removed, ports) в потоке интерфейса.
+        Сразу после подписки передаётся текущий список портов как добавленный.
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+            ports = list(self._ports)
+        self.dispatch(callback, ports, [], ports)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name="port-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    @staticmethod
+    def enumerate_ports():
+        """Перечисляет порты (медленная операция - только в фоновом потоке)."""
+        import serial.tools.list_ports
+        return sorted(port.device for port in serial.tools.list_ports.comports())
+
+    def refresh(self):
+        """Перечисляет порты и рассылает подписчикам изменения, если они есть."""
+        try:
+            ports = self.enumerate_ports()
+        except Exception as e:
+            log_event("ports.enumerate_failed", f"Ошибка получения списка портов: {e}", "error")
+            return
+        with self._lock:
+            added = [port for port in ports if port not in self._ports]
+            removed = [port for port in self._ports if port not in ports]
+            self._ports = ports
+            subscribers = list(self._subscribers)
+        if added or removed:
+            for callback in subscribers:
+                self.dispatch(callback, added, removed, ports)
+
+    def _run(self):
+        self.refresh()
+        monitor = self._create_udev_monitor()
+        while not self._stop.is_set():
+            if monitor is not None:
+                try:
+                    device = monitor.poll(timeout=1)
+                except Exception as e:
+                    log_event("ports.udev_failed", f"Ошибка отслеживания udev, переход на опрос: {e}", "warning")
+                    monitor = None
+                    continue
+                if device is None:
+                    continue
+                # Пока драйвер создаёт узел устройства, событий может прийти несколько
+                time.sleep(0.2)
+                self.refresh()
+            else:
+                self._stop.wait(self.poll_interval)
+                self.refresh()
+
+    @staticmethod
+    def _create_udev_monitor():
+        if pyudev is None:
+            return None
+        try:
+            monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+            monitor.filter_by("tty")
+            monitor.start()
+            return monitor
+        except Exception as e:
+            log_event("ports.udev_unavailable", f"События udev недоступны, используется опрос: {e}", "warning")
+            return None
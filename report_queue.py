@@ -0,0 +1,113 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Timer
+
+from instrumentation import metrics, log_event
+
+
+class ReportJob:
+    """Задание на формирование отчета."""
+
+    def __init__(self, key, report_args):
+        self.key = key
+        self.report_args = report_args
+        self.callbacks = []
+        self.submitted = time.perf_counter()
+        self.timer = None  # Таймер окна объединения
+
+
+class ReportQueue:
+    """
+    Очередь формирования PDF отчетов в фоновом пуле потоков.
+    Повторные запросы с тем же ключом (номером блока), поступившие в течение окна
+    coalesce_window, объединяются в одно задание с последними данными.
+    Результат передаётся в поток интерфейса через функцию dispatch (например, App.call_in_ui).
+    Модуль pdf_report (reportlab) импортируется при первом отчете или заранее через warm_up,
+    чтобы не задерживать запуск приложения.
+    """
+
+    def __init__(self, dispatch, workers=2, coalesce_window=1.0):
+        """
+        :param dispatch: Функция dispatch(callback, *args), выполняющая callback в потоке интерфейса
+        :param workers: Количество потоков формирования отчетов
+        :param coalesce_window: Окно объединения повторных запросов в секундах
+        """
+        self.dispatch = dispatch
+        self.coalesce_window = coalesce_window
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report")
+        self._waiting = {}  # Ключ -> задание, ожидающее окончания окна объединения
+        self._closed = False
+        self._lock = Lock()
+
+    def submit(self, key, on_done=None, **report_args):
+        """
+        Ставит отчет в очередь.
+        :param key: Ключ объединения (например, номер блока)
+        :param on_done: Функция on_done(path), вызываемая в потоке интерфейса; path = None при ошибке
+            (в том числе после shutdown)
+        :param report_args: Аргументы PDFReport.generate
+        """
+        with self._lock:
+            if self._closed:
+                if on_done:
+                    self.dispatch(on_done, None)
+                return
+            job = self._waiting.get(key)
+            if job is None:
+                job = ReportJob(key, report_args)
+                self._waiting[key] = job
+                job.timer = Timer(self.coalesce_window, self._start, args=(key,))
+                job.timer.daemon = True
+                job.timer.start()
+            else:
+                # Запрос для того же блока ещё не начат: берём более свежие данные
+                job.report_args = report_args
+            if on_done:
+                job.callbacks.append(on_done)
+
+    def _start(self, key):
+        """Передаёт задание в пул по окончании окна объединения (после shutdown задание уже передано)."""
+        with self._lock:
+            job = self._waiting.pop(key, None)
+            if job is not None:
+                self._executor.submit(self._render, job)
+
+    def warm_up(self):
+        """Загружает reportlab и шрифты в рабочем потоке, пока оператор заполняет поля."""
+        self._executor.submit(self._warm_up)
+
+    @staticmethod
+    def _warm_up():
+        from pdf_report import register_fonts
+        register_fonts()
+
+    def _render(self, job):
+        """
+        Формирует отчет в рабочем потоке и передаёт результат в поток интерфейса.
+        Обработчики вызываются при любой ошибке (с path = None): их ждут ядро и остановка очереди.
+        """
+        metrics.observe("report.queue_wait", time.perf_counter() - job.submitted)
+        path = None
+        try:
+            from pdf_report import PDFReport
+            path = PDFReport().generate(**job.report_args)
+        except Exception as e:
+            metrics.count("pdf.errors")
+            log_event("report.failed", f"Ошибка формирования отчета: {e}", "error", key=str(job.key))
+        finally:
+            for callback in job.callbacks:
+                self.dispatch(callback, path)
+
+    def shutdown(self):
+        """
+        Запускает отложенные задания и дожидается завершения формирования отчетов.
+        Последующие запросы сразу завершаются с path = None.
+        """
+        with self._lock:
+            self._closed = True
+            jobs = list(self._waiting.values())
+            self._waiting.clear()
+            for job in jobs:
+                job.timer.cancel()
+                self._executor.submit(self._render, job)
+        self._executor.shutdown(wait=True)
@@ -1,61 +1,692 @@
 import serial
+import itertools
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from threading import Thread, Event, Condition, Lock, Timer, current_thread
+from telemetry import StreamDecoder, TelemetryBuffer
+from instrumentation import metrics, log_event
+
+# Префикс идентификатора запроса: команда "#12;UNUSED;START" -> ответ "#12;OK" (прошивка с поддержкой
+# идентификаторов, SerialHandler(request_tags=True)); прошивка без неё разбирает поля ";" по позициям
+REQUEST_TAG = "#"
+# Начало строки, по которому строка без идентификатора считается ответом на команду, а не телеметрией
+RESPONSE_MARKERS = ("OK", "ERROR", "PONG")
+
+# Состояния связи с устройством
+STATE_CONNECTED = "connected"
+STATE_RECONNECTING = "reconnecting"  # Кратковременный обрыв: порт переоткрывается, команды ждут в очереди
+STATE_DOWN = "down"
+# Адаптивный срок ожидания ответа (как RTO в TCP, RFC 6298): srtt + 4 * rttvar
+RTT_ALPHA = 1 / 8
+RTT_BETA = 1 / 4
+ADAPTIVE_MIN_SAMPLES = 5  # До этого числа замеров используется response_timeout
+LATEST_MAX_AGE = 3.0  # Строка старше этого срока, с, считается устаревшей (устройство перестало присылать данные)
+
+
+class RingBuffer:
+    """
+    Ограниченный кольцевой буфер строк с заранее выделенной памятью.
+    При переполнении самые старые строки перезаписываются.
+    """
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self._items = [None] * capacity
+        self._start = 0
+        self._count = 0
+        self.dropped = 0  # Количество перезаписанных (потерянных) строк
+        self.total = 0  # Всего добавлено строк
+        self.updated_at = 0.0  # time.monotonic() добавления последней строки
+        self._condition = Condition()
+
+    def put(self, item):
+        """Добавляет элемент в буфер."""
+        with self._condition:
+            index = (self._start + self._count) % self.capacity
+            self._items[index] = item
+            self.total += 1
+            self.updated_at = time.monotonic()
+            if self._count < self.capacity:
+                self._count += 1
+            else:
+                # Буфер заполнен: сдвигаем начало, самый старый элемент потерян
+                self._start = (self._start + 1) % self.capacity
+                self.dropped += 1
+            self._condition.notify()
+
+    def latest(self):
+        """
+        Возвращает последний добавленный элемент, не извлекая его.
+        :return: Элемент или None, если буфер пуст
+        """
+        with self._condition:
+            if not self._count:
+                return None
+            return self._items[(self._start + self._count - 1) % self.capacity]
+
+    def drain(self):
+        """
+        Извлекает все накопленные элементы (от старых к новым).
+        :return: Список элементов
+        """
+        with self._condition:
+            items = [self._items[(self._start + i) % self.capacity] for i in range(self._count)]
+            for i in range(self._count):
+                self._items[(self._start + i) % self.capacity] = None
+            self._start = 0
+            self._count = 0
+            return items
+
+    def get(self, timeout=None):
+        """
+        Извлекает самый старый элемент, ожидая его появления не дольше timeout секунд.
+        :return: Элемент или None, если за время ожидания ничего не пришло
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._count > 0, timeout):
+                return None
+            item = self._items[self._start]
+            self._items[self._start] = None
+            self._start = (self._start + 1) % self.capacity
+            self._count -= 1
+            return item
+
+    def __len__(self):
+        with self._condition:
+            return self._count
+
 
 class SerialHandler:
-    def __init__(self):
+    def __init__(self, buffer_size=1024, response_timeout=5, reconnect_delay=0.5, max_reconnect_delay=10.0,
+                 outage_timeout=30.0, heartbeat_interval=2.0, heartbeat_command=None, outbox_size=100,
+                 min_response_timeout=0.0, handshake_timeout=0.5, request_tags=False):
+        """
+        :param request_tags: Добавлять к командам идентификатор запроса "#N;" (прошивка должна его
+            поддерживать). Без идентификаторов ответы сопоставляются с запросами по порядку
+        :param buffer_size: Ёмкость буфера принятых строк
+        :param response_timeout: Срок ожидания ответа на команду по умолчанию (и наибольший адаптивный), с
+        :param min_response_timeout: Нижняя граница адаптивного срока ожидания ответа, с. Срок подбирается
+            по измеренному времени выполнения отдельно для каждой команды каждого показателя, поэтому
+            пропавший ответ обнаруживается быстрее; 0 - всегда response_timeout
+        :param handshake_timeout: Срок ожидания ответов при согласовании скорости, с
+        :param reconnect_delay: Начальная пауза между попытками переподключения, с (удваивается)
+        :param max_reconnect_delay: Наибольшая пауза между попытками переподключения, с
+        :param outage_timeout: Сколько секунд обрыв считается кратковременным: команды ждут в очереди,
+            после этого срока состояние - "down", ожидающие команды завершаются ошибкой
+        :param heartbeat_interval: Период проверки связи, с
+        :param heartbeat_command: Контрольная команда (например, "PING"), отправляемая раз в heartbeat_interval,
+            когда нет ожидающих ответа запросов; без ответа связь считается потерянной (зависший контроллер
+            за исправным USB-адаптером). Задержка ответа - гистограмма serial.heartbeat.
+            None - только проверка состояния порта
+        :param outbox_size: Наибольшее число команд, ожидающих восстановления связи
+        """
         self.connection = None
+        self.port = None
+        self.baud_rate = None  # Скорость открытия порта (на ней устройство работает после сброса)
+        self.target_baud_rate = None  # Скорость, согласуемая с прошивкой после открытия порта
+        self.timeout = 1
+        self.write_timeout = None
+        self.inter_byte_timeout = None
+        self.handshake_timeout = handshake_timeout
+        self.response_timeout = response_timeout  # Срок ожидания ответа на команду по умолчанию
+        self.min_response_timeout = min_response_timeout
+        self._rtt = {}  # (показатель задержки, команда) -> [srtt, rttvar, число замеров], с
+        self._last_reply_at = 0.0  # time.perf_counter() последнего ответа на запрос
+        self.request_tags = request_tags
+        self.buffer = RingBuffer(buffer_size)
+        self._reader_thread = None
+        self._stop_reader = Event()
+        self._sequence = itertools.count(1)
+        # Идентификатор запроса -> [Future, таймер срока ожидания, команда, показатель задержки, время записи,
+        # срок выполнения самой команды]
+        self._pending = OrderedDict()
+        self._pending_lock = Lock()
+        self.decoder = StreamDecoder()
+        self.telemetry = TelemetryBuffer()  # Отсчёты напряжения полной частоты
+        self.telemetry_rate = 0  # Частота двоичной телеметрии, Гц (0 - выключена)
+
+        # Наблюдение за связью
+        self.state = STATE_DOWN
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.outage_timeout = outage_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_command = heartbeat_command
+        self.reconnects = 0  # Количество восстановлений связи
+        self.last_received = 0.0  # time.monotonic() последнего приёма данных
+        self._outbox = deque(maxlen=outbox_size)  # Команды без ответа, ждущие восстановления связи
+        self._state_lock = Lock()
+        self._state_listeners = []
+        self._lost_at = None
+        self._supervisor_thread = None
+        self._stop_supervisor = Event()
+        self._wake_supervisor = Event()
 
-    def connect(self, port, baud_rate, timeout=1):
+    def connect(self, port, baud_rate, timeout=1, write_timeout=None, inter_byte_timeout=None,
+                target_baud_rate=None):
         """
         Устанавливает подключение к порту с заданным параметром baud_rate и тайм-аутом.
+        После подключения запускаются фоновый поток чтения и наблюдение за связью:
+        при обрыве порт переоткрывается автоматически.
         :param port: Порт (например, 'COM3' или '/dev/ttyUSB0')
-        :param baud_rate: Скорость передачи данных
-        :param timeout: Тайм-аут для операций
+        :param baud_rate: Скорость передачи данных при открытии порта
+        :param timeout: Тайм-аут чтения (ограничивает только время реакции потока чтения на остановку)
+        :param write_timeout: Тайм-аут записи, с (None - без ограничения); истечение считается обрывом связи
+        :param inter_byte_timeout: Наибольшая пауза между байтами при чтении, с (None - не используется)
+        :param target_baud_rate: Скорость, на которую перейти после подключения (см. negotiate_baud)
         """
         try:
-            self.connection = serial.Serial(port, baud_rate, timeout=timeout)
-            print("Подключение к Arduino установлено.")
+            self.port = port
+            self.baud_rate = baud_rate
+            self.target_baud_rate = target_baud_rate
+            self.timeout = timeout
+            self.write_timeout = write_timeout
+            self.inter_byte_timeout = inter_byte_timeout
+            self.connection = self._open(baud_rate)
+            log_event("serial.connected", "Подключение к Arduino установлено.", port=port, baud_rate=baud_rate)
+            self.last_received = time.monotonic()
+            self._set_state(STATE_CONNECTED)
+            self.start_reader()
+            self._start_supervisor()
+            if target_baud_rate and target_baud_rate != baud_rate:
+                self.negotiate_baud(target_baud_rate)
         except Exception as e:
-            print(f"Ошибка подключения к Arduino: {e}")
+            log_event("serial.connect_failed", f"Ошибка подключения к Arduino: {e}", "error", port=port)
             self.connection = None
 
+    def _open(self, baud_rate):
+        return serial.Serial(self.port, baud_rate, timeout=self.timeout, write_timeout=self.write_timeout,
+                             inter_byte_timeout=self.inter_byte_timeout)
+
+    def negotiate_baud(self, rate):
+        """
+        Переводит устройство и порт на скорость rate.
+        Протокол: команда "BAUD;<rate>" на текущей скорости, прошивка отвечает OK и переключается;
+        затем связь проверяется контрольной командой (PING, годится любой ответ). Прошивка без
+        поддержки команды отвечает ERROR и остаётся на прежней скорости; если после переключения
+        устройство не отвечает, порт возвращается на прежнюю скорость.
+        Если ответа на BAUD нет, проверяется связь на скорости rate - устройство могло уже работать
+        на ней (обрыв без сброса контроллера).
+        :return: True, если порт работает на скорости rate
+        """
+        previous = self.connection.baudrate
+        if rate == previous:
+            return True
+        try:
+            reply = self.send_request(f"BAUD;{int(rate)}", timeout=self.handshake_timeout,
+                                      metric="serial.handshake").result()
+        except (TimeoutError, ConnectionError):
+            reply = None
+        if reply is not None and "ERROR" in reply:
+            log_event("serial.baud_unsupported", f"Устройство не поддерживает скорость {rate}: {reply}", "warning",
+                      port=self.port)
+            return False
+        try:
+            self.connection.baudrate = rate
+            self.send_request("PING", timeout=self.handshake_timeout, metric="serial.handshake").result()
+        except Exception as e:
+            log_event("serial.baud_failed", f"Нет связи на скорости {rate}, возврат на {previous}: {e}", "warning",
+                      port=self.port)
+            try:
+                self.connection.baudrate = previous
+            except Exception:
+                pass
+            return False
+        log_event("serial.baud_changed", f"Скорость обмена: {rate} бод", port=self.port, baud_rate=rate)
+        return True
+
+    def response_deadline(self, metric, command=None):
+        """
+        Срок выполнения команды command показателя metric: srtt + 4 * rttvar по измеренным временам,
+        в пределах [min_response_timeout, response_timeout].
+        """
+        estimate = self._rtt.get((metric, command))
+        if not self.min_response_timeout or estimate is None or estimate[2] < ADAPTIVE_MIN_SAMPLES:
+            return self.response_timeout
+        srtt, rttvar, _ = estimate
+        return min(self.response_timeout, max(self.min_response_timeout, srtt + 4 * rttvar))
+
+    def _queue_deadline(self):
+        """
+        Время выполнения команд, уже записанных в порт и ещё ожидающих ответа: устройство выполняет
+        команды по очереди, поэтому новая команда начнёт выполняться только после них.
+        """
+        with self._pending_lock:
+            return sum(entry[5] for entry in self._pending.values() if entry[4] is not None)
+
+    def _update_rtt(self, key, rtt):
+        estimate = self._rtt.get(key)
+        if estimate is None:
+            self._rtt[key] = [rtt, rtt / 2, 1]
+            return
+        estimate[1] = (1 - RTT_BETA) * estimate[1] + RTT_BETA * abs(estimate[0] - rtt)
+        estimate[0] = (1 - RTT_ALPHA) * estimate[0] + RTT_ALPHA * rtt
+        estimate[2] += 1
+
+    def add_state_listener(self, callback):
+        """
+        Подписывает на изменения состояния связи: callback(state) вызывается из фонового потока
+        со значением STATE_CONNECTED, STATE_RECONNECTING или STATE_DOWN.
+        """
+        self._state_listeners.append(callback)
+
+    def _set_state(self, state):
+        with self._state_lock:
+            if self.state == state:
+                return
+            self.state = state
+        log_event("serial.state", f"Состояние связи: {state}", port=self.port, state=state)
+        for callback in list(self._state_listeners):
+            try:
+                callback(state)
+            except Exception as e:
+                log_event("serial.state_listener_failed", f"Ошибка обработчика состояния подключения: {e}", "error")
+
+    @property
+    def session_active(self):
+        """True, пока подключение не закрыто явно (в том числе во время переподключения)."""
+        return self._supervisor_thread is not None and self._supervisor_thread.is_alive()
+
+    def start_reader(self):
+        """Запускает фоновый поток, который непрерывно читает порт в кольцевой буфер."""
+        if self._reader_thread and self._reader_thread.is_alive():
+            return
+        self._stop_reader.clear()
+        self._reader_thread = Thread(target=self._reader_loop, name="serial-reader", daemon=True)
+        self._reader_thread.start()
+
+    def stop_reader(self):
+        """Останавливает фоновый поток чтения."""
+        self._stop_reader.set()
+        if self._reader_thread and self._reader_thread.is_alive() and self._reader_thread is not current_thread():
+            self._reader_thread.join(timeout=self.timeout + 1)
+        self._reader_thread = None
+
+    @property
+    def reader_running(self):
+        return self._reader_thread is not None and self._reader_thread.is_alive()
+
+    def _reader_loop(self):
+        """
+        Цикл фонового потока: читает всё, что накопилось в порту, разбирает текстовые строки
+        и двоичные кадры телеметрии. Строки идут в буфер/ответы, отсчёты - в буфер телеметрии.
+        Ошибка чтения означает обрыв связи: порт закрывается и передаётся на переподключение.
+        """
+        self.decoder.reset()
+        while not self._stop_reader.is_set():
+            connection = self.connection
+            if not (connection and connection.is_open):
+                break
+            try:
+                # Читаем столько, сколько уже пришло; если ничего нет - ждём байт до тайм-аута
+                data = connection.read(connection.in_waiting or 1)
+            except Exception as e:
+                if not self._stop_reader.is_set():
+                    self._on_link_lost(e)
+                break
+            if not data:
+                continue
+            self.last_received = time.monotonic()
+            start = time.perf_counter()
+            lines, samples = self.decoder.feed(data)
+            for line in lines:
+                self._dispatch_line(line)
+            if samples:
+                self.telemetry.extend(samples)
+            metrics.observe("serial.parse", time.perf_counter() - start)
+            metrics.count("serial.bytes_in", len(data))
+            metrics.count("serial.lines", len(lines))
+            metrics.count("serial.samples", len(samples))
+
+    def _on_link_lost(self, error):
+        """Обрыв связи: закрывает порт и переводит соединение в состояние переподключения."""
+        with self._state_lock:
+            if self.state != STATE_CONNECTED or not self.session_active:
+                return
+            self._lost_at = time.monotonic()
+        with self._pending_lock:
+            # Ответы на команды, отправленные до обрыва, уже не придут: до повторной отправки запросы
+            # не участвуют в сопоставлении по порядку (иначе ответ на BAUD завершил бы старый START)
+            for entry in self._pending.values():
+                entry[4] = None
+        metrics.count("serial.link_lost")
+        log_event("serial.link_lost", f"Связь с Arduino потеряна: {error}", "warning", port=self.port)
+        self._stop_reader.set()
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+        self._set_state(STATE_RECONNECTING)
+        self._wake_supervisor.set()
+
+    def _start_supervisor(self):
+        if self.session_active:
+            return
+        self._stop_supervisor.clear()
+        self._supervisor_thread = Thread(target=self._supervisor_loop, name="serial-supervisor", daemon=True)
+        self._supervisor_thread.start()
+
+    def reconnect_now(self):
+        """Немедленная попытка переподключения (например, когда порт снова появился в системе)."""
+        self._wake_supervisor.set()
+
+    def _supervisor_loop(self):
+        """
+        Цикл наблюдения за связью: при подключении - контроль связи раз в heartbeat_interval,
+        при обрыве - попытки переоткрыть порт с паузой, удваивающейся до max_reconnect_delay.
+        Если связь не восстановлена за outage_timeout, состояние меняется на "down",
+        но попытки продолжаются до явного закрытия подключения.
+        """
+        delay = self.reconnect_delay
+        while not self._stop_supervisor.is_set():
+            if self.state == STATE_CONNECTED:
+                delay = self.reconnect_delay
+                self._wake_supervisor.wait(self.heartbeat_interval)
+                self._wake_supervisor.clear()
+                if not self._stop_supervisor.is_set() and self.state == STATE_CONNECTED:
+                    self._heartbeat()
+                continue
+
+            if self._reopen():
+                continue
+            if self.state == STATE_RECONNECTING and time.monotonic() - self._lost_at > self.outage_timeout:
+                log_event("serial.down", "Не удалось восстановить связь с Arduino, подключение недоступно.",
+                          "error", port=self.port)
+                self._set_state(STATE_DOWN)
+                self._outbox.clear()
+                self._fail_pending(ConnectionError("Связь с устройством потеряна."))
+            self._wake_supervisor.wait(delay)
+            self._wake_supervisor.clear()
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _heartbeat(self):
+        """
+        Проверка связи: опрос состояния порта и контрольная команда. Пока есть ожидающие запросы,
+        команда не отправляется: она встала бы в очередь устройства за ними, а зависание и так
+        обнаружат сроки ожидания этих запросов.
+        """
+        try:
+            self.connection.in_waiting  # При отключении USB-адаптера порт сообщает об ошибке
+        except Exception as e:
+            self._on_link_lost(e)
+            return
+        if not self.heartbeat_command or self._pending:
+            return
+        try:
+            self.send_request(self.heartbeat_command, timeout=self.heartbeat_interval,
+                              metric="serial.heartbeat").result()
+        except TimeoutError:
+            self._on_link_lost(TimeoutError("Нет ответа на контрольную команду"))
+        except ConnectionError:
+            pass
+
+    def _reopen(self):
+        """
+        Переоткрывает порт после обрыва и повторяет команды, отправленные без ответа или
+        поставленные в очередь за время обрыва; быстрая телеметрия включается снова.
+        :return: True, если связь восстановлена
+        """
+        try:
+            connection = self._open(self.baud_rate)
+        except Exception:
+            return False
+        self.stop_reader()
+        self.connection = connection
+        self.last_received = time.monotonic()
+        self.reconnects += 1
+        metrics.count("serial.reconnects")
+        log_event("serial.reconnected", "Связь с Arduino восстановлена.", "warning", port=self.port)
+        self._set_state(STATE_CONNECTED)
+        self.start_reader()
+        # После сброса контроллер снова работает на начальной скорости
+        if self.target_baud_rate and self.target_baud_rate != self.baud_rate:
+            self.negotiate_baud(self.target_baud_rate)
+
+        with self._pending_lock:
+            unanswered = [(sequence_id, entry) for sequence_id, entry in self._pending.items()
+                          if not entry[0].done()]
+        for sequence_id, entry in unanswered:
+            entry[4] = time.perf_counter()
+            if not self._write(self._frame(sequence_id, entry[2])):
+                return False
+            metrics.count("serial.replayed")
+        while self._outbox and self.state == STATE_CONNECTED:
+            if not self._write(self._outbox[0]):
+                return False
+            self._outbox.popleft()
+        if self.telemetry_rate:
+            self.start_telemetry(self.telemetry_rate)
+        return True
+
+    def _dispatch_line(self, line):
+        """
+        Направляет принятую строку: ответ на команду - в её Future, остальное - в буфер.
+        Строка с идентификатором "#N;..." завершает запрос N. Строка без идентификатора,
+        начинающаяся с OK/ERROR/PONG, завершает самый старый отправленный запрос (прошивка без поддержки
+        идентификаторов отвечает по порядку). Ответ, для которого нет ожидающего запроса (запоздавший
+        после истечения срока), отбрасывается, чтобы не попасть в строки напряжения.
+        Искажённые строки, где маркер стоит не в начале, идут в буфер.
+        """
+        if line.startswith(REQUEST_TAG):
+            tag, _, payload = line[len(REQUEST_TAG):].partition(";")
+            if tag.isdigit():
+                if not self._complete_request(int(tag), payload):
+                    self._drop_reply(line)
+                return
+        elif line.startswith(RESPONSE_MARKERS):
+            if not self._complete_request(None, line):
+                self._drop_reply(line)
+            return
+        self.buffer.put(line)
+
+    def _drop_reply(self, line):
+        metrics.count("serial.unmatched_replies")
+        log_event("serial.unmatched_reply", f"Ответ без ожидающего запроса отброшен: {line}", "warning",
+                  port=self.port, line=line)
+
+    def _complete_request(self, sequence_id, response):
+        """
+        Завершает ожидающий запрос ответом.
+        :param sequence_id: Идентификатор запроса или None для самого старого отправленного запроса
+        :return: True, если запрос найден
+        """
+        with self._pending_lock:
+            if sequence_id is None:
+                # Запросы, ещё не записанные в порт (очередь обрыва), ответа получить не могут
+                sequence_id = next((key for key, entry in self._pending.items() if entry[4] is not None), None)
+                if sequence_id is None:
+                    return False
+            entry = self._pending.pop(sequence_id, None)
+        if entry is None:
+            return False
+        future, timer, command, metric, sent_at, _ = entry
+        timer.cancel()
+        now = time.perf_counter()
+        if sent_at is not None:
+            metrics.observe(metric, now - sent_at)
+            # Время выполнения: запрос, отправленный подряд за другими, устройство начинает
+            # выполнять только после ответа на предыдущий
+            self._update_rtt((metric, command), now - max(sent_at, self._last_reply_at))
+        self._last_reply_at = now
+        if not future.done():
+            future.set_result(response)
+        return True
+
+    def _expire_request(self, sequence_id):
+        """Завершает запрос ошибкой TimeoutError по истечении срока ожидания."""
+        with self._pending_lock:
+            entry = self._pending.pop(sequence_id, None)
+        if entry is not None and not entry[0].done():
+            metrics.count(f"{entry[3]}.timeouts")
+            log_event("serial.timeout", f"Нет ответа на запрос #{sequence_id}", "warning",
+                      port=self.port, command=entry[2])
+            entry[0].set_exception(TimeoutError(f"Нет ответа на запрос #{sequence_id}"))
+
+    def _frame(self, sequence_id, command):
+        """Строка команды для порта: с идентификатором запроса, если он включён (request_tags)."""
+        return f"{REQUEST_TAG}{sequence_id};{command}" if self.request_tags else command
+
+    def send_request(self, command, timeout=None, callback=None, metric="serial.round_trip"):
+        """
+        Отправляет команду (с идентификатором, если включён request_tags) и возвращает Future с ответом устройства.
+        Future завершается, как только приходит ответ, или ошибкой TimeoutError по истечении срока.
+        Во время переподключения команда ждёт восстановления связи (срок ожидания продолжает идти),
+        а команды, оставшиеся без ответа из-за обрыва, отправляются повторно.
+        :param command: Команда для отправки
+        :param timeout: Срок выполнения команды в секундах (по умолчанию - по измеренному времени выполнения,
+            см. response_deadline). К нему прибавляются сроки запросов, ожидающих ответа перед командой
+        :param callback: Функция, вызываемая с Future по завершении запроса
+        :param metric: Имя гистограммы задержки от записи команды до ответа
+        :return: concurrent.futures.Future
+        """
+        future = Future()
+        if callback:
+            future.add_done_callback(callback)
+        if self.state == STATE_DOWN or not self.connection:
+            future.set_exception(ConnectionError("Соединение не установлено."))
+            return future
+
+        if self.state == STATE_CONNECTED:
+            self.start_reader()
+        sequence_id = next(self._sequence)
+        deadline = self.response_deadline(metric, command) if timeout is None else timeout
+        timer = Timer(self._queue_deadline() + deadline, self._expire_request, args=(sequence_id,))
+        timer.daemon = True
+        entry = [future, timer, command, metric, None, deadline]
+        with self._pending_lock:
+            self._pending[sequence_id] = entry
+        timer.start()
+
+        # При ошибке записи запрос остаётся ожидающим и будет повторён после переподключения
+        if self.state == STATE_CONNECTED:
+            entry[4] = time.perf_counter()
+            self._write(self._frame(sequence_id, command), "debug" if metric == "serial.heartbeat" else "info")
+        return future
+
+    def start_telemetry(self, rate, timeout=None, callback=None):
+        """
+        Включает на устройстве поток двоичных кадров напряжения с частотой rate (команда "TELEMETRY;<rate>").
+        :param callback: Функция, вызываемая с Future по завершении запроса
+        :return: Future с ответом устройства
+        """
+        def on_done(future):
+            if not future.exception() and "ERROR" not in future.result():
+                self.telemetry_rate = rate
+        future = self.send_request(f"TELEMETRY;{int(rate)}", timeout=timeout, callback=on_done)
+        if callback:
+            future.add_done_callback(callback)
+        return future
+
+    def stop_telemetry(self, timeout=None):
+        """Выключает поток двоичной телеметрии на устройстве."""
+        self.telemetry_rate = 0
+        return self.send_request("TELEMETRY;0", timeout=timeout)
+
+    def _fail_pending(self, error):
+        """Завершает все ожидающие запросы ошибкой (например, при закрытии порта)."""
+        with self._pending_lock:
+            entries = list(self._pending.values())
+            self._pending.clear()
+        for future, timer, *_ in entries:
+            timer.cancel()
+            if not future.done():
+                future.set_exception(error)
+
+    def latest(self, max_age=LATEST_MAX_AGE):
+        """
+        Возвращает последнюю принятую строку без ожидания.
+        :param max_age: Наибольший возраст строки, с (None - любой)
+        :return: Строка данных или пустая строка, если данных нет или последняя строка старше max_age
+        """
+        if max_age is not None and time.monotonic() - self.buffer.updated_at > max_age:
+            return ""
+        return self.buffer.latest() or ""
+
+    def drain(self):
+        """
+        Забирает все строки, принятые с момента предыдущего вызова, без ожидания.
+        :return: Список строк (от старых к новым)
+        """
+        return self.buffer.drain()
+
+    def _write(self, command, log_level="info"):
+        """
+        Записывает команду в порт; ошибка записи считается обрывом связи.
+        :param log_level: Уровень записи об отправке в журнале (контрольные команды - debug, чтобы
+            не вытеснять из журнала историю испытаний)
+        :return: True, если команда записана
+        """
+        try:
+            with metrics.timed("serial.write"):
+                self.connection.write((command + '\n').encode())
+            log_event("serial.command", f"Команда отправлена: {command}", log_level, port=self.port, command=command)
+            return True
+        except Exception as e:
+            metrics.count("serial.write_errors")
+            log_event("serial.write_failed", f"Ошибка отправки команды: {e}", "error", port=self.port, command=command)
+            self._on_link_lost(e)
+            return False
+
     def send_command(self, command):
         """
         Отправляет команду на Arduino.
+        Во время переподключения команда ставится в очередь и отправляется после восстановления связи.
         :param command: Команда для отправки
+        :return: True, если команда записана в порт или поставлена в очередь
         """
+        if self.state == STATE_RECONNECTING:
+            self._outbox.append(command)
+            log_event("serial.command_queued", f"Команда поставлена в очередь до восстановления связи: {command}",
+                      port=self.port, command=command)
+            return True
         if self.connection and self.connection.is_open:
-            try:
-                self.connection.write((command + '\n').encode())
-                print(f"Команда отправлена: {command}")
-            except Exception as e:
-                print(f"Ошибка отправки команды: {e}")
+            if self._write(command):
+                return True
+            if self.state == STATE_RECONNECTING:
+                self._outbox.append(command)
+                return True
         else:
-            print("Ошибка: Соединение не установлено.")
+            log_event("serial.not_connected", "Ошибка: Соединение не установлено.", "error")
+        return False
 
-    def read_data(self):
+    def read_data(self, timeout=None):
         """
-        Читает строку данных от Arduino.
-        :return: Строка данных или пустая строка в случае ошибки
+        Читает строку данных от Arduino из буфера фонового потока чтения
+        (поток читает порт блоками по in_waiting, без блокирующего readline).
+        :param timeout: Время ожидания строки (по умолчанию - тайм-аут порта)
+        :return: Строка данных или пустая строка, если за время ожидания ничего не пришло
         """
-        if self.connection and self.connection.is_open:
-            try:
-                data = self.connection.readline().decode().strip()
-                if data:
-                    print(f"Получены данные: {data}")
-                return data
-            except Exception as e:
-                print(f"Ошибка чтения данных: {e}")
-                return ""  # Возврат пустой строки в случае ошибки
+        if self.state == STATE_RECONNECTING or (self.connection and self.connection.is_open):
+            # Во время переподключения строки, принятые до обрыва, остаются в буфере
+            if self.state == STATE_CONNECTED:
+                self.start_reader()
+            with metrics.timed("serial.readline"):
+                return self.buffer.get(self.timeout if timeout is None else timeout) or ""
         else:
-            print("Ошибка: Соединение не установлено.")
+            log_event("serial.not_connected", "Ошибка: Соединение не установлено.", "error")
             return ""
 
     def close(self):
         """
-        Закрывает подключение.
+        Закрывает подключение и прекращает наблюдение за связью.
         """
-        if self.connection and self.connection.is_open:
+        if not self.session_active and not (self.connection and self.connection.is_open):
+            log_event("serial.not_connected", "Ошибка: Соединение не было установлено.", "error")
+            return
+        self._stop_supervisor.set()
+        self._wake_supervisor.set()
+        if self._supervisor_thread and self._supervisor_thread is not current_thread():
+            self._supervisor_thread.join(timeout=self.timeout + 1)
+        self._supervisor_thread = None
+        self._stop_reader.set()
+        try:
             self.connection.close()
-            print("Подключение закрыто.")
-        else:
-            print("Ошибка: Соединение не было установлено.")
+        except Exception:
+            pass
+        self.stop_reader()
+        self._outbox.clear()
+        self._fail_pending(ConnectionError("Подключение закрыто."))
+        self.telemetry_rate = 0
+        self._set_state(STATE_DOWN)
+        log_event("serial.closed", "Подключение закрыто.", port=self.port)
@@ -0,0 +1,226 @@
+import json
+import os
+from threading import Thread, Event, Lock, Timer
+
+from instrumentation import log_event
+
+SETTINGS_PATH = "settings.json"
+# Файлы настроек прежних версий; читаются, если SETTINGS_PATH нет, и переносятся в него
+LEGACY_PATHS = ["connection_settings.json"]
+BAUD_RATES = [9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600]
+
+
+class PortProfile:
+    """
+    Параметры подключения к порту: скорость, тайм-ауты и частота быстрой телеметрии.
+    Нулевые значения target_baud_rate, write_timeout, inter_byte_timeout и min_response_timeout
+    и пустая heartbeat_command отключают соответствующую возможность.
+    """
+
+    FIELDS = {
+        "baud_rate": int,  # Скорость открытия порта (скорость прошивки после сброса)
+        "target_baud_rate": int,  # Скорость, согласуемая с прошивкой после подключения
+        "timeout": float,  # Тайм-аут чтения порта, с
+        "write_timeout": float,  # Тайм-аут записи, с
+        "inter_byte_timeout": float,  # Наибольшая пауза между байтами при чтении, с
+        "response_timeout": float,  # Срок ожидания ответа на команду, с
+        "min_response_timeout": float,  # Нижняя граница адаптивного срока ожидания ответа, с
+        "telemetry_rate": int,  # Частота быстрой телеметрии напряжения, Гц
+        "request_tags": bool,  # Идентификаторы запросов "#N;" в командах (нужна поддержка в прошивке)
+        "heartbeat_command": str,  # Контрольная команда проверки связи, например PING (нужна поддержка в прошивке)
+    }
+
+    def __init__(self, baud_rate=9600, target_baud_rate=0, timeout=0.1, write_timeout=1.0, inter_byte_timeout=0.0,
+                 response_timeout=5.0, min_response_timeout=0.0, telemetry_rate=500, request_tags=False,
+                 heartbeat_command=""):
+        self.baud_rate = baud_rate
+        self.target_baud_rate = target_baud_rate
+        self.timeout = timeout
+        self.write_timeout = write_timeout
+        self.inter_byte_timeout = inter_byte_timeout
+        self.response_timeout = response_timeout
+        self.min_response_timeout = min_response_timeout
+        self.telemetry_rate = telemetry_rate
+        self.request_tags = request_tags
+        self.heartbeat_command = heartbeat_command
+
+    def connect_options(self):
+        """Аргументы SerialHandler.connect (кроме порта)."""
+        return {"baud_rate": self.baud_rate, "timeout": self.timeout,
+                "write_timeout": self.write_timeout or None,
+                "inter_byte_timeout": self.inter_byte_timeout or None,
+                "target_baud_rate": self.target_baud_rate or None}
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Создаёт профиль из словаря; неизвестные и некорректные значения заменяются значениями по умолчанию."""
+        profile = cls()
+        for name, field_type in cls.FIELDS.items():
+            if name in data:
+                try:
+                    setattr(profile, name, field_type(data[name]))
+                except (TypeError, ValueError):
+                    log_event("settings.invalid_value", f"Некорректное значение настройки {name}: {data[name]}",
+                              "warning")
+        return profile
+
+
+class BenchSettings:
+    """Настройки вкладки стенда."""
+
+    def __init__(self, selected_port="", auto_connect=False, plan=""):
+        self.selected_port = selected_port
+        self.auto_connect = auto_connect
+        self.plan = plan  # Файл плана испытаний ("" - стандартная проверка)
+
+    def to_dict(self):
+        return {"selected_port": self.selected_port, "auto_connect": self.auto_connect, "plan": self.plan}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(str(data.get("selected_port") or data.get("port") or ""), bool(data.get("auto_connect", False)),
+                   str(data.get("plan") or ""))
+
+
+class Settings:
+    """
+    Настройки приложения в памяти: список стендов и профили портов.
+    Формат файла: {"version": 2, "benches": [...], "profiles": {"COM3": {...}}}.
+    """
+
+    VERSION = 2
+
+    def __init__(self, benches=None, profiles=None):
+        self.benches = benches or []
+        self.profiles = profiles or {}
+
+    def profile(self, port):
+        """Профиль порта; для порта без сохранённого профиля - значения по умолчанию."""
+        return self.profiles.get(port) or PortProfile()
+
+    def to_dict(self):
+        return {"version": self.VERSION,
+                "benches": [bench.to_dict() for bench in self.benches],
+                "profiles": {port: profile.to_dict() for port, profile in self.profiles.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Разбирает настройки любой версии: {"selected_port", "auto_connect"} с одним стендом,
+        {"benches": [...]} и текущий формат с профилями портов.
+        """
+        if "benches" not in data:
+            # Прежний формат: один стенд, параметры порта рядом с ним
+            bench = BenchSettings.from_dict(data)
+            profile = {name: value for name, value in data.items() if name in PortProfile.FIELDS}
+            data = {"benches": [bench.to_dict()] if bench.selected_port else [],
+                    "profiles": {bench.selected_port: profile} if bench.selected_port and profile else {}}
+        return cls([BenchSettings.from_dict(bench) for bench in data.get("benches", [])],
+                   {port: PortProfile.from_dict(profile) for port, profile in data.get("profiles", {}).items()})
+
+
+class SettingsStore:
+    """
+    Загрузка и сохранение настроек.
+    Файл читается один раз в фоновом потоке (load_async); об окончании чтения сообщает функция
+    on_loaded, а без цикла событий можно дождаться его через wait. Изменения вносятся через update_benches
+    и update_profile (под блокировкой, т.к. запись идёт в другом потоке) и сохраняются с задержкой:
+    повторные вызовы save в течение окна delay объединяются в одну запись, которая выполняется
+    в потоке таймера. Запись атомарная: временный файл и os.replace, поэтому при сбое питания
+    остаётся либо старый, либо новый файл целиком.
+    """
+
+    def __init__(self, path=SETTINGS_PATH, delay=1.0):
+        self.path = path
+        self.delay = delay
+        self.settings = Settings()
+        self._loaded = Event()
+        self._lock = Lock()
+        self._write_lock = Lock()  # Запись по таймеру и при выходе не должны пересекаться
+        self._timer = None
+        self._on_loaded = None
+
+    def load_async(self, on_loaded=None):
+        """
+        Начинает чтение файла настроек в фоновом потоке.
+        :param on_loaded: Функция on_loaded(settings), вызываемая в потоке чтения по его окончании
+        """
+        self._on_loaded = on_loaded
+        Thread(target=self._load, name="settings-load", daemon=True).start()
+
+    def wait(self, timeout=None):
+        """Дожидается окончания загрузки и возвращает настройки."""
+        self._loaded.wait(timeout)
+        return self.settings
+
+    def _load(self):
+        try:
+            for path in [self.path] + LEGACY_PATHS:
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        self.settings = Settings.from_dict(json.load(f))
+                    if path != self.path:
+                        log_event("settings.migrated", f"Настройки перенесены из {path}", "warning", path=path)
+                        self.save()
+                    break
+                except FileNotFoundError:
+                    continue
+                except (json.JSONDecodeError, UnicodeDecodeError, AttributeError) as e:
+                    log_event("settings.invalid", f"Ошибка чтения настроек {path}: {e}", "error", path=path)
+        finally:
+            self._loaded.set()
+        if self._on_loaded is not None:
+            try:
+                self._on_loaded(self.settings)
+            except Exception as e:
+                log_event("settings.callback_failed", f"Ошибка обработки загруженных настроек: {e}", "error")
+
+    def update_benches(self, benches):
+        """Заменяет список стендов (BenchSettings) и планирует сохранение."""
+        with self._lock:
+            self.settings.benches = list(benches)
+        self.save()
+
+    def update_profile(self, port, profile):
+        """Сохраняет профиль порта и планирует сохранение."""
+        with self._lock:
+            self.settings.profiles[port] = profile
+        self.save()
+
+    def save(self):
+        """Планирует сохранение настроек через delay секунд (повторные вызовы объединяются)."""
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = Timer(self.delay, self._write)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Немедленно сохраняет отложенные изменения (при выходе из приложения)."""
+        with self._lock:
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+            self._write()
+        with self._write_lock:
+            pass  # Дожидаемся записи, начатой потоком таймера
+
+    def _write(self):
+        with self._write_lock:
+            with self._lock:
+                self._timer = None
+                # Снимок берётся в момент записи: в файл попадают все изменения за окно delay
+                data = self.settings.to_dict()
+            temp_path = self.path + ".tmp"
+            try:
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, self.path)
+            except OSError as e:
+                log_event("settings.save_failed", f"Ошибка сохранения настроек: {e}", "error", path=self.path)
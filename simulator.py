@@ -0,0 +1,201 @@
+"""
+Имитатор стенда (Arduino) на псевдотерминале - для отладки и замеров без оборудования.
+
+    python simulator.py --delay 0.5 --error-rate 0.1
+
+Печатает путь к порту, который можно выбрать в приложении или передать в SerialHandler.connect.
+"""
+import argparse
+import heapq
+import os
+import random
+import select
+import time
+from threading import Thread, Event
+
+from telemetry import encode_frame
+
+try:
+    import pty
+    import tty
+except ImportError:  # Windows
+    pty = tty = None
+
+
+class SimulatedDevice:
+    """
+    Имитатор устройства, говорящего на протоколе стенда:
+    - кадр "UNUSED;START;..." (с идентификатором "#N;" или без) - ответ OK/ERROR через response_delay ± jitter
+      (при measurements - "OK;PICKUP=<В>;DROPOUT=<В>" с напряжениями срабатывания и отпускания);
+    - "TELEMETRY;<частота>" - включение двоичных кадров напряжения (0 - выключение);
+    - "PING" - контрольная команда проверки связи, ответ PONG;
+    - "BAUD;<скорость>" - согласование скорости обмена, ответ OK (скорость псевдотерминала не важна);
+    - без команд устройство раз в 1/telemetry_rate секунд присылает напряжение строкой "220.4".
+    Команды обрабатываются по очереди, как на настоящем контроллере.
+    """
+
+    def __init__(self, response_delay=0.2, jitter=0.0, error_rate=0.0, telemetry_rate=1.0, voltage=220.0,
+                 seed=None, measurements=False):
+        """
+        :param response_delay: Время выполнения теста, с
+        :param jitter: Максимальное отклонение времени выполнения, с
+        :param error_rate: Доля ответов ERROR (0..1)
+        :param telemetry_rate: Частота строк напряжения, Гц (0 - не присылать)
+        :param voltage: Среднее напряжение сети, В
+        :param measurements: Передавать в ответе OK напряжения срабатывания и отпускания
+        """
+        if pty is None:
+            raise RuntimeError("Имитатор устройства требует псевдотерминалов (Linux/macOS)")
+        self.response_delay = response_delay
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.telemetry_rate = telemetry_rate
+        self.binary_rate = 0
+        self.baud_rate = 9600
+        self.voltage = voltage
+        self.measurements = measurements
+        self.random = random.Random(seed)
+        self.commands_received = 0
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)  # Без эха и преобразования переводов строки
+        self.port = os.ttyname(self._slave)
+        self._replies = []  # Куча (время отправки, номер, байты)
+        self._reply_counter = 0
+        self._busy_until = 0.0
+        self._stop = Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name="simulated-device", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _schedule(self, delay, data):
+        """Ставит ответ в очередь; устройство выполняет команды последовательно."""
+        now = time.monotonic()
+        due = max(now, self._busy_until) + max(0.0, delay)
+        self._busy_until = due
+        self._reply_counter += 1
+        heapq.heappush(self._replies, (due, self._reply_counter, data))
+
+    def handle_command(self, line):
+        """Обрабатывает одну строку команды."""
+        self.commands_received += 1
+        tag = ""
+        if line.startswith("#"):
+            tag, _, line = line.partition(";")
+            tag += ";"
+        if line.startswith("TELEMETRY;"):
+            self.binary_rate = int(line.split(";")[1] or 0)
+            self._schedule(0, f"{tag}OK\n".encode())
+            return
+        if line.startswith("BAUD;"):
+            self.baud_rate = int(line.split(";")[1] or 0)
+            self._schedule(0, f"{tag}OK\n".encode())
+            return
+        if line == "PING":
+            self._schedule(0, f"{tag}PONG\n".encode())
+            return
+        if "START" in line.split(";"):
+            delay = self.response_delay + self.random.uniform(-self.jitter, self.jitter)
+            reply = "ERROR" if self.random.random() < self.error_rate else "OK"
+            if reply == "OK" and self.measurements:
+                # Срабатывание около 80% и отпускание около 55% напряжения сети
+                reply += (f";PICKUP={self.voltage * 0.8 + self.random.gauss(0, 1.5):.1f}"
+                          f";DROPOUT={self.voltage * 0.55 + self.random.gauss(0, 1.5):.1f}")
+            self._schedule(delay, f"{tag}{reply}\n".encode())
+            return
+        self._schedule(0, f"{tag}ERROR;UNKNOWN\n".encode())
+
+    def _voltage_sample(self):
+        return self.voltage + self.random.uniform(-2.0, 2.0)
+
+    def _run(self):
+        buffer = b""
+        next_line = time.monotonic()
+        next_frame = time.monotonic()
+        frame_sequence = 0
+        while not self._stop.is_set():
+            now = time.monotonic()
+            timeout = 0.002 if (self.binary_rate or self._replies) else 0.01
+            try:
+                readable, _, _ = select.select([self._master], [], [], timeout)
+                if readable:
+                    buffer += os.read(self._master, 4096)
+            except OSError:
+                break
+            while b"\n" in buffer:
+                raw, buffer = buffer.split(b"\n", 1)
+                line = raw.decode(errors="replace").strip()
+                if line:
+                    self.handle_command(line)
+
+            output = bytearray()
+            now = time.monotonic()
+            while self._replies and self._replies[0][0] <= now:
+                output += heapq.heappop(self._replies)[2]
+
+            if self.binary_rate:
+                # Кадры по 10 мс; за пропущенное время досылаем все отсчёты
+                while next_frame <= now:
+                    count = min(255, max(1, round(self.binary_rate * 0.01)))
+                    samples = [int(self._voltage_sample() * 10) for _ in range(count)]
+                    output += encode_frame(frame_sequence, samples)
+                    frame_sequence = (frame_sequence + 1) & 0xFF
+                    next_frame += count / self.binary_rate
+            else:
+                next_frame = now
+
+            if self.telemetry_rate and not self.binary_rate:
+                while next_line <= now:
+                    output += f"{self._voltage_sample():.1f}\n".encode()
+                    next_line += 1.0 / self.telemetry_rate
+            else:
+                next_line = now
+
+            if output:
+                try:
+                    os.write(self._master, bytes(output))
+                except OSError:
+                    break
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Имитатор испытательного стенда")
+    parser.add_argument("--delay", type=float, default=0.5, help="Время выполнения теста, с")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Разброс времени выполнения, с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов ERROR (0..1)")
+    parser.add_argument("--telemetry-rate", type=float, default=1.0, help="Частота строк напряжения, Гц")
+    parser.add_argument("--measurements", action="store_true",
+                        help="Передавать напряжения срабатывания и отпускания в ответе OK")
+    args = parser.parse_args()
+
+    device = SimulatedDevice(args.delay, args.jitter, args.error_rate, args.telemetry_rate,
+                             measurements=args.measurements).start()
+    print(f"Имитатор устройства запущен на порту: {device.port} (Ctrl+C - выход)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        device.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import sys
+from array import array
+from functools import reduce
+from operator import xor
+from threading import Lock
+
+# Двоичный кадр телеметрии:
+#   AA 55 | номер кадра (1 байт) | n (1 байт) | n отсчётов uint16 LE (напряжение в 0.1 В) | XOR байтов номер..отсчёты
+SYNC = b"\xAA\x55"
+HEADER_SIZE = 4
+VOLTAGE_SCALE = 0.1  # Вольт на единицу отсчёта
+MAX_LINE_LENGTH = 1024  # Текст без перевода строки длиннее этого считается мусором
+
+
+def checksum(data):
+    """Контрольная сумма кадра: XOR всех байтов."""
+    return reduce(xor, data, 0)
+
+
+def encode_frame(sequence, samples):
+    """
+    Формирует кадр телеметрии (для прошивки и имитатора устройства).
+    :param sequence: Номер кадра 0..255
+    :param samples: Отсчёты напряжения в единицах 0.1 В (не более 255)
+    """
+    payload = array("H", samples)
+    if sys.byteorder == "big":
+        payload.byteswap()
+    body = bytes([sequence & 0xFF, len(payload)]) + payload.tobytes()
+    return SYNC + body + bytes([checksum(body)])
+
+
+class StreamDecoder:
+    """
+    Разбирает поток байтов из порта на текстовые строки (ответы, напряжение в ASCII)
+    и двоичные кадры телеметрии. Повреждённые кадры отбрасываются с поиском следующего SYNC.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._last_sequence = None
+        self.bad_frames = 0  # Кадры с неверной контрольной суммой
+        self.lost_frames = 0  # Пропуски по номерам кадров
+
+    def feed(self, data):
+        """
+        Добавляет принятые байты и разбирает всё, что уже получено целиком.
+        :return: (список текстовых строк, array('H') отсчётов из всех разобранных кадров)
+        """
+        buffer = self._buffer
+        buffer += data
+        lines = []
+        samples = array("H")
+        while buffer:
+            sync = buffer.find(SYNC)
+            newline = buffer.find(b"\n", 0, sync if sync >= 0 else len(buffer))
+            if newline >= 0:
+                line = buffer[:newline].decode(errors="replace").strip()
+                del buffer[:newline + 1]
+                if line:
+                    lines.append(line)
+                continue
+            if sync < 0:
+                # Неполная строка; последний байт может оказаться началом SYNC
+                if len(buffer) > MAX_LINE_LENGTH:
+                    del buffer[:-1]
+                break
+            if sync > 0:
+                del buffer[:sync]  # Байты перед кадром без перевода строки - шум
+            if len(buffer) < HEADER_SIZE:
+                break
+            frame_size = HEADER_SIZE + 2 * buffer[3] + 1
+            if len(buffer) < frame_size:
+                break
+            body = buffer[2:frame_size - 1]
+            if checksum(body) != buffer[frame_size - 1]:
+                self.bad_frames += 1
+                del buffer[:1]  # Ищем следующий SYNC
+                continue
+            self._check_sequence(buffer[2])
+            samples.frombytes(bytes(body[2:]))
+            del buffer[:frame_size]
+        if sys.byteorder == "big":
+            samples.byteswap()
+        return lines, samples
+
+    def _check_sequence(self, sequence):
+        if self._last_sequence is not None:
+            self.lost_frames += (sequence - self._last_sequence - 1) & 0xFF
+        self._last_sequence = sequence
+
+    def reset(self):
+        self._buffer.clear()
+        self._last_sequence = None
+
+
+class TelemetryBuffer:
+    """
+    Кольцевой буфер отсчётов напряжения на array('H') с заранее выделенной памятью.
+    Хранит последние capacity отсчётов полной частоты; чтение идёт по курсору (номеру отсчёта),
+    поэтому несколько потребителей (индикатор, отчет) не мешают друг другу.
+    """
+
+    def __init__(self, capacity=120000):
+        self.capacity = capacity
+        self._data = array("H", bytes(2 * capacity))
+        self.total = 0  # Всего записано отсчётов с момента создания
+        self._lock = Lock()
+
+    def extend(self, samples):
+        """Добавляет отсчёты (array('H') в единицах 0.1 В)."""
+        with self._lock:
+            if len(samples) > self.capacity:
+                # Хранятся только последние capacity отсчётов, но в total учитываются все:
+                # по total считают курсоры потребителей
+                self.total += len(samples) - self.capacity
+                samples = samples[-self.capacity:]
+            position = self.total % self.capacity
+            first = min(len(samples), self.capacity - position)
+            self._data[position:position + first] = samples[:first]
+            if first < len(samples):
+                self._data[:len(samples) - first] = samples[first:]
+            self.total += len(samples)
+
+    def read_since(self, cursor):
+        """
+        Возвращает отсчёты, записанные после курсора (не более capacity последних).
+        :param cursor: Значение total при предыдущем чтении
+        :return: (array('H') отсчётов, новый курсор)
+        """
+        with self._lock:
+            total = self.total
+            count = min(total - cursor, self.capacity)
+            if count <= 0:
+                return array("H"), total
+            start = (total - count) % self.capacity
+            if start + count <= self.capacity:
+                samples = self._data[start:start + count]
+            else:
+                samples = self._data[start:] + self._data[:start + count - self.capacity]
+            return samples, total
+
+    @staticmethod
+    def voltage_range(samples):
+        """Минимальное и максимальное напряжение в вольтах или None, если отсчётов нет."""
+        if not samples:
+            return None
+        return min(samples) * VOLTAGE_SCALE, max(samples) * VOLTAGE_SCALE
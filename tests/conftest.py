@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+# Модули приложения лежат в корне репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import Engine  # noqa: E402
+from settings import PortProfile  # noqa: E402
+
+try:
+    from simulator import SimulatedDevice
+    SimulatedDevice(telemetry_rate=0).stop()
+except RuntimeError:  # Нет псевдотерминалов (Windows)
+    SimulatedDevice = None
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """Ядро в своём потоке с архивом во временной папке."""
+    monkeypatch.chdir(tmp_path)  # Протоколы сохраняются в reports/ текущей папки
+    engine = Engine(archive_path=str(tmp_path / "archive.sqlite3"), report_workers=1)
+    engine.start()
+    yield engine
+    engine.stop()
+
+
+@pytest.fixture
+def stand(engine):
+    """Стенд ядра, подключённый к имитатору устройства."""
+    if SimulatedDevice is None:
+        pytest.skip("нужны псевдотерминалы")
+    with SimulatedDevice(response_delay=0.01, telemetry_rate=0, measurements=True) as device:
+        stand = engine.add_stand(device.port)
+        engine.submit(stand.connect(device.port, PortProfile())).result(5)
+        yield stand
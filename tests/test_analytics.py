@@ -0,0 +1,113 @@
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from analytics import TrendAnalyzer, MIN_POPULATION, rolling_mean, drift  # noqa: E402
+from archive import ResultsArchive  # noqa: E402
+
+START = datetime(2024, 1, 1)
+
+
+def add_run(archive, block, day, values, plan="План А"):
+    """Запуск блока: values - {номер теста: (срабатывание, отпускание)}."""
+    results = [{"test_number": i, "step_id": f"t{i + 1}", "result": "Успех", "pickup_voltage": pickup,
+                "dropout_voltage": dropout} for i, (pickup, dropout) in values.items()]
+    return archive.add_run("Оператор", "Объект", block, "Цех", "Ввод", "success", results,
+                           started_at=START + timedelta(days=day), plan=plan)
+
+
+def healthy(rng, steps=2):
+    return {i: (rng.gauss(176, 1.5), rng.gauss(121, 1.5)) for i in range(steps)}
+
+
+@pytest.fixture
+def archive():
+    archive = ResultsArchive(":memory:")
+    yield archive
+    archive.close()
+
+
+def test_rolling_mean_and_drift():
+    assert list(rolling_mean([1, 2, 3, 4], window=2)) == [1, 1.5, 2.5, 3.5]
+    year = 365.25 * 24 * 3600
+    assert drift([0, year], [100, 102]) == pytest.approx(2)
+    assert np.isnan(drift([0], [100]))
+
+
+def test_healthy_blocks_are_not_flagged(archive):
+    rng = random.Random(1)
+    for run in range(2000):
+        add_run(archive, f"Б{run % 200}", run // 200, healthy(rng))
+    analyzer = TrendAnalyzer(archive)
+    flagged = sum(any(trend.last_outlier for trend in analyzer.block_trends(f"Б{block}")) for block in range(200))
+    # Четыре величины на блок; за границы Тьюки выходит около 0.7% нормально распределённых значений
+    assert flagged <= 12
+
+    add_run(archive, "Б0", 30, {0: (150.0, 121.0), 1: (176.0, 121.0)})
+    trends = analyzer.block_trends("Б0")
+    outliers = [(trend.test_number, trend.quantity) for trend in trends if trend.last_outlier]
+    assert outliers == [(0, "pickup_voltage")]
+    assert trends[0].plan == "План А" and trends[0].step_id == "t1"
+
+
+def test_small_population_is_not_flagged(archive):
+    for day, pickup in enumerate([176.0, 177.0, 150.0]):
+        add_run(archive, "Б1" if day == 2 else "Б0", day, {0: (pickup, None)})
+    trends = TrendAnalyzer(archive).block_trends("Б1")
+    assert len(trends) == 1
+    assert trends[0].count == 1
+    assert not trends[0].last_outlier
+    assert np.isnan(trends[0].low)
+
+
+def test_population_is_split_by_plan_and_step(archive):
+    rng = random.Random(2)
+    for run in range(MIN_POPULATION * 2):
+        add_run(archive, f"А{run}", run, {0: (rng.gauss(176, 1.5), None)}, plan="План А")
+        add_run(archive, f"Б{run}", run, {0: (rng.gauss(90, 1.5), None)}, plan="План Б")
+    analyzer = TrendAnalyzer(archive)
+    # Тест 1 плана Б - другая проверка, чем тест 1 плана А: его значения не выброс
+    assert not any(trend.last_outlier for trend in analyzer.block_trends("Б0"))
+    key = {step: key for key, step in archive.plan_steps().items()}[("План Б", "t1")]
+    low, high = analyzer.population_bounds()[(key, "pickup_voltage")]
+    assert low < 90 < high < 176
+    # По объекту строки шагов с одним номером из разных планов различаются подписью
+    labels = [trend.label for trend in analyzer.block_trends(object_name="Объект")]
+    assert labels == ["План А, шаг t1, срабатывание", "План Б, шаг t1, срабатывание"]
+
+
+def test_population_cache_is_extended_with_new_runs(archive):
+    rng = random.Random(3)
+    for run in range(MIN_POPULATION):
+        add_run(archive, "Б0", run, healthy(rng, 1))
+    analyzer = TrendAnalyzer(archive)
+    analyzer.population_bounds()
+    add_run(archive, "Б1", 40, {0: (150.0, 121.0)})
+    trends = analyzer.block_trends("Б1")
+    assert trends[0].last_outlier
+    assert len(analyzer._population) == MIN_POPULATION + 1
+
+
+def test_legacy_archive_is_migrated(tmp_path):
+    path = str(tmp_path / "archive.sqlite3")
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        CREATE TABLE runs (id INTEGER PRIMARY KEY AUTOINCREMENT, started_at TEXT NOT NULL, finished_at TEXT,
+            operator TEXT, object_name TEXT, block_number TEXT, test_place TEXT, connection_name TEXT, status TEXT,
+            report_path TEXT);
+        CREATE TABLE measurements (run_id INTEGER NOT NULL, test_number INTEGER NOT NULL, pickup_voltage REAL,
+            dropout_voltage REAL, PRIMARY KEY (run_id, test_number));
+        INSERT INTO runs (started_at, block_number) VALUES ('2024-01-01 10:00:00', '15');
+        INSERT INTO measurements VALUES (1, 2, 176.0, 121.0);
+    """)
+    connection.close()
+    archive = ResultsArchive(path)
+    try:
+        trends = TrendAnalyzer(archive).block_trends("15")
+        assert [(trend.test_number, trend.plan, trend.last) for trend in trends] == [(2, None, 176.0), (2, None, 121.0)]
+    finally:
+        archive.close()
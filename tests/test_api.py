@@ -0,0 +1,85 @@
+import io
+import json
+import time
+from concurrent.futures import Future
+
+import pytest
+
+pytest.importorskip("bottle")
+
+from api import create_app  # noqa: E402
+from settings import Settings  # noqa: E402
+
+
+def call(app, method, path, body=None):
+    """Запрос к приложению WSGI без сервера: (код ответа, JSON)."""
+    data = json.dumps(body).encode() if body is not None else b""
+    environ = {"REQUEST_METHOD": method, "PATH_INFO": path, "QUERY_STRING": "", "SERVER_NAME": "test",
+               "SERVER_PORT": "80", "CONTENT_TYPE": "application/json", "CONTENT_LENGTH": str(len(data)),
+               "wsgi.input": io.BytesIO(data), "wsgi.url_scheme": "http", "wsgi.errors": io.StringIO()}
+    status = []
+    result = b"".join(app(environ, lambda code, headers, exc_info=None: status.append(code)))
+    return int(status[0].split()[0]), json.loads(result)
+
+
+REPORT = {"operator": "Оператор", "block_number": "15"}
+
+
+def test_run_rejects_invalid_steps(engine, stand):
+    app = create_app(engine, Settings())
+    for steps in ([9], ["1"], [], [True], "1"):
+        code, body = call(app, "POST", f"/api/stands/{stand.id}/run", dict(REPORT, steps=steps))
+        assert code == 400, steps
+        assert "steps" in body["error"]
+
+    finished = []
+    engine.bridge.subscribe(finished.append, names=["plan.finished"])
+    code, _ = call(app, "POST", f"/api/stands/{stand.id}/run", dict(REPORT, steps=[0, 2]))
+    assert code == 202
+    deadline = time.monotonic() + 5
+    while not finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    results = finished[0].data["results"]
+    assert [result.executed for result in results] == [True, False, True, False, False]
+
+
+def test_run_failure_is_published(engine, stand):
+    app = create_app(engine, Settings())
+    events = []
+    engine.bridge.subscribe(events.append, names=["message"])
+
+    async def failing_run(plan, report_info, indexes=None):
+        raise RuntimeError("сбой проверки")
+
+    stand.run_plan = failing_run
+    code, _ = call(app, "POST", f"/api/stands/{stand.id}/run", dict(REPORT, steps=[0]))
+    assert code == 202
+    deadline = time.monotonic() + 5
+    while not events and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert events and events[0].data["level"] == "error"
+    assert "сбой проверки" in events[0].data["text"]
+
+
+def test_unknown_stand(engine):
+    code, body = call(create_app(engine, Settings()), "POST", "/api/stands/99/run", REPORT)
+    assert code == 404
+    assert "99" in body["error"]
+
+
+def test_hub_threadpool_call_does_not_block_other_requests():
+    gevent = pytest.importorskip("gevent")
+    from api import call_in_hub_threadpool
+    ticks = []
+
+    def other_request():
+        for _ in range(5):
+            ticks.append(time.monotonic())
+            gevent.sleep(0.01)
+
+    greenlet = gevent.spawn(other_request)
+    assert call_in_hub_threadpool(lambda: time.sleep(0.2) or "готово") == "готово"
+    assert len(ticks) == 5
+    greenlet.join()
+    with pytest.raises(TimeoutError):
+        call_in_hub_threadpool(Future().result, 0.01)
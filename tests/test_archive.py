@@ -0,0 +1,38 @@
+import sqlite3
+
+from archive import ResultsArchive
+
+
+def test_report_records_carry_step_names():
+    archive = ResultsArchive(":memory:")
+    try:
+        results = [{"test_number": 0, "step_name": "Катушка К1", "result": "Успех"},
+                   {"test_number": 2, "step_name": "Контакт К2", "result": "Отказ"}]
+        run_id = archive.add_run("Оператор", "Объект", "15", "Цех", "Ввод", "failure", results)
+        assert [r["step_name"] for r in archive.get_results(run_id)] == ["Катушка К1", "Контакт К2"]
+        record, = archive.report_records(block_number="15")
+        assert record["test_results"] == [("Катушка К1", "Успех"), ("Тест 2", "не выполнялся"),
+                                          ("Контакт К2", "Отказ")]
+    finally:
+        archive.close()
+
+
+def test_results_of_legacy_archive_are_named_by_number(tmp_path):
+    path = str(tmp_path / "archive.sqlite3")
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        CREATE TABLE runs (id INTEGER PRIMARY KEY AUTOINCREMENT, started_at TEXT NOT NULL, finished_at TEXT,
+            operator TEXT, object_name TEXT, block_number TEXT, test_place TEXT, connection_name TEXT, status TEXT,
+            report_path TEXT);
+        CREATE TABLE test_results (run_id INTEGER NOT NULL, test_number INTEGER NOT NULL, result TEXT,
+            response TEXT, duration REAL, PRIMARY KEY (run_id, test_number));
+        INSERT INTO runs (started_at, block_number) VALUES ('2024-01-01 10:00:00', '15');
+        INSERT INTO test_results VALUES (1, 0, 'Успех', 'OK', 0.5);
+    """)
+    connection.close()
+    archive = ResultsArchive(path)
+    try:
+        record, = archive.report_records(block_number="15")
+        assert record["test_results"] == [("Тест 1", "Успех")]
+    finally:
+        archive.close()
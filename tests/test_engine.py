@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+from plan_runner import default_plan
+from settings import PortProfile
+
+REPORT = {"operator": "Оператор", "object_name": "Объект", "block_number": "15", "test_place": "Цех",
+          "connection_name": "Ввод"}
+
+
+def test_reports_of_separate_runs_are_not_merged(engine, stand):
+    done = []
+    engine.bridge.subscribe(done.append, names=["report.done"])
+    first = engine.submit(stand.run_plan(default_plan(), REPORT)).result(10)
+    second = engine.submit(stand.run_plan(default_plan(), REPORT, [0])).result(10)
+    deadline = time.monotonic() + 10
+    while len(done) < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert len(first) == len(second) == 5
+    paths = {event.data["run_id"]: event.data["path"] for event in done}
+    assert len(paths) == 2 and None not in paths.values()
+    assert len(set(paths.values())) == 2
+    for run in engine.archive.find_runs(block_number="15"):
+        assert run["report_path"] == paths[run["id"]]
+
+
+def test_overlapping_connects_are_serialized(engine, stand):
+    port, handler = stand.port, stand.serial_handler
+    opened = []
+    connect = handler.connect
+    handler.connect = lambda *args, **kwargs: (opened.append(args[0]), connect(*args, **kwargs))
+    futures = [engine.submit(stand.connect(port, PortProfile(response_timeout=timeout))) for timeout in (1, 2, 3)]
+    for future in futures:
+        future.result(10)
+    assert len(opened) == 3
+    assert stand.connected
+    # Рассылку напряжения ведёт одна задача последнего подключения
+    tasks = [task for task in asyncio.all_tasks(engine.loop) if "_publish_voltage" in repr(task.get_coro())]
+    assert tasks == [stand._voltage_task]
+
+
+def test_repeated_connect_keeps_session(engine, stand):
+    # Автоподключение при запуске и первое обновление PortWatcher запрашивают одно и то же подключение
+    port, handler = stand.port, stand.serial_handler
+    opened = []
+    connect = handler.connect
+    handler.connect = lambda *args, **kwargs: (opened.append(args[0]), connect(*args, **kwargs))
+    futures = [engine.submit(stand.connect(port, PortProfile(baud_rate=57600))) for _ in range(2)]
+    for future in futures:
+        future.result(10)
+    engine.submit(stand.connect(port, PortProfile(baud_rate=57600))).result(10)
+    assert opened == [port]
+    assert stand.connected
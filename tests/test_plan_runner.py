@@ -0,0 +1,136 @@
+import asyncio
+from concurrent.futures import Future
+
+import pytest
+
+from plan_runner import (PlanRunner, PlanStep, TestPlan as Plan, default_plan, plan_status, parse_measurements,
+                         PASSED, FAILED, NO_RESPONSE, SKIPPED)
+
+
+class FakeHandler:
+    """
+    SerialHandler для проверки планировщика: ответы на команды задаются заранее.
+    Ответ - строка, исключение (TimeoutError и т.д.) или None (ответ не приходит).
+    """
+
+    def __init__(self, replies):
+        self.replies = {command: list(answers) for command, answers in replies.items()}
+        self.sent = []
+
+    def send_request(self, command, timeout=None, metric=None):
+        self.sent.append(command)
+        future = Future()
+        answers = self.replies.get(command)
+        answer = answers.pop(0) if answers else None
+        if isinstance(answer, Exception):
+            future.set_exception(answer)
+        elif answer is not None:
+            future.set_result(answer)
+        return future
+
+
+def run(plan, replies, indexes=None):
+    handler = FakeHandler(replies)
+    finished = []
+    runner = PlanRunner(handler, plan, on_step=finished.append)
+    results = asyncio.run(asyncio.wait_for(runner.run_async(indexes), 5))
+    return runner, handler, results, finished
+
+
+def make_plan(*steps, max_in_flight=0):
+    return Plan("Проверка", [PlanStep(**step) for step in steps], max_in_flight)
+
+
+def test_all_steps_pass():
+    runner, handler, results, finished = run(default_plan(), {step.command: ["OK"] for step in default_plan().steps})
+    assert [result.status for result in results] == [PASSED] * 5
+    assert plan_status(results) == "success"
+    assert len(finished) == 5
+    assert runner.aborted_by is None
+
+
+def test_step_skipped_when_dependency_failed():
+    plan = make_plan({"step_id": "a", "name": "A", "command": "A"},
+                     {"step_id": "b", "name": "B", "command": "B", "after": ["a"]},
+                     {"step_id": "c", "name": "C", "command": "C"})
+    _, handler, results, finished = run(plan, {"A": ["ERROR"], "B": ["OK"], "C": ["OK"]})
+    assert [result.status for result in results] == [FAILED, SKIPPED, PASSED]
+    assert "B" not in handler.sent
+    assert results[1].attempts == 0
+    assert {result.index for result in finished} == {0, 1, 2}
+    assert plan_status(results) == "failure"
+
+
+def test_dependency_outside_selection_is_ignored():
+    plan = make_plan({"step_id": "a", "name": "A", "command": "A"},
+                     {"step_id": "b", "name": "B", "command": "B", "after": ["a"]})
+    _, handler, results, _ = run(plan, {"B": ["OK"]}, indexes=[1])
+    assert handler.sent == ["B"]
+    assert [result.status for result in results] == [SKIPPED, PASSED]
+
+
+def test_retries_until_success():
+    plan = make_plan({"step_id": "a", "name": "A", "command": "A", "retries": 2})
+    _, handler, results, _ = run(plan, {"A": ["ERROR", TimeoutError("нет ответа"), "OK"]})
+    assert handler.sent == ["A"] * 3
+    assert results[0].status == PASSED
+    assert results[0].attempts == 3
+
+
+def test_retries_exhausted():
+    plan = make_plan({"step_id": "a", "name": "A", "command": "A", "retries": 1})
+    _, handler, results, _ = run(plan, {"A": [TimeoutError(), TimeoutError(), "OK"]})
+    assert handler.sent == ["A"] * 2
+    assert results[0].status == NO_RESPONSE
+    assert results[0].attempts == 2
+
+
+def test_fatal_failure_aborts_steps_in_flight():
+    plan = make_plan({"step_id": "a", "name": "A", "command": "A", "fatal": True},
+                     {"step_id": "b", "name": "B", "command": "B"},
+                     {"step_id": "c", "name": "C", "command": "C"},
+                     {"step_id": "d", "name": "D", "command": "D", "after": ["b"]})
+    # B и C отправлены вместе с A, но ответов на них нет: проверка не должна их ждать
+    runner, handler, results, finished = run(plan, {"A": ["ERROR"]})
+    assert runner.aborted_by is plan.steps[0]
+    assert handler.sent == ["A", "B", "C"]
+    assert results[0].status == FAILED
+    for result in results[1:3]:
+        assert result.status == SKIPPED
+        assert result.attempts == 1
+        assert result.text == "Проверка прервана"
+    assert results[3].attempts == 0
+    assert {result.index for result in finished} == {0, 1, 2, 3}
+
+
+def test_max_in_flight_limits_pipelining():
+    plan = make_plan(*({"step_id": str(i), "name": str(i), "command": str(i)} for i in range(4)), max_in_flight=1)
+    handler = FakeHandler({})
+    in_flight = []
+
+    def send_request(command, timeout=None, metric=None):
+        in_flight.append(command)
+        future = Future()
+        # Ответ приходит позже; к этому моменту другие команды не должны быть отправлены
+        asyncio.get_running_loop().call_later(0.01, lambda: (in_flight.remove(command), future.set_result("OK")))
+        assert len(in_flight) == 1
+        return future
+
+    handler.send_request = send_request
+    results = asyncio.run(PlanRunner(handler, plan).run_async())
+    assert [result.status for result in results] == [PASSED] * 4
+
+
+def test_tolerance_and_measurements():
+    step = PlanStep("a", "A", "A", minimum=150, maximum=190)
+    assert step.evaluate("OK;182.5")[:2] == (PASSED, 182.5)
+    assert step.evaluate("OK;200")[0] == FAILED
+    assert step.evaluate("")[0] == NO_RESPONSE
+    assert parse_measurements("OK;PICKUP=182.5;DROPOUT=121,0") == {"pickup_voltage": 182.5, "dropout_voltage": 121.0}
+    assert parse_measurements("OK;182.5;121.0") == {"pickup_voltage": 182.5, "dropout_voltage": 121.0}
+
+
+def test_cyclic_dependencies_rejected():
+    with pytest.raises(ValueError):
+        make_plan({"step_id": "a", "name": "A", "command": "A", "after": ["b"]},
+                  {"step_id": "b", "name": "B", "command": "B", "after": ["a"]})
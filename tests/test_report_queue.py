@@ -0,0 +1,33 @@
+from threading import Event
+
+import pdf_report
+from report_queue import ReportQueue
+
+
+def call(callback, *args):
+    callback(*args)
+
+
+def test_callbacks_run_when_rendering_fails(monkeypatch):
+    def fail(self, **report_args):
+        raise OSError("нет доступа к папке reports")
+    monkeypatch.setattr(pdf_report.PDFReport, "generate", fail)
+    queue = ReportQueue(call, workers=1, coalesce_window=0.01)
+    done, paths = Event(), []
+    queue.submit("15", on_done=lambda path: (paths.append(path), done.set()))
+    assert done.wait(5)
+    assert paths == [None]
+    queue.shutdown()
+
+
+def test_shutdown_renders_waiting_jobs_and_rejects_new_ones(monkeypatch):
+    monkeypatch.setattr(pdf_report.PDFReport, "generate", lambda self, **report_args: report_args["file_path"])
+    queue = ReportQueue(call, workers=1, coalesce_window=60)
+    paths = []
+    queue.submit("15", on_done=paths.append, file_path="first.pdf")
+    queue.submit("15", on_done=paths.append, file_path="second.pdf")
+    queue.shutdown()
+    # Окно объединения не истекло, но задание сформировано с последними данными
+    assert paths == ["second.pdf", "second.pdf"]
+    queue.submit("16", on_done=paths.append, file_path="late.pdf")
+    assert paths[-1] is None
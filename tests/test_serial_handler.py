@@ -0,0 +1,188 @@
+import asyncio
+import time
+from concurrent.futures import Future
+from threading import Timer
+
+import pytest
+
+import serial_handler
+from plan_runner import PlanRunner, default_plan, PASSED
+from serial_handler import RingBuffer, SerialHandler, STATE_CONNECTED
+
+try:
+    from simulator import SimulatedDevice
+    SimulatedDevice(telemetry_rate=0).stop()
+except RuntimeError:  # Нет псевдотерминалов (Windows)
+    SimulatedDevice = None
+
+needs_simulator = pytest.mark.skipif(SimulatedDevice is None, reason="нужны псевдотерминалы")
+
+
+def test_ring_buffer_overwrites_oldest():
+    buffer = RingBuffer(3)
+    for item in "abcde":
+        buffer.put(item)
+    assert len(buffer) == 3
+    assert buffer.dropped == 2
+    assert buffer.total == 5
+    assert buffer.latest() == "e"
+    assert buffer.drain() == ["c", "d", "e"]
+    assert buffer.latest() is None
+
+
+def test_ring_buffer_get_waits_for_item():
+    buffer = RingBuffer(2)
+    assert buffer.get(timeout=0.01) is None
+    buffer.put("a")
+    buffer.put("b")
+    assert buffer.get() == "a"
+    assert buffer.get() == "b"
+
+
+def test_latest_expires():
+    handler = SerialHandler()
+    assert handler.latest() == ""
+    handler.buffer.put("220.4")
+    assert handler.latest() == "220.4"
+    handler.buffer.updated_at = time.monotonic() - 60
+    assert handler.latest() == ""
+    assert handler.latest(max_age=None) == "220.4"
+
+
+def pending_request(handler, sequence_id, command="A"):
+    """Запрос, отправленный и ожидающий ответа, без записи в порт."""
+    future = Future()
+    handler._pending[sequence_id] = [future, Timer(60, lambda: None), command, "serial.round_trip",
+                                     time.perf_counter(), 5.0]
+    return future
+
+
+def test_untagged_reply_completes_oldest_request():
+    handler = SerialHandler()
+    first, second = pending_request(handler, 1), pending_request(handler, 2)
+    handler._dispatch_line("220.4")
+    handler._dispatch_line("OK")
+    handler._dispatch_line("ERROR;UNKNOWN")
+    assert first.result(0) == "OK"
+    assert second.result(0) == "ERROR;UNKNOWN"
+    assert handler.drain() == ["220.4"]
+
+
+def test_corrupted_line_does_not_complete_request():
+    handler = SerialHandler()
+    future = pending_request(handler, 1)
+    handler._dispatch_line("U\x07…#459;OK;0.813")
+    assert not future.done()
+    handler._dispatch_line("#1;OK")
+    assert future.result(0) == "OK"
+
+
+def test_unmatched_reply_is_not_telemetry():
+    handler = SerialHandler(request_tags=True)
+    handler._dispatch_line("OK")
+    handler._dispatch_line("#7;ERROR")
+    assert handler.drain() == []
+    assert handler.latest() == ""
+
+
+def test_deadline_includes_requests_ahead():
+    handler = SerialHandler()
+    pending_request(handler, 1)
+    pending_request(handler, 2)
+    assert handler._queue_deadline() == 10.0
+    handler._pending[2][4] = None  # Не записан в порт (ждёт переподключения)
+    assert handler._queue_deadline() == 5.0
+
+
+class WrittenPort:
+    """Порт, принимающий запись без устройства."""
+    is_open = False  # Поток чтения сразу завершается
+
+    def __init__(self):
+        self.written = []
+
+    def write(self, data):
+        self.written.append(data)
+
+
+def test_heartbeat_writes_are_logged_at_debug(monkeypatch):
+    logged = []
+    monkeypatch.setattr(serial_handler, "log_event", lambda event, message="", level="info", **fields:
+                        logged.append((event, level)))
+    handler = SerialHandler()
+    handler.connection, handler.state = WrittenPort(), STATE_CONNECTED
+    handler.send_request("PING", timeout=60, metric="serial.heartbeat")
+    handler.send_request("UNUSED;START", timeout=60)
+    handler._fail_pending(ConnectionError())
+    assert handler.connection.written == [b"PING\n", b"UNUSED;START\n"]
+    assert [level for event, level in logged if event == "serial.command"] == ["debug", "info"]
+
+
+def test_tagged_reply_completes_matching_request():
+    handler = SerialHandler(request_tags=True)
+    first, second = pending_request(handler, 1), pending_request(handler, 2)
+    handler._dispatch_line("#2;OK;182.5")
+    assert second.result(0) == "OK;182.5"
+    assert not first.done()
+
+
+@needs_simulator
+@pytest.mark.parametrize("request_tags", [False, True])
+def test_plan_against_simulator(request_tags):
+    with SimulatedDevice(response_delay=0.01, telemetry_rate=0, seed=1) as device:
+        received = []
+        handle_command = device.handle_command
+        device.handle_command = lambda line: (received.append(line), handle_command(line))
+        handler = SerialHandler(request_tags=request_tags, heartbeat_command=None)
+        handler.connect(device.port, 115200)
+        try:
+            assert handler.state == STATE_CONNECTED
+            results = asyncio.run(PlanRunner(handler, default_plan()).run_async())
+        finally:
+            handler.close()
+    assert [result.status for result in results] == [PASSED] * 5
+    assert all(line.startswith("#") == request_tags for line in received)
+    # Без идентификаторов прошивка получает команду в исходном виде: START на месте номера теста
+    if not request_tags:
+        assert received[0] == "START;UNUSED;UNUSED;UNUSED;UNUSED"
+
+
+@needs_simulator
+def test_request_replayed_after_reset_is_not_answered_by_handshake():
+    with SimulatedDevice(response_delay=0.5, telemetry_rate=0) as device:
+        received = []
+        handle_command = device.handle_command
+        device.handle_command = lambda line: (received.append(line), handle_command(line))
+        handler = SerialHandler(heartbeat_command=None, reconnect_delay=0.05)
+        handler.connect(device.port, 9600, target_baud_rate=115200)
+        try:
+            assert handler.connection.baudrate == 115200
+            started = time.monotonic()
+            future = handler.send_request("UNUSED;START")
+            time.sleep(0.1)
+            # Сброс контроллера: начатое выполнение теряется, ответа на START не будет
+            device._replies.clear()
+            device._busy_until = 0.0
+            handler._on_link_lost(OSError("сброс устройства"))
+            assert future.result(5) == "OK"
+            elapsed = time.monotonic() - started
+        finally:
+            handler.close()
+    # Ответ на BAUD после переподключения достался BAUD, а тест выполнен повторно
+    assert received.count("UNUSED;START") == 2
+    assert received.count("BAUD;115200") == 2
+    assert elapsed > 0.5
+
+
+@needs_simulator
+def test_pipelined_steps_wait_for_queue():
+    # Каждый тест дольше половины срока ожидания: без учёта очереди последние шаги истекли бы
+    with SimulatedDevice(response_delay=0.2, telemetry_rate=0) as device:
+        handler = SerialHandler(response_timeout=0.3, heartbeat_command=None)
+        handler.connect(device.port, 115200)
+        try:
+            results = asyncio.run(PlanRunner(handler, default_plan()).run_async())
+        finally:
+            handler.close()
+    assert [result.status for result in results] == [PASSED] * 5
+    assert handler.drain() == []
@@ -0,0 +1,64 @@
+import json
+import threading
+
+from settings import SettingsStore, BenchSettings, PortProfile
+
+
+def load(store):
+    loaded = threading.Event()
+    received = []
+    store.load_async(lambda settings: (received.append(settings), loaded.set()))
+    assert loaded.wait(5)
+    return received[0]
+
+
+def test_missing_file_gives_defaults(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    settings = load(SettingsStore("settings.json"))
+    assert settings.benches == []
+    assert settings.profile("COM3").baud_rate == 9600
+
+
+def test_legacy_file_is_migrated(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "connection_settings.json").write_text(
+        json.dumps({"selected_port": "COM3", "auto_connect": True, "baud_rate": 115200}), encoding="utf-8")
+    store = SettingsStore("settings.json", delay=0.01)
+    settings = load(store)
+    assert [(bench.selected_port, bench.auto_connect) for bench in settings.benches] == [("COM3", True)]
+    assert settings.profile("COM3").baud_rate == 115200
+    store.flush()
+    assert json.loads((tmp_path / "settings.json").read_text(encoding="utf-8"))["version"] == 2
+
+
+def test_saves_are_debounced_and_atomic(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    store = SettingsStore("settings.json", delay=60)
+    load(store)
+    writes = []
+    write = store._write
+    store._write = lambda: (writes.append(1), write())
+    store.update_benches([BenchSettings("COM3")])
+    store.update_profile("COM3", PortProfile(baud_rate=57600, request_tags=True))
+    store.update_benches([BenchSettings("COM3", plan="plan.json")])
+    assert not (tmp_path / "settings.json").exists()
+    store.flush()
+    assert writes == [1]
+    assert not (tmp_path / "settings.json.tmp").exists()
+
+    reloaded = load(SettingsStore("settings.json"))
+    assert reloaded.benches[0].plan == "plan.json"
+    assert reloaded.profile("COM3").baud_rate == 57600
+    assert reloaded.profile("COM3").request_tags is True
+
+
+def test_invalid_profile_values_fall_back_to_defaults():
+    profile = PortProfile.from_dict({"baud_rate": "быстро", "timeout": "0.5", "heartbeat_command": "PING"})
+    assert profile.baud_rate == 9600
+    assert profile.timeout == 0.5
+    assert profile.heartbeat_command == "PING"
+
+
+def test_heartbeat_is_opt_in():
+    # Текущая прошивка знает только UNUSED;START: контрольная команда без ответа приводила бы к сбросу платы
+    assert PortProfile().heartbeat_command == ""
@@ -0,0 +1,58 @@
+from array import array
+
+from telemetry import StreamDecoder, TelemetryBuffer, encode_frame
+
+
+def test_decoder_splits_lines_and_frames():
+    decoder = StreamDecoder()
+    data = b"220.4\n" + encode_frame(0, [2204, 2205]) + b"OK\n" + encode_frame(1, [2206])
+    lines, samples = decoder.feed(data)
+    assert lines == ["220.4", "OK"]
+    assert list(samples) == [2204, 2205, 2206]
+    assert decoder.bad_frames == 0
+    assert decoder.lost_frames == 0
+
+
+def test_decoder_handles_split_input():
+    decoder = StreamDecoder()
+    data = encode_frame(0, [1, 2, 3]) + b"OK\n"
+    lines, samples = [], array("H")
+    for i in range(len(data)):
+        new_lines, new_samples = decoder.feed(data[i:i + 1])
+        lines += new_lines
+        samples += new_samples
+    assert lines == ["OK"]
+    assert list(samples) == [1, 2, 3]
+
+
+def test_decoder_skips_corrupted_frame():
+    decoder = StreamDecoder()
+    bad = bytearray(encode_frame(0, [100, 200]))
+    bad[-1] ^= 0xFF
+    lines, samples = decoder.feed(bytes(bad) + encode_frame(2, [300]))
+    assert list(samples) == [300]
+    assert decoder.bad_frames == 1
+    assert decoder.lost_frames == 0  # Номер испорченного кадра неизвестен; до этого кадров не было
+
+
+def test_decoder_counts_lost_frames():
+    decoder = StreamDecoder()
+    decoder.feed(encode_frame(254, [1]) + encode_frame(1, [2]))
+    assert decoder.lost_frames == 2
+
+
+def test_buffer_cursor_after_oversized_batch():
+    buffer = TelemetryBuffer(4)
+    buffer.extend(array("H", [1, 2]))
+    cursor = buffer.total
+    buffer.extend(array("H", range(10, 17)))
+    assert buffer.total == 9
+    samples, cursor = buffer.read_since(cursor)
+    assert list(samples) == [13, 14, 15, 16]
+    buffer.extend(array("H", [99]))
+    assert list(buffer.read_since(cursor)[0]) == [99]
+
+
+def test_voltage_range():
+    assert TelemetryBuffer.voltage_range(array("H")) is None
+    assert TelemetryBuffer.voltage_range(array("H", [2200, 2210])) == (220.0, 221.0)
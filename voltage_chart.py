@@ -0,0 +1,91 @@
+import tkinter as tk
+from collections import deque
+
+
+class VoltageChart(tk.Canvas):
+    """
+    Бегущий график напряжения.
+    Каждый столбец шириной column_width пикселей - заранее созданный отрезок (min/max/последний отсчёт
+    группы отсчётов). При поступлении данных все отрезки сдвигаются одной командой move, а ушедшие
+    за левый край переставляются вправо через coords - элементы холста не удаляются и не создаются.
+    Перерисовка выполняется не чаще fps раз в секунду независимо от частоты отсчётов.
+    """
+
+    def __init__(self, master=None, width=600, height=120, v_min=0.0, v_max=300.0, scale=1.0,
+                 column_width=2, fps=25, time_span=5.0, **kwargs):
+        """
+        :param v_min: Нижняя граница шкалы, В
+        :param v_max: Верхняя граница шкалы, В
+        :param scale: Вольт на единицу отсчёта (0.1 для двоичной телеметрии)
+        :param column_width: Ширина столбца в пикселях
+        :param fps: Максимальная частота перерисовки
+        :param time_span: Отображаемый интервал времени, с
+        """
+        super().__init__(master, width=width, height=height, bg="white", highlightthickness=0, **kwargs)
+        self.chart_width = width
+        self.chart_height = height
+        self.v_min = v_min
+        self.v_max = v_max
+        self.scale = scale
+        self.column_width = column_width
+        self.frame_interval = max(1, int(1000 / fps))
+        self.time_span = time_span
+        self.columns = width // column_width
+        self.samples_per_column = 1
+        self._pending = []  # Отсчёты, ещё не сведённые в столбцы
+        self._last_y = height
+
+        # Опорная линия 220 В и подпись шкалы
+        y_nominal = self.value_to_y(220 / scale)
+        self.create_line(0, y_nominal, width, y_nominal, fill="#ddd", dash=(4, 2))
+        self.create_text(4, 2, anchor="nw", text=f"{v_max:.0f} В", fill="#999", font=("Arial", 7))
+        self.create_text(4, height - 2, anchor="sw", text=f"{v_min:.0f} В", fill="#999", font=("Arial", 7))
+
+        # Пул отрезков слева направо; изначально все за пределами видимой области
+        self.segments = deque(self.create_line(-column_width, height, -column_width, height, fill="blue",
+                                               tags="segment")
+                              for _ in range(self.columns))
+        self.after(self.frame_interval, self._redraw)
+
+    def set_sample_rate(self, rate):
+        """Подбирает число отсчётов на столбец, чтобы график показывал time_span секунд."""
+        self.samples_per_column = max(1, round(rate * self.time_span / self.columns))
+
+    def push(self, samples):
+        """Добавляет отсчёты (в единицах scale); отрисовка - при следующем кадре."""
+        self._pending.extend(samples)
+        # Не копим больше, чем помещается на графике
+        limit = self.columns * self.samples_per_column
+        if len(self._pending) > 2 * limit:
+            del self._pending[:-limit]
+
+    def value_to_y(self, value):
+        voltage = value * self.scale
+        fraction = (voltage - self.v_min) / (self.v_max - self.v_min)
+        return self.chart_height - min(max(fraction, 0.0), 1.0) * self.chart_height
+
+    def _redraw(self):
+        if not self.winfo_exists():
+            return  # График удалён вместе с панелью
+        per_column = self.samples_per_column
+        count = min(len(self._pending) // per_column, self.columns)
+        if count:
+            skip = len(self._pending) // per_column - count  # Столбцы, которые всё равно не поместятся
+            start = skip * per_column
+            pending = self._pending
+            shift = count * self.column_width
+            self.move("segment", -shift, 0)
+            x = self.chart_width - shift
+            for i in range(count):
+                chunk = pending[start + i * per_column:start + (i + 1) * per_column]
+                y_low = self.value_to_y(min(chunk))
+                y_high = self.value_to_y(max(chunk))
+                y_last = self.value_to_y(chunk[-1])
+                segment = self.segments.popleft()
+                x_next = x + self.column_width
+                self.coords(segment, x, self._last_y, x_next, y_low, x_next, y_high, x_next, y_last)
+                self.segments.append(segment)
+                self._last_y = y_last
+                x = x_next
+            del pending[:start + count * per_column]
+        self.after(self.frame_interval, self._redraw)